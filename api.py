@@ -16,57 +16,568 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
+import io
+import os
 import json
+import math
+import queue
+import base64
+import hashlib
 import datetime
+import threading
+from collections import OrderedDict
+from bson import ObjectId, json_util
+from bson.errors import BSONError
 from flask import *
-from flask_mongoengine import MongoEngine
+from flask_mongoengine.json import override_json_encoder
+import bulk
+import compact
+import compression
+import pantry
+import events
+import expiry
+import recommend
+import search
+import shopping
+import units
+from models import Product, Recipe, EXPIRING_DAYS, DATE_FORMAT, DEFAULT_HOUSEHOLD, validHousehold
+from metrics import Metrics
+
+# path of the config file, overridable for benchmarks and deployments
+CONFIG_PATH = os.environ.get("GROCERYHELPER_CONFIG", "config.json")
+
+# fields returned by routes that list products
+PRODUCT_FIELDS = ("id", "prodType", "expDate", "quantity", "unit", "note")
+
+# seconds a cached inventory summary is served before being rebuilt;
+# expired/expiring counts change with time as well as with mutations
+SUMMARY_TTL = 60
+
+# summaries kept per household, one for each ?days= asked for; the
+# oldest is dropped first
+SUMMARY_CACHE_SIZE = 16
+
+# longest look-ahead ?days= gives /expiring, /inventory/summary and
+# /recommendations; longer ones are cut to it
+MAX_DAYS = 3650
+
+# number of recipes kept in the by-name cache
+RECIPE_CACHE_SIZE = 256
+
+# largest page a client can request from a listing route
+MAX_PAGE_SIZE = 1000
+
+# type of each sort field's value in an ?after= cursor, str if not listed
+CURSOR_TYPES = {"id": ObjectId, "expDate": datetime.datetime}
+
+# recipes returned by /recommendations when ?limit= isn't given
+RECOMMENDATION_LIMIT = 10
+
+# recipe names suggested when /make-recipe is given one that doesn't exist
+SUGGESTION_LIMIT = 3
+
+# responses whose validators are kept for conditional requests
+VALIDATOR_CACHE_SIZE = 256
+
+# households whose caches are kept in memory; the least recently used
+# start over with empty caches when they are next served
+HOUSEHOLD_CACHE_SIZE = 1000
+
+# seconds between keep-alive comments on event streams, so proxies keep
+# idle connections open and closed clients are noticed
+HEARTBEAT_SECONDS = 15
 
 app = Flask(__name__)
-app.config['MONGODB_SETTINGS'] = json.load(open("config.json", "r"))
-db = MongoEngine(app)
-
-class Recipe(db.Document):
-	name = db.StringField(required=True, unique=True, max_length=50)
-	ingredients = db.DictField(required=True)	# stored as {prodType:qty}
-	instructions = db.StringField(required=True)
-
-	def canMake(self):
-		for key in self.ingredients:
-			if Product.objects(prodType=key).count() < self.ingredients[key]:
-				return False
-		return True
-
-	def clearIngredients(self):
-		for key in self.ingredients:
-
-			# if only one ingredient of this type used, simply delete
-			if self.ingredients[key] == 1:
-				Product.objects(prodType=key).delete()
-			
-			# otherwise get and delete number used
-			else:
-				for i in range(self.ingredients[key]):
-					Product.objects(prodType=key).first().delete()
-
-class Product(db.Document):
-	prodType = db.StringField(required=True, max_length=50)	# stored as lowercase
-	expDate = db.DateTimeField(required=True)
-	note = db.StringField(max_length=50)
-
-	def isExpired(self):
-		currentDate = datetime.datetime.today()
-		if self.expDate < currentDate:
-			return True	
+config = json.load(open(CONFIG_PATH, "r"))
+
+# request timing and Mongo query counting, registered before the
+# Mongo client is created so pymongo sees the command listener
+metrics = None
+if config.get("instrumentation", False):
+	metrics = Metrics()
+	metrics.install(app)
+
+# all reads and writes go through the store selected in config.json;
+# flask-mongoengine only supplies the JSON encoder for documents. routes
+# use their household's view of it, while the expiry notifier and change
+# feed watch every household through the unscoped store
+override_json_encoder(app)
+store = pantry.connect(config)
+
+# pushes products to event stream clients as they expire; started by the
+# first client so the API runs no background thread until it is used
+broker = events.Broker()
+expiryNotifier = expiry.ExpiryNotifier(store, broker, PRODUCT_FIELDS + ("household",))
+
+def publishChange(home, event, collection, data):
+	''' publishes a change made by a route to the household's /events
+		clients, unless the change feed will already report it from the
+		database. the household's search index is updated either way, as
+		applying a change the feed applies again does nothing
+	'''
+
+	home.searchIndex.apply(event, collection, data)
+	if not changeFeed.watching:
+		data["collection"] = collection
+		broker.publish(event, data, home.name)
+
+def productsChanged(home):
+	''' called by every route that adds or removes products
+	'''
+
+	home.summaryCache.clear()
+	expiryNotifier.wake()
+
+def collectionChanged(collection, household, event, data):
+	''' called by the change feed for every write to the database,
+		including those by the CLI and other workers, with the household
+		written to or None when it isn't known
+	'''
+
+	for home in households.loaded(household):
+		home.searchIndex.apply(event, collection, data)
+		if collection == "product":
+			productsChanged(home)
 		else:
-			return False
+			recipesChanged(home)
+
+def householdOf(collection, docIds):
+	''' returns the name of the loaded household whose search index holds
+		docIds, for deletes the change feed didn't see added, or None
+	'''
+
+	for home in households.loaded():
+		if any(home.searchIndex.holds(docId) for docId in docIds):
+			return home.name
+	return None
+
+# inventory changes for /events, from Mongo change streams when the
+# database has them so writes by the CLI and other workers show up too
+changeFeed = events.ChangeFeed(store, broker, collectionChanged, householdOf)
+
+class CollectionVersions(object):
+	''' the version of each of a household's collections, counted in the
+		database by every write through the store, whichever process made
+		it, so routes can tell whether a client's copy is current with one
+		lookup instead of the query. a change is dated when this process
+		first sees it. the token is random per process, so an ETag handed
+		out by one process never matches in another, whose memory store or
+		first sight of a version may differ
+	'''
+
+	def __init__(self, store, collections):
+		self.store = store
+		self.token = base64.urlsafe_b64encode(os.urandom(6)).decode()
+		self.seen = {collection: (None, None) for collection in collections}	# stored as {collection:(version, time first seen in UTC)}
+		self.lock = threading.Lock()
+
+	def get(self, collection):
+		''' returns (version, time of the last change in UTC)
+		'''
+
+		version = self.store.version(collection)
+		with self.lock:
+			if self.seen[collection][0] != version:
+				self.seen[collection] = (version, datetime.datetime.utcnow())
+			return self.seen[collection]
+
+class Validators(object):
+	''' validators of the responses recently served by conditional
+		routes, stored as {(versions token, path, encoding):(version, valid
+		until, etag, last modified)}. the least recently used are dropped
+		first
+	'''
+
+	def __init__(self, size=VALIDATOR_CACHE_SIZE):
+		self.size = size
+		self.entries = OrderedDict()
+		self.lock = threading.Lock()
+
+	def get(self, key):
+		with self.lock:
+			if key in self.entries:
+				self.entries.move_to_end(key)
+				return self.entries[key]
+		return None
+
+	def put(self, key, entry):
+		with self.lock:
+			self.entries[key] = entry
+			self.entries.move_to_end(key)
+			if len(self.entries) > self.size:
+				self.entries.popitem(last=False)
+
+validators = Validators()
+
+class RecipeCache(object):
+	''' in-process cache of recipes, holding single recipes in an LRU by
+		name plus a snapshot of the full sorted list with its JSON body, the
+		same list in the compact format, and an index of the snapshot by
+		ingredient. all are filled lazily from store and dropped by clear()
+		whenever a route adds or deletes a recipe, or when the store's
+		version of the household's recipes shows another worker or the CLI
+		changed them
+	'''
+
+	def __init__(self, store, size=RECIPE_CACHE_SIZE):
+		self.store = store
+		self.size = size
+		self.byName = OrderedDict()
+		self.snapshot = None	# stored as (recipes, body)
+		self.compactSnapshot = None
+		self.recipeIndex = None
+		self.version = None		# store.version("recipe") when last read
+		self.generation = 0		# bumped by clear() so stale fills are discarded
+		self.hits = 0
+		self.misses = 0
+		self.lock = threading.RLock()
+
+	def get(self, name):
+		''' returns the recipe with the given name, or None
+		'''
+
+		self.revalidate()
+		with self.lock:
+			if name in self.byName:
+				self.byName.move_to_end(name)
+				self.hits += 1
+				return self.byName[name]
+			self.misses += 1
+			generation = self.generation
+
+		recipe = self.store.recipe(name)
+		with self.lock:
+			if recipe != None and generation == self.generation:
+				self.byName[name] = recipe
+				if len(self.byName) > self.size:
+					self.byName.popitem(last=False)
+		return recipe
+
+	def all(self):
+		''' returns (recipes, body) for every recipe sorted by name, where
+			body is the JSON served by /recipes
+		'''
+
+		self.revalidate()
+		with self.lock:
+			if self.snapshot != None:
+				self.hits += 1
+				return self.snapshot
+			self.misses += 1
+			generation = self.generation
+
+		recipes = list(self.store.recipes())
+		body = jsonify(recipes).get_data(as_text=True)
+		snapshot = (recipes, body)
+		with self.lock:
+			if generation == self.generation:
+				self.snapshot = snapshot
+		return snapshot
+
+	def compact(self):
+		''' returns the JSON of every recipe sorted by name in the compact
+			format
+		'''
+
+		self.revalidate()
+		with self.lock:
+			if self.compactSnapshot != None:
+				self.hits += 1
+				return self.compactSnapshot
+			self.misses += 1
+			generation = self.generation
+
+		body = compact.dumps([compact.recipe(doc) for doc in self.store.recipes(raw=True)])
+		with self.lock:
+			if generation == self.generation:
+				self.compactSnapshot = body
+		return body
+
+	def index(self):
+		''' returns a RecipeIndex of every recipe by ingredient
+		'''
+
+		self.revalidate()
+		with self.lock:
+			if self.recipeIndex != None:
+				self.hits += 1
+				return self.recipeIndex
+			generation = self.generation
+
+		index = recommend.RecipeIndex(self.all()[0])
+		with self.lock:
+			if generation == self.generation:
+				self.recipeIndex = index
+		return index
+
+	def revalidate(self):
+		''' clears the cache when the recipes were written since it was
+			filled, by this process or any other. the version is read
+			before the recipes, so a fill racing a write is dropped next time
+		'''
+
+		version = self.store.version("recipe")
+		with self.lock:
+			if version != self.version:
+				self.clear()
+				self.version = version
+
+	def clear(self):
+		with self.lock:
+			self.byName.clear()
+			self.snapshot = None
+			self.compactSnapshot = None
+			self.recipeIndex = None
+			self.generation += 1
+
+	def stats(self):
+		with self.lock:
+			return {"hits": self.hits, "misses": self.misses, "size": len(self.byName), "snapshot": self.snapshot != None}
+
+class Household(object):
+	''' a household's view of the store and the caches built from it, so
+		a change in one household never invalidates another's
+	'''
+
+	def __init__(self, name):
+		self.name = name
+		self.store = store.scoped(name)
+		self.versions = CollectionVersions(self.store, ("product", "recipe"))
+		self.recipeCache = RecipeCache(self.store)
+		self.summaryCache = {}	# stored as {days:(time built, summary)}
+		self.searchIndex = search.SearchIndex()
+
+class Households(object):
+	''' the Household of every household recently served, created on
+		first use. past size the least recently used are dropped, their
+		recipe cache counters kept in retired so totals never go down
+	'''
+
+	def __init__(self, size=HOUSEHOLD_CACHE_SIZE):
+		self.size = size
+		self.entries = OrderedDict()
+		self.retired = {"hits": 0, "misses": 0}
+		self.lock = threading.Lock()
+
+	def get(self, name):
+		with self.lock:
+			if name not in self.entries:
+				self.entries[name] = Household(name)
+				if len(self.entries) > self.size:
+					dropped = self.entries.popitem(last=False)[1]
+					self.retired["hits"] += dropped.recipeCache.hits
+					self.retired["misses"] += dropped.recipeCache.misses
+			self.entries.move_to_end(name)
+			return self.entries[name]
+
+	def loaded(self, name=None):
+		''' returns the households held in memory, or only the named one
+			if it is, without creating any
+		'''
+
+		with self.lock:
+			if name == None:
+				return list(self.entries.values())
+			return [self.entries[name]] if name in self.entries else []
+
+	def recipeCacheCount(self, counter):
+		with self.lock:
+			homes = list(self.entries.values())
+			total = self.retired[counter]
+		return total + sum(getattr(home.recipeCache, counter) for home in homes)
+
+households = Households()
+
+if metrics != None:
+	metrics.addCounter("groceryhelper_recipe_cache_hits_total", "Recipe cache hits.", lambda: households.recipeCacheCount("hits"))
+	metrics.addCounter("groceryhelper_recipe_cache_misses_total", "Recipe cache misses.", lambda: households.recipeCacheCount("misses"))
+
+def household():
+	''' returns the Household of the request: the one named by a
+		/households/<household>/ route, or the default household
+	'''
+
+	return households.get(g.get("household", DEFAULT_HOUSEHOLD))
+
+@app.url_value_preprocessor
+def pickHousehold(endpoint, values):
+	if values and "household" in values:
+		g.household = values.pop("household")
+		if not validHousehold(g.household):
+			abort(404)
+
+def recipesChanged(home):
+	''' called by every route that adds or removes recipes
+	'''
+
+	home.recipeCache.clear()
+
+def encodeCursor(values):
+	''' packs the sort key of the last document on a page into an
+		opaque token clients pass back as ?after=
+	'''
+
+	return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+def decodeCursor(token, sortFields):
+	''' unpacks a token made by encodeCursor() for sortFields, raising
+		ValueError if it is malformed or doesn't hold one value of the
+		right type for each field
+	'''
+
+	# dates are decoded naive, like the ones stored documents hold. bad
+	# extended JSON such as {"$oid": "zz"} or {"$date": 1e30} raises
+	# errors of its own, which are raised as ValueError too
+	options = json_util.JSONOptions(tz_aware=False)
+	try:
+		values = json_util.loads(base64.urlsafe_b64decode(token.encode()).decode(), json_options=options)
+	except (BSONError, ArithmeticError, LookupError, TypeError) as e:
+		raise ValueError("cursor is not valid extended JSON: " + str(e))
+	if not isinstance(values, list) or len(values) != len(sortFields):
+		raise ValueError("cursor does not match the sort order")
+	for field, value in zip(sortFields, values):
+		if not isinstance(value, CURSOR_TYPES.get(field, str)):
+			raise ValueError("cursor value for " + field + " has the wrong type")
+	return values
+
+def clientHas(entry):
+	''' true when the request's If-None-Match, or If-Modified-Since
+		without it, shows the client holds the response entry describes
+	'''
+
+	version, validUntil, etag, lastModified = entry
+	if request.if_none_match:
+		return request.if_none_match.contains(etag)
+	since = request.if_modified_since
+	if since != None:
+		if since.tzinfo != None:
+			since = since.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+		# HTTP dates are given to the second
+		return lastModified.replace(microsecond=0) <= since
+	return False
+
+def conditionalResponse(collection, build, validUntil=None):
+	''' serves build() with an ETag and Last-Modified taken from the
+		version of collection, compressed as the client accepts. answers
+		304 without calling build, after one lookup of the version in the
+		store, while the client's copy is current. routes whose response changes with the
+		clock pass validUntil(now), returning when it next changes or None
+	'''
+
+	# writes by other processes reach the search index once the change
+	# feed is open; versions are read from the store, so they don't need it
+	changeFeed.ensureStarted()
+
+	# versions start over when a household is loaded again, with a new
+	# token, so validators of its earlier versions are never matched
+	home = household()
+	encoding = compression.negotiate(request.accept_encodings)
+	key = (home.versions.token, request.full_path, encoding)
+	version, modified = home.versions.get(collection)
+	now = datetime.datetime.today()
+
+	response = None
+	entry = validators.get(key)
+	if entry == None or entry[0] != version or (entry[1] != None and now >= entry[1]):
+		response = build()
+		expires = validUntil(now) if validUntil != None else None
+
+		# time-dependent responses last changed when they were built
+		lastModified = datetime.datetime.utcnow() if validUntil != None else modified
+		tag = ":".join([home.versions.token, request.full_path, str(encoding), str(version), str(expires)])
+		entry = (version, expires, hashlib.md5(tag.encode()).hexdigest(), lastModified)
+		validators.put(key, entry)
+
+	if clientHas(entry):
+		response = Response(status=304)
+	elif response == None:
+		response = build()
+	response.set_etag(entry[2])
+	response.last_modified = entry[3]
+	response.vary.add("Accept-Encoding")
+
+	if encoding != None and response.status_code == 200 and not response.is_streamed:
+		body = response.get_data()
+		if len(body) >= compression.MIN_SIZE:
+			response.set_data(compression.compress(body, encoding))
+			response.headers["Content-Encoding"] = encoding
+	return response
+
+def daysParam():
+	''' returns ?days= as a number of days, EXPIRING_DAYS when it isn't
+		given and MAX_DAYS at most, or None when it isn't a number of days
+	'''
+
+	text = request.args.get("days")
+	if text == None:
+		return EXPIRING_DAYS
+	try:
+		days = float(text)
+	except ValueError:
+		return None
+	if not math.isfinite(days) or days < 0:
+		return None
+	return min(days, MAX_DAYS)
+
+def daysError():
+	return jsonify(success=False, message="days must be a number of days, 0 or more.")
+
+def wantsCompact():
+	''' true when ?format=compact asks for the flat schema, with string
+		ids and ISO dates, instead of documents in Mongo extended JSON
+	'''
+
+	return request.args.get("format") == "compact"
+
+def compactResponse(data):
+	return Response(compact.dumps(data), mimetype="application/json")
+
+def listResponse(listing, sortFields, flatten):
+	''' returns the documents of listing(after, limit, raw), sorted by
+		sortFields, as JSON. the whole list is returned by default, one page
+		when ?limit= is given (continuing from the ?after= cursor of the
+		previous page), or a stream of newline-delimited JSON when ?stream=true.
+		with ?format=compact raw documents are read and written with flatten
+	'''
+
+	raw = wantsCompact()
+	values = None
+	after = request.args.get("after")
+	if after:
+		try:
+			values = decodeCursor(after, sortFields)
+		except ValueError:
+			return make_response(jsonify(success=False, message="Invalid cursor."), 400)
+
+	# streams documents as they are read rather than holding them all
+	if request.args.get("stream") == "true":
+		def generate():
+			for doc in listing(values, None, raw):
+				yield compact.dumps(flatten(doc)) + b"\n" if raw else doc.to_json() + "\n"
+		return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+	limit = request.args.get("limit", type=int)
+	if limit == None:
+		if raw:
+			return compactResponse([flatten(doc) for doc in listing(values, None, raw)])
+		return jsonify(list(listing(values, None)))
 
-	def willExpireSoon(self):
-		currentDate = datetime.datetime.today()
-		targetDate = self.expDate - datetime.timedelta(days=3)
-		if targetDate < currentDate < self.expDate:
-			return True
+	limit = max(1, min(limit, MAX_PAGE_SIZE))
+	items = list(listing(values, limit, raw))
+	nextCursor = None
+	if len(items) == limit:
+		if raw:
+			nextCursor = encodeCursor([items[-1]["_id" if field == "id" else field] for field in sortFields])
 		else:
-			return False
+			nextCursor = encodeCursor([getattr(items[-1], field) for field in sortFields])
+	if raw:
+		return compactResponse({"items": [flatten(doc) for doc in items], "next": nextCursor})
+	return jsonify(items=items, next=nextCursor)
+
+@app.before_first_request
+def migrate():
+	store.backfill()
 
 @app.route('/', methods=['GET'])
 def index():
@@ -75,109 +586,429 @@ def index():
 
 @app.route('/products', methods=['GET'])
 def getProducts():
-	''' returns JSON of all documents in product collection
+	''' returns JSON of all documents in product collection,
+		optionally paginated, streamed or in the compact format
 	'''
 
-	data = Product.objects.order_by("prodType", "expDate")
-	return jsonify(data)
+	home = household()
+	return conditionalResponse("product", lambda: listResponse(home.store.products, pantry.PRODUCT_SORT, compact.product))
 
 @app.route('/recipes', methods=['GET'])
 def getRecipes():
-	''' returns JSON of all documents in recipes collection
+	''' returns JSON of all documents in recipes collection,
+		optionally paginated, streamed or in the compact format
+	'''
+
+	home = household()
+
+	# full lists are served from the cache
+	def build():
+		if request.args.to_dict() == {"format": "compact"}:
+			return Response(home.recipeCache.compact(), mimetype="application/json")
+		if request.args:
+			return listResponse(home.store.recipes, pantry.RECIPE_SORT, compact.recipe)
+		return Response(home.recipeCache.all()[1], mimetype="application/json")
+	return conditionalResponse("recipe", build)
+
+@app.route('/recipes/cache-stats', methods=['GET'])
+def getRecipeCacheStats():
+	''' returns JSON of the recipe cache hit and miss counters
 	'''
 
-	data = Recipe.objects.order_by("name")
-	return jsonify(data)
+	home = household()
+	return jsonify(home.recipeCache.stats())
+
+@app.route('/makeable-recipes', methods=['GET'])
+def getMakeableRecipes():
+	''' returns JSON of all recipes that can be made with the current
+		inventory, plus the missing {prodType:qty} of every recipe that can't
+	'''
+
+	home = household()
+
+	# stock is counted once and every recipe is checked against it
+	makeable, shortfall = home.store.makeable(home.recipeCache.all()[0])
+	return jsonify(makeable=makeable, shortfall=shortfall)
+
+@app.route('/recommendations', methods=['GET'])
+def getRecommendations():
+	''' returns JSON of the recipes that would use up the most products
+		expiring within three days, or within the number of days given by
+		?days=, with what each is missing. at most ?limit= recipes (10 by
+		default) are returned, best first
+	'''
+
+	home = household()
+	days = daysParam()
+	if days == None:
+		return daysError()
+	limit = max(1, min(request.args.get("limit", RECOMMENDATION_LIMIT, type=int), MAX_PAGE_SIZE))
+
+	# the index finds only the recipes using expiring products
+	ranked = recommend.recommend(home.store, home.recipeCache.index(), datetime.datetime.today(), days, limit)
+	return jsonify([{
+		"recipe": recipe,
+		"expiringUsed": units,
+		"shortfall": shortfall,
+		"makeable": len(shortfall) == 0
+	} for recipe, units, shortfall in ranked])
+
+@app.route('/search', methods=['GET'])
+def getSearch():
+	''' returns JSON of the products and recipes best matching ?q=, as
+		[{"collection", "score", "document"}] best first. each word of the
+		query matches words in a product's type and note or a recipe's name
+		and instructions that it starts, or is a typo of. ?type=product or
+		?type=recipe searches only one collection, and at most ?limit=
+		results (20 by default) are returned
+	'''
+
+	home = household()
+	query = request.args.get("q", "")
+	collection = request.args.get("type")
+	if collection not in (None, "product", "recipe"):
+		return jsonify(success=False, message="type must be product or recipe.")
+	limit = max(1, min(request.args.get("limit", search.SEARCH_LIMIT, type=int), MAX_PAGE_SIZE))
+
+	# the index is read from the store once, then kept up to date by every change
+	home.searchIndex.fill(home.store)
+	ranked = home.searchIndex.search(query, limit, collection)
+
+	# documents are fetched with one indexed lookup per collection; any
+	# deleted since they were indexed are left out
+	docs = {}
+	for docCollection, docType in (("product", Product), ("recipe", Recipe)):
+		docIds = [docId for resultCollection, docId, score in ranked if resultCollection == docCollection]
+		if docIds:
+			matches = home.store.findMany(docType, docIds)
+			docs.update((docId, matches[docId][0]) for docId in matches if len(matches[docId]) == 1)
+	return jsonify([{
+		"collection": docCollection,
+		"score": score,
+		"document": docs[docId]
+	} for docCollection, docId, score in ranked if docId in docs])
+
+@app.route('/shopping-list', methods=['POST'])
+def buildShoppingList():
+	''' returns JSON of the {prodType:{unit:qty}} missing from inventory
+		to cook every meal in a plan. products expiring before a meal's date don't
+		count towards it. JSON format must be as follows, where batches
+		defaults to 1 and date to today:
+
+		{
+			"plan": [
+				{"rcpName": "example name", "batches": 2, "date": "2019-01-31"},
+				"example name"
+			]
+		}
+	'''
+
+	# recieve and parse incoming JSON data
+	data = request.get_json()
+	try:
+		plan = shopping.parsePlan(data["plan"])
+	except ValueError as e:
+		return jsonify(success=False, message=str(e))
+
+	# every recipe is read at once and stock is counted in one query
+	deficit, unknown = shopping.shoppingList(household().store, plan, datetime.datetime.today())
+	if unknown:
+		return jsonify(success=False, message="No recipe with that name found in database.", unknown=unknown)
+
+	return jsonify(success=True, shoppingList=deficit)
+
+@app.route('/inventory/summary', methods=['GET'])
+def getInventorySummary():
+	''' returns JSON of the count, total quantity, earliest and latest
+		expiration date and number of expired and soon-to-expire products
+		of every product type and unit. ?days= changes the look-ahead
+		window used for soon-to-expire
+	'''
+
+	home = household()
+	days = daysParam()
+	if days == None:
+		return daysError()
+
+	# serves the cached summary unless products changed or it is stale
+	now = datetime.datetime.today()
+	cached = home.summaryCache.get(days)
+	if cached == None or (now - cached[0]).total_seconds() > SUMMARY_TTL:
+		cached = (now, home.store.inventorySummary(now, days))
+		home.summaryCache.pop(days, None)
+		if len(home.summaryCache) >= SUMMARY_CACHE_SIZE:
+			home.summaryCache.pop(next(iter(home.summaryCache), None), None)
+		home.summaryCache[days] = cached
+	return jsonify(cached[1])
 
 @app.route('/expired', methods=['GET'])
 def getExpired():
-	''' returns JSON of all expired products
+	''' returns JSON of all expired products, in the compact format
+		with ?format=compact
+	'''
+
+	home = household()
+
+	# range query on the expDate index, fetching only returned fields
+	currentDate = datetime.datetime.today()
+	def build():
+		if wantsCompact():
+			return compactResponse([compact.product(doc) for doc in home.store.expired(currentDate, PRODUCT_FIELDS, raw=True)])
+		expired = home.store.expired(currentDate, PRODUCT_FIELDS)
+		return jsonify(list(expired))
+
+	# the list also changes when the next product expires
+	return conditionalResponse("product", build, home.store.nextExpiry)
+
+def eventStream(subscription):
+	''' yields broker events from subscription as Server-Sent Events
+		until the client disconnects
 	'''
 
-	expired = []
-	# scans through all products
-	for product in Product.objects:
-		# if product is expired, add to JSON
-		if product.isExpired():
-			expired += [product]
-	return jsonify(expired)
+	try:
+		# sends the headers right away rather than with the first event
+		yield ": connected\n\n"
+		while True:
+			try:
+				event, data = subscription.get(timeout=HEARTBEAT_SECONDS)
+			except queue.Empty:
+				yield ": keep-alive\n\n"
+				continue
+			yield "event: " + event + "\ndata: " + json.dumps(data) + "\n\n"
+	finally:
+		broker.unsubscribe(subscription)
+
+def eventResponse(subscription):
+	response = Response(stream_with_context(eventStream(subscription)), mimetype="text/event-stream")
+	response.headers["Cache-Control"] = "no-cache"
+	response.headers["X-Accel-Buffering"] = "no"
+	return response
+
+@app.route('/expired/events', methods=['GET'])
+def getExpiredEvents():
+	''' streams an "expired" Server-Sent Event with the household's
+		expired products each time products pass their expiration date
+	'''
+
+	expiryNotifier.ensureStarted()
+	return eventResponse(broker.subscribe(["expired"], household().name))
+
+@app.route('/events', methods=['GET'])
+def getEvents():
+	''' streams every change to products and recipes as Server-Sent
+		Events, so clients can keep their copy current without polling:
+		"add" with the new documents, "delete" and "consume" with the ids
+		removed, "consume" and "update" with the {id:quantity} left in
+		products partly used, "reset" when a collection should be fetched
+		again, and "expired" as products expire
+	'''
+
+	changeFeed.ensureStarted()
+	expiryNotifier.ensureStarted()
+	return eventResponse(broker.subscribe(household=household().name))
 
 @app.route('/expiring', methods=['GET'])
 def getExpiring():
-	''' returns JSON of soon-to-expire products
+	''' returns JSON of products that will expire within three days,
+		or within the number of days given by ?days=, in the compact
+		format with ?format=compact
 	'''
 
-	expiring = []
-	# scans through all products
-	for product in Product.objects:
-		# if product is expiring, add to JSON
-		if product.willExpireSoon():
-			expiring += [product]
-	return jsonify(expiring)
+	home = household()
+	days = daysParam()
+	if days == None:
+		return daysError()
+
+	# range query on the expDate index, fetching only returned fields
+	currentDate = datetime.datetime.today()
+	def build():
+		if wantsCompact():
+			return compactResponse([compact.product(doc) for doc in home.store.expiring(currentDate, days, PRODUCT_FIELDS, raw=True)])
+		expiring = home.store.expiring(currentDate, days, PRODUCT_FIELDS)
+		return jsonify(list(expiring))
+
+	# the list also changes when a product in it expires or the next
+	# one comes within range
+	window = datetime.timedelta(days=days)
+	def validUntil(now):
+		limits = [home.store.nextExpiry(now), home.store.nextExpiry(now + window)]
+		if limits[1] != None:
+			limits[1] -= window
+		limits = [limit for limit in limits if limit != None]
+		return min(limits) if limits else None
+	return conditionalResponse("product", build, validUntil)
 
 @app.route('/add-product', methods=['POST'])
 def addProduct():
-	''' takes in a product type, expiration date, any notes
-		generates a new Product object. JSON format must be
+	''' takes in a product type, expiration date, quantity, any notes
+		generates a new Product object. quantity defaults to 1 and is a
+		number of unit (a count if unit is left out) or text such as
+		"500 g"; it is stored in the unit's base unit. JSON format must be
 		as follows:
 
 		{
 			"prodType" : "example name",
 			"expDate": "1/1/1970",
+			"quantity": 2,
+			"unit": "kg",
 			"note": "example note"
 		}
 	'''
 
+	home = household()
+
 	# recieve and parse incoming JSON data
 	data = request.get_json()
 	prodType = data["prodType"].lower()
 	expDate = data["expDate"]
 	note = data["note"]
+	try:
+		quantity, unit = units.parse(data.get("quantity", 1), data.get("unit"))
+	except ValueError as e:
+		return jsonify(success=False, message=str(e))
 
 	# Creates new Product object and saves it to database
 	if note == None:
 		newProduct = Product(
 			prodType=prodType,
 			expDate=expDate,
+			quantity=quantity,
+			unit=unit
 		)
 	else:
 		newProduct = Product(
 			prodType=prodType,
 			expDate=expDate,
+			quantity=quantity,
+			unit=unit,
 			note=note
 		)
-	newProduct.save()
+	home.store.add(newProduct)
+	productsChanged(home)
+	publishChange(home, "add", "product", {"docs": [newProduct]})
 
 	return jsonify(success=True)
 
 @app.route('/add-recipe', methods=['POST'])
 def addRecipe():
-	''' adds recipe to database. JSON format must be
-		as follows:
+	''' adds recipe to database. every ingredient needs a quantity,
+		given as a count or as text with a unit such as "500 g". JSON
+		format must be as follows:
 
 		{
 			"rcpName": "example name",
 			"ingredients": {
 				"example ingredient name" : 4,
-				"example ingredient name" : 2
+				"example ingredient name" : "250 ml"
 			},
 			"instructions": "example instructions"
 		}
 	'''
 
+	home = household()
+
 	# recieve and parse incoming JSON data
 	data = request.get_json()
 	rcpName = data["rcpName"]
-	ingredients = data["ingredients"]
+	try:
+		ingredients, ingredientUnits = units.parseIngredients(data["ingredients"], data.get("units"))
+	except ValueError as e:
+		return jsonify(success=False, message=str(e))
 	instructions = data["instructions"]
 
 	# Creates new Recipe object
 	newRecipe = Recipe(
 		name=rcpName,
 		ingredients=ingredients,
+		units=ingredientUnits,
 		instructions=instructions
 	)
-	newRecipe.save()
+	home.store.add(newRecipe)
+	recipesChanged(home)
+	publishChange(home, "add", "recipe", {"docs": [newRecipe]})
+
+	return jsonify(success=True)
+
+def bulkResponse(importer):
+	''' imports the request body with importer, reading it as a JSON
+		array, newline-delimited JSON or CSV based on its Content-Type
+	'''
+
+	fmt = bulk.formatOf(request.content_type or "")
+	stream = io.TextIOWrapper(request.stream, encoding="utf-8")
+	try:
+		inserted, errors = importer(household().store, bulk.iterRows(stream, fmt))
+	except ValueError as e:
+		return jsonify(success=False, message="Could not read import: " + str(e))
+	return jsonify(success=len(errors) == 0, inserted=inserted, errors=errors)
+
+@app.route('/bulk/products', methods=['POST'])
+def bulkProducts():
+	''' adds many products at once. body is a JSON array of objects in
+		the /add-product format, newline-delimited JSON (application/x-ndjson)
+		or CSV (text/csv) with a prodType,expDate,note header and
+		optional quantity and unit columns
+	'''
+
+	home = household()
+	response = bulkResponse(bulk.importProducts)
+	productsChanged(home)
+	publishChange(home, "reset", "product", {})
+	return response
+
+@app.route('/bulk/recipes', methods=['POST'])
+def bulkRecipes():
+	''' adds many recipes at once. body is a JSON array of objects in
+		the /add-recipe format, newline-delimited JSON (application/x-ndjson)
+		or CSV (text/csv) with a rcpName,ingredients,instructions header
+		where ingredients are written as "type:qty;type:qty" and a qty may
+		carry a unit, as in "flour:500 g"
+	'''
+
+	home = household()
+	response = bulkResponse(bulk.importRecipes)
+	recipesChanged(home)
+	publishChange(home, "reset", "recipe", {})
+	return response
+
+@app.route('/make-recipe', methods=['POST'])
+def makeRecipe():
+	''' takes the ingredients used by a recipe from inventory, deleting
+		products only once they are used up. JSON format must be as follows:
+
+		{
+			"rcpName": "example name"
+		}
+	'''
+
+	home = household()
+
+	# recieve and parse incoming JSON data
+	data = request.get_json()
+	rcpName = data["rcpName"]
+
+	# retrieve recipe from database
+	recipe = home.recipeCache.get(rcpName)
+	if recipe == None:
+		home.searchIndex.fill(home.store)
+		return jsonify(success=False, message="No recipe with that name found in database.", suggestions=home.searchIndex.names(rcpName, SUGGESTION_LIMIT))
+
+	# check if needed ingredients type/qty in products collection
+	shortfall = recipe.shortfall(home.store.stockCounts(recipe.ingredients))
+	if shortfall:
+		return jsonify(success=False, message="Not enough ingredients in inventory.", shortfall=shortfall)
+
+	# stock may still run out if another request consumes it first, in
+	# which case none of it is taken
+	missing, used, left = home.store.consume(recipe)
+	if missing:
+		return jsonify(success=False, message="Inventory changed while making recipe.", shortfall=missing)
+	productsChanged(home)
+	publishChange(home, "consume", "product", {
+		"recipe": recipe.name,
+		"ids": [str(docId) for docId in used],
+		"quantities": {str(docId): left[docId] for docId in left}
+	})
 
 	return jsonify(success=True)
 
@@ -191,25 +1022,89 @@ def deleteProduct():
 		}
 	'''
 
+	home = household()
+
 	# immediately returns if no products in db
-	if Product.objects.count() == 0:
+	if home.store.countProducts() == 0:
 		return jsonify(success=False, message="No products in database.")
 
 	# recieve and parse incoming JSON data
 	data = request.get_json()
-	prodId = data["prodId"]
+
+	# IDs sent as numbers are matched as /delete-products matches them
+	prodId = str(data["prodId"])
 
 	if prodId == "all":
-		Product.objects.delete()
+		home.store.deleteAllProducts()
+		productsChanged(home)
+		publishChange(home, "reset", "product", {})
+		return jsonify(success=True)
+	else:
+		# finds and deletes product with one indexed lookup
+		matches = home.store.findProducts(prodId)
+		if len(matches) == 0:
+			return jsonify(success=False, message="Invalid ID. Check inventory and make sure ID is correct.")
+		if len(matches) > 1:
+			return jsonify(success=False, message="Ambiguous ID. More than one product ends in " + prodId + "; include more characters of the ID.")
+		home.store.delete(matches[0])
+		productsChanged(home)
+		publishChange(home, "delete", "product", {"ids": [str(matches[0].id)]})
 		return jsonify(success=True)
+
+@app.route('/delete-products', methods=['POST'])
+def deleteProducts():
+	''' deletes several products at once, either by ID or by filter,
+		with a single delete. JSON format must be one of the following:
+
+		{
+			"prodIds": ["last four characters of Mongo _id", ...]
+		}
+
+		{
+			"prodType": "example name",
+			"expiredBefore": "1970-01-01"
+		}
+
+		where either filter may be left out. IDs are checked before
+		anything is deleted; returns the full IDs of the deleted products
+	'''
+
+	home = household()
+
+	# recieve and parse incoming JSON data
+	data = request.get_json()
+	prodIds = data.get("prodIds")
+	prodType = data.get("prodType")
+	expiredBefore = data.get("expiredBefore")
+
+	if prodIds != None:
+		if not isinstance(prodIds, list) or len(prodIds) == 0:
+			return jsonify(success=False, message="prodIds must be a list of IDs.")
+
+		# finds every product with one indexed lookup
+		matches = home.store.findManyProducts([str(prodId) for prodId in prodIds])
+		invalid = [prodId for prodId in matches if len(matches[prodId]) == 0]
+		if invalid:
+			return jsonify(success=False, message="Invalid ID. Check inventory and make sure ID is correct.", invalid=invalid)
+		ambiguous = [prodId for prodId in matches if len(matches[prodId]) > 1]
+		if ambiguous:
+			return jsonify(success=False, message="Ambiguous ID. More than one product ends in " + ", ".join(ambiguous) + "; include more characters of the ID.", ambiguous=ambiguous)
+		deleted = home.store.deleteProducts(ids=[matches[prodId][0].id for prodId in matches])
+
+	elif prodType != None or expiredBefore != None:
+		try:
+			before = datetime.datetime.strptime(expiredBefore, DATE_FORMAT) if expiredBefore != None else None
+		except (TypeError, ValueError):
+			return jsonify(success=False, message="expiredBefore must be written as YYYY-MM-DD.")
+		deleted = home.store.deleteProducts(prodType=prodType.lower() if prodType != None else None, before=before)
+
 	else:
-		# finds and deletes product after confirmation
-		for product in Product.objects():
-			targ = str(product.id)[-4:]
-			if targ == prodId:
-				product.delete()
-				return jsonify(success=True)
-		return jsonify(success=False, message="Invalid ID. Check inventory and make sure ID is correct.")
+		return jsonify(success=False, message="Give prodIds, prodType or expiredBefore.")
+
+	if deleted:
+		productsChanged(home)
+		publishChange(home, "delete", "product", {"ids": [str(docId) for docId in deleted]})
+	return jsonify(success=True, deleted=[str(docId) for docId in deleted])
 
 @app.route('/delete-recipe', methods=['POST'])
 def deleteRecipe():
@@ -221,25 +1116,40 @@ def deleteRecipe():
 		}
 	'''
 
+	home = household()
+
 	# immediately returns if no recipes in db
-	if Recipe.objects.count() == 0:
+	if home.store.countRecipes() == 0:
 		return jsonify(success=False, message="No recipes in database.")
 
 	# recieve and parse incoming JSON data
 	data = request.get_json()
-	rcpId = data["rcpId"]
+
+	# IDs sent as numbers are matched as /delete-products matches them
+	rcpId = str(data["rcpId"])
 
 	if rcpId == "all":
-		Recipe.objects.delete()
+		home.store.deleteAllRecipes()
+		recipesChanged(home)
+		publishChange(home, "reset", "recipe", {})
 		return jsonify(success=True)
 	else:
-		# finds and deletes recipe after confirmation
-		for recipe in Recipe.objects():
-			targ = str(recipe.id)[-4:]
-			if targ == rcpId:
-				recipe.delete()
-				return jsonify(success=True)
-		return jsonify(success=False, message="Invalid ID. Check inventory and make sure ID is correct.")
+		# finds and deletes recipe with one indexed lookup
+		matches = home.store.findRecipes(rcpId)
+		if len(matches) == 0:
+			return jsonify(success=False, message="Invalid ID. Check inventory and make sure ID is correct.")
+		if len(matches) > 1:
+			return jsonify(success=False, message="Ambiguous ID. More than one recipe ends in " + rcpId + "; include more characters of the ID.")
+		home.store.delete(matches[0])
+		recipesChanged(home)
+		publishChange(home, "delete", "recipe", {"ids": [str(matches[0].id)]})
+		return jsonify(success=True)
+
+# every route but the test page and metrics also serves each household
+# under /households/<household>; the unprefixed routes serve the default one
+for rule in list(app.url_map.iter_rules()):
+	if rule.endpoint not in ("index", "static", "metrics"):
+		app.add_url_rule("/households/<household>" + rule.rule, rule.endpoint, methods=rule.methods - {"HEAD", "OPTIONS"})
 
 if __name__ == "__main__":
 
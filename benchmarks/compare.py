@@ -0,0 +1,54 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import sys
+import json
+
+def load(path):
+	with open(path) as results_file:
+		return json.load(results_file)
+
+def main():
+	''' prints p50/p99 latency and queries per op of two benchmark runs
+		side by side, e.g. from before and after a commit or from two
+		storage engines
+	'''
+
+	if len(sys.argv) != 3:
+		print("Usage: python3 benchmarks/compare.py BEFORE.json AFTER.json")
+		sys.exit(1)
+
+	before = load(sys.argv[1])
+	after = load(sys.argv[2])
+	# runs from before stores were selectable used Mongo
+	print("before: " + str(before["commit"]) + " (" + before.get("storage", "mongo") + ")")
+	print("after:  " + str(after["commit"]) + " (" + after.get("storage", "mongo") + ")\n")
+	print("{:>9} {:<40} {:>10} {:>10} {:>7} {:>10} {:>10} {:>9}".format("size", "scenario", "p50 before", "p50 after", "ratio", "p99 before", "p99 after", "queries"))
+
+	for size in after["results"]:
+		for name in after["results"][size]:
+			new = after["results"][size][name]
+			old = before["results"].get(size, {}).get(name)
+			if old == None or "p50" not in new or "p50" not in old:
+				continue
+			ratio = new["p50"] / old["p50"] if old["p50"] else float("inf")
+			queries = "{:g}->{:g}".format(old["queries"], new["queries"])
+			print("{:>9} {:<40} {:>10.2f} {:>10.2f} {:>6.2f}x {:>10.2f} {:>10.2f} {:>9}".format(size, name, old["p50"], new["p50"], ratio, old["p99"], new["p99"], queries))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,114 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import threading
+import urllib.error
+import urllib.request
+
+def request(url, payload=None):
+	''' sends one GET, or POST when payload is given, and returns the status
+	'''
+
+	data = None
+	headers = {}
+	if payload != None:
+		data = json.dumps(payload).encode()
+		headers["Content-Type"] = "application/json"
+	try:
+		with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers)) as response:
+			response.read()
+			return response.status
+	except urllib.error.HTTPError as e:
+		return e.code
+
+def newProduct(rng):
+	expDate = datetime.date.today() + datetime.timedelta(days=rng.randint(-30, 60))
+	return {"prodType": "load" + str(rng.randint(0, 49)), "expDate": expDate.isoformat(), "note": None}
+
+def run(url, path, clients, duration, households=0):
+	''' sends requests to one route from clients threads for duration
+		seconds and returns requests/second, latency percentiles in
+		milliseconds and the number of failed requests. with households,
+		each request goes to the route of a random one of that many
+	'''
+
+	deadline = time.perf_counter() + duration
+	times = []
+	errors = [0]
+	lock = threading.Lock()
+
+	def client(number):
+		rng = random.Random(number)
+		while time.perf_counter() < deadline:
+			payload = newProduct(rng) if path == "/add-product" else None
+			prefix = "/households/load" + str(rng.randrange(households)) if households else ""
+			start = time.perf_counter()
+			try:
+				status = request(url + prefix + path, payload)
+			except OSError:
+				status = None
+			elapsed = time.perf_counter() - start
+			with lock:
+				times.append(elapsed)
+				if status != 200:
+					errors[0] += 1
+
+	threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+	start = time.perf_counter()
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	elapsed = time.perf_counter() - start
+
+	times.sort()
+	def percentile(p):
+		return times[min(len(times) - 1, int(p / 100.0 * len(times)))] * 1000 if times else None
+	return {
+		"requests": len(times),
+		"requestsPerSecond": len(times) / elapsed,
+		"p50": percentile(50),
+		"p99": percentile(99),
+		"errors": errors[0]
+	}
+
+def main():
+	parser = argparse.ArgumentParser(description="Load tests a running GroceryHelper API, e.g. the dev server from api.py against serve.py.")
+	parser.add_argument("--url", default="http://127.0.0.1:5000")
+	parser.add_argument("--routes", default="/products,/add-product", help="comma-separated routes to load; /add-product posts random products")
+	parser.add_argument("--clients", type=int, default=16, help="concurrent client threads")
+	parser.add_argument("--duration", type=float, default=10, help="seconds to load each route for")
+	parser.add_argument("--households", type=int, default=0, help="spread requests over this many households instead of the default one")
+	args = parser.parse_args()
+
+	results = {}
+	for path in args.routes.split(","):
+		results[path] = run(args.url, path, args.clients, args.duration, args.households)
+		print("{:<20} {:8.1f} req/s  p50 {:8.2f} ms  p99 {:8.2f} ms  errors {}".format(
+			path, results[path]["requestsPerSecond"], results[path]["p50"] or 0, results[path]["p99"] or 0, results[path]["errors"]), file=sys.stderr)
+
+	json.dump({"url": args.url, "clients": args.clients, "duration": args.duration, "households": args.households, "results": results}, sys.stdout, indent=2)
+
+if __name__ == "__main__":
+	main()
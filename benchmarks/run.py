@@ -0,0 +1,574 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import tempfile
+import threading
+import contextlib
+import subprocess
+from unittest import mock
+from pymongo import monitoring
+
+try:
+	import resource
+except ImportError:
+	resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import seed
+import shopping
+from models import DEFAULT_HOUSEHOLD
+
+# rows sent per request by the bulk import scenarios
+BULK_ROWS = 1000
+
+# products removed per op by the multi-product delete scenarios
+DELETE_BATCH = 30
+
+# meals in every plan sent by the shopping list scenarios
+PLAN_MEALS = 200
+
+# threads used by the concurrent make-recipe scenario
+CONCURRENCY = 8
+
+# products and recipes of every household seeded by --households
+HOUSEHOLD_PRODUCTS = 50
+HOUSEHOLD_RECIPES = 20
+
+# statements run by the SQLite store that aren't queries
+SQLITE_CONTROL = ("BEGIN", "COMMIT", "ROLLBACK", "PRAGMA")
+
+# mongomock collection methods counted as one query each, including the
+# legacy insert/update/remove calls mongoengine 0.16 still makes
+MOCK_OPERATIONS = (
+	"find", "aggregate", "count", "count_documents", "insert", "insert_one", "insert_many",
+	"update", "update_one", "update_many", "remove", "delete_one", "delete_many",
+	"find_one_and_update", "bulk_write", "save"
+)
+
+class QueryCounter(monitoring.CommandListener):
+	''' counts database operations from every thread, through pymongo
+		command monitoring against a real mongod or by wrapping mongomock's
+		collection methods (approximate, as mongomock has no wire protocol)
+	'''
+
+	def __init__(self, mock):
+		self.total = 0
+		self.lock = threading.Lock()
+		if mock:
+			import mongomock
+			for name in MOCK_OPERATIONS:
+				if hasattr(mongomock.collection.Collection, name):
+					self.wrap(mongomock.collection.Collection, name)
+		else:
+			monitoring.register(self)
+
+	def wrap(self, cls, name):
+		original = getattr(cls, name)
+		def counted(*args, **kwargs):
+			self.add()
+			return original(*args, **kwargs)
+		setattr(cls, name, counted)
+
+	def add(self):
+		with self.lock:
+			self.total += 1
+
+	def started(self, event):
+		self.add()
+
+	def succeeded(self, event):
+		pass
+
+	def failed(self, event):
+		pass
+
+	def statement(self, sql):
+		if not sql.startswith(SQLITE_CONTROL):
+			self.add()
+
+def peakRss():
+	''' returns the peak resident set size of this process in KB
+	'''
+
+	if resource == None:
+		return None
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return peak // 1024 if sys.platform == "darwin" else peak
+
+def percentile(times, p):
+	return times[min(len(times) - 1, int(round(p / 100.0 * (len(times) - 1))))]
+
+def measure(ops, counter, rows=None):
+	''' runs each op once and returns its latency percentiles in
+		milliseconds, queries per op, response size for API ops and peak RSS
+	'''
+
+	times = []
+	sizes = []
+	before = counter.total
+	for op in ops:
+		start = time.perf_counter()
+		response = op()
+		times += [time.perf_counter() - start]
+		if hasattr(response, "get_data"):
+			sizes += [len(response.get_data())]
+	queries = counter.total - before
+
+	times.sort()
+	result = {
+		"n": len(times),
+		"p50": percentile(times, 50) * 1000,
+		"p95": percentile(times, 95) * 1000,
+		"p99": percentile(times, 99) * 1000,
+		"mean": sum(times) / len(times) * 1000,
+		"queries": queries / float(len(times)),
+		"peakRssKb": peakRss()
+	}
+	if rows != None:
+		result["rowsPerSecond"] = rows * len(times) / sum(times)
+	if sizes:
+		result["bytes"] = sum(sizes) / len(sizes)
+	return result
+
+def measureConcurrent(ops, threads):
+	''' runs ops spread over threads and returns the overall throughput
+	'''
+
+	queue = iter(ops)
+	lock = threading.Lock()
+	def worker():
+		while True:
+			with lock:
+				op = next(queue, None)
+			if op == None:
+				return
+			op()
+
+	start = time.perf_counter()
+	workers = [threading.Thread(target=worker) for i in range(threads)]
+	for thread in workers:
+		thread.start()
+	for thread in workers:
+		thread.join()
+	elapsed = time.perf_counter() - start
+	return {"n": len(ops), "threads": threads, "opsPerSecond": len(ops) / elapsed, "peakRssKb": peakRss()}
+
+def sample(docs, count, rng):
+	''' picks count random documents from an iterable in one pass, so
+		any store's listing can be sampled without holding all of it
+	'''
+
+	chosen = []
+	for i, doc in enumerate(docs):
+		if i < count:
+			chosen += [doc]
+		else:
+			j = rng.randint(0, i)
+			if j < count:
+				chosen[j] = doc
+	return chosen
+
+def sampleIds(listing, count, rng):
+	''' returns the ID suffixes of count random documents, long enough
+		not to collide
+	'''
+
+	return [str(doc.id)[-8:] for doc in sample(listing(), count, rng)]
+
+def sampleNames(listing, count, rng):
+	return [doc.name for doc in sample(listing(), count, rng)]
+
+def productRows(rng, count):
+	today = datetime.datetime.today()
+	return [{
+		"prodType": rng.choice(seed.prodTypes()),
+		"expDate": (today + datetime.timedelta(days=rng.randint(-30, 60))).strftime("%Y-%m-%d"),
+		"note": None
+	} for i in range(count)]
+
+def restocked(store, repeat, rng):
+	''' adds DELETE_BATCH products per op before timing starts and
+		returns their ID suffixes in batches, so delete scenarios neither
+		drain the pantry nor pick a product twice
+	'''
+
+	ids = [str(docId)[-8:] for docId in seed.restock(store, repeat * DELETE_BATCH, rng)]
+	return [ids[i:i + DELETE_BATCH] for i in range(0, len(ids), DELETE_BATCH)]
+
+def inSequence(ops):
+	return lambda: [op() for op in ops]
+
+def mealPlan(listing, rng):
+	''' returns a shopping list plan of PLAN_MEALS random recipes cooked
+		over the coming week
+	'''
+
+	today = datetime.date.today()
+	return [{
+		"rcpName": name,
+		"batches": rng.randint(1, 3),
+		"date": (today + datetime.timedelta(days=rng.randint(0, 6))).strftime("%Y-%m-%d")
+	} for name in sampleNames(listing, PLAN_MEALS, rng)]
+
+def searchQueries(listing, count, rng, typo):
+	''' returns count queries for the search scenarios, each the start
+		of a product type or recipe name, or with typo the whole of one
+		with two neighbouring letters swapped
+	'''
+
+	words = [rng.choice(seed.prodTypes()) for i in range(count - count // 2)] + sampleNames(listing, count // 2, rng)
+	queries = []
+	for word in words:
+		if typo:
+			i = rng.randint(1, len(word) - 3)
+			queries += [word[:i] + word[i + 1] + word[i] + word[i + 2:]]
+		else:
+			queries += [word[:rng.randint(3, len(word) - 1)]]
+	return queries
+
+def scripted(fn, answers, *args):
+	''' returns an op that calls fn with input() answered from answers
+		and its output discarded
+	'''
+
+	def op():
+		feed = iter(answers)
+		with mock.patch("builtins.input", lambda prompt="": next(feed)):
+			with contextlib.redirect_stdout(io.StringIO()):
+				fn(*args)
+	return op
+
+def lineBuffered(fn, *args):
+	''' returns an op that calls fn with its output written to the null
+		device a line at a time, flushing after each one as a terminal does
+	'''
+
+	def op():
+		with open(os.devnull, "w", buffering=1) as null:
+			with contextlib.redirect_stdout(null):
+				fn(*args)
+	return op
+
+def checked(response):
+	''' reads a test client response, failing the run on server errors
+		so a broken route can't pass for a fast one
+	'''
+
+	response.get_data()
+	if response.status_code >= 500:
+		raise RuntimeError("Server error: " + response.status)
+	return response
+
+def apiScenarios(api, repeat, rng):
+	''' returns {name:(build ops, rows per op)} for every API route
+	'''
+
+	client = api.app.test_client()
+	home = api.households.get(DEFAULT_HOUSEHOLD)
+	products = home.store.products
+	recipes = home.store.recipes
+
+	def get(path, headers=None):
+		return lambda: checked(client.get(path, headers=headers))
+
+	def post(path, payload):
+		return lambda: checked(client.post(path, json=payload))
+
+	def etag(path):
+		return client.get(path).headers.get("ETag")
+
+	# rebuilds the recipe index as after a recipe is added
+	def coldIndex():
+		home.recipeCache.clear()
+		get("/recommendations")()
+
+	# rebuilds the search index as after a bulk import
+	def coldSearch():
+		home.searchIndex.reset()
+		get("/search?q=type")()
+
+	def ndjson(rows):
+		body = "\n".join(json.dumps(row) for row in rows)
+		return lambda: checked(client.post("/bulk/products", data=body, content_type="application/x-ndjson"))
+
+	return {
+		"api GET /products": (lambda: [get("/products")] * repeat, None),
+		"api GET /products gzip": (lambda: [get("/products", {"Accept-Encoding": "gzip"})] * repeat, None),
+		"api GET /products If-None-Match": (lambda: [get("/products", {"If-None-Match": etag("/products")})] * repeat, None),
+		"api GET /products?limit=100": (lambda: [get("/products?limit=100")] * repeat, None),
+		"api GET /products?stream=true": (lambda: [get("/products?stream=true")] * repeat, None),
+		"api GET /products?format=compact": (lambda: [get("/products?format=compact")] * repeat, None),
+		"api GET /products?stream=true&format=compact": (lambda: [get("/products?stream=true&format=compact")] * repeat, None),
+		"api GET /recipes": (lambda: [get("/recipes")] * repeat, None),
+		"api GET /recipes?format=compact": (lambda: [get("/recipes?format=compact")] * repeat, None),
+		"api GET /recipes If-None-Match": (lambda: [get("/recipes", {"If-None-Match": etag("/recipes")})] * repeat, None),
+		"api GET /expired": (lambda: [get("/expired")] * repeat, None),
+		"api GET /expired gzip": (lambda: [get("/expired", {"Accept-Encoding": "gzip"})] * repeat, None),
+		"api GET /expired If-None-Match": (lambda: [get("/expired", {"If-None-Match": etag("/expired")})] * repeat, None),
+		"api GET /expired?format=compact": (lambda: [get("/expired?format=compact")] * repeat, None),
+		"api GET /expiring": (lambda: [get("/expiring")] * repeat, None),
+		"api GET /inventory/summary": (lambda: [get("/inventory/summary")] * repeat, None),
+		"api GET /makeable-recipes": (lambda: [get("/makeable-recipes")] * repeat, None),
+		"api GET /recommendations": (lambda: [get("/recommendations")] * repeat, None),
+		"api GET /recommendations cold index": (lambda: [coldIndex] * repeat, None),
+		"api GET /search prefix": (lambda: [get("/search?q=" + query) for query in searchQueries(recipes, repeat, rng, False)], None),
+		"api GET /search typo": (lambda: [get("/search?q=" + query) for query in searchQueries(recipes, repeat, rng, True)], None),
+		"api GET /search cold index": (lambda: [coldSearch] * repeat, None),
+		"api POST /add-product": (lambda: [post("/add-product", row) for row in productRows(rng, repeat)], 1),
+		"api POST /bulk/products": (lambda: [ndjson(productRows(rng, BULK_ROWS)) for i in range(repeat)], BULK_ROWS),
+		"api POST /delete-product": (lambda: [post("/delete-product", {"prodId": prodId}) for prodId in sampleIds(products, repeat, rng)], None),
+		"api POST /delete-product x30": (lambda: [inSequence([post("/delete-product", {"prodId": prodId}) for prodId in batch]) for batch in restocked(home.store, repeat, rng)], DELETE_BATCH),
+		"api POST /delete-products 30 ids": (lambda: [post("/delete-products", {"prodIds": batch}) for batch in restocked(home.store, repeat, rng)], DELETE_BATCH),
+		"api POST /delete-recipe": (lambda: [post("/delete-recipe", {"rcpId": rcpId}) for rcpId in sampleIds(recipes, repeat, rng)], None),
+		"api POST /make-recipe": (lambda: [post("/make-recipe", {"rcpName": name}) for name in sampleNames(recipes, repeat, rng)], None),
+		"api POST /make-recipe per-unit stock": (lambda: [post("/make-recipe", {"rcpName": name}) for name in seed.staples(home.store, repeat, False)], None),
+		"api POST /make-recipe consolidated stock": (lambda: [post("/make-recipe", {"rcpName": name}) for name in seed.staples(home.store, repeat, True)], None),
+		"api POST /make-recipe misspelt": (lambda: [post("/make-recipe", {"rcpName": query}) for query in searchQueries(recipes, repeat, rng, True)], None),
+		"api POST /shopping-list": (lambda: [post("/shopping-list", {"plan": mealPlan(recipes, rng)}) for i in range(repeat)], PLAN_MEALS)
+	}
+
+def cliScenarios(cli, repeat, rng):
+	''' returns {name:(build ops, rows per op)} for the CLI functions,
+		driven through scripted input
+	'''
+
+	products = cli.store.products
+	recipes = cli.store.recipes
+
+	# the first check after install reports every expired product; later
+	# ones only what expired since the previous check
+	def firstRun(op):
+		def call():
+			cli.expiryWatch.watermark = None
+			op()
+		return call
+
+	def importOps():
+		ops = []
+		for i in range(repeat):
+			path = os.path.join(tempfile.mkdtemp(), "import.ndjson")
+			with open(path, "w") as data_file:
+				data_file.write("\n".join(json.dumps(row) for row in productRows(rng, BULK_ROWS)))
+			ops += [scripted(cli.importFile, [], path)]
+		return ops
+
+	return {
+		"cli displayInventory": (lambda: [scripted(cli.displayInventory, [])] * repeat, None),
+		"cli displayInventory summary": (lambda: [scripted(cli.displayInventory, [], True)] * repeat, None),
+		"cli displayInventory line-buffered": (lambda: [lineBuffered(cli.displayInventory)] * repeat, None),
+		"cli displayRecipes": (lambda: [scripted(cli.displayRecipes, [])] * repeat, None),
+		"cli displayRecipes line-buffered": (lambda: [lineBuffered(cli.displayRecipes)] * repeat, None),
+		"cli displayMakeable": (lambda: [scripted(cli.displayMakeable, [])] * repeat, None),
+		"cli displayRecommendations": (lambda: [scripted(cli.displayRecommendations, [])] * repeat, None),
+		"cli displaySearch": (lambda: [scripted(cli.displaySearch, [query]) for query in searchQueries(recipes, repeat, rng, True)], None),
+		"cli checkExpired first run": (lambda: [firstRun(scripted(cli.checkExpired, ["n"]))] * repeat, None),
+		"cli checkExpired incremental": (lambda: [scripted(cli.checkExpired, ["n"])] * repeat, None),
+		"cli addProduct": (lambda: [scripted(cli.addProduct, ["milk", "12", "31", "2030", "0", "0"])] * repeat, 1),
+		"cli importFile": (importOps, BULK_ROWS),
+		"cli deleteProduct": (lambda: [scripted(cli.deleteProduct, [prodId, "y"]) for prodId in sampleIds(products, repeat, rng)], None),
+		"cli deleteProduct x30": (lambda: [inSequence([scripted(cli.deleteProduct, [prodId, "y"]) for prodId in batch]) for batch in restocked(cli.store, repeat, rng)], DELETE_BATCH),
+		"cli deleteProduct 30 ids": (lambda: [scripted(cli.deleteProduct, [" ".join(batch), "y"]) for batch in restocked(cli.store, repeat, rng)], DELETE_BATCH),
+		"cli makeRecipe": (lambda: [scripted(cli.makeRecipe, [name, "y", "y"]) for name in sampleNames(recipes, repeat, rng)], None),
+		"cli displayShoppingList": (lambda: [scripted(cli.displayShoppingList, [], shopping.parsePlan(mealPlan(recipes, rng))) for i in range(repeat)], PLAN_MEALS)
+	}
+
+def startupScenarios(configPath, repeat):
+	''' returns {name:ops} each starting cli.py in a new interpreter:
+		importing it, exiting at the first menu (measuring import,
+		connection and the expired-product check), printing --help and
+		running a subcommand
+	'''
+
+	env = dict(os.environ, GROCERYHELPER_CONFIG=configPath)
+	def run(args, answers=b""):
+		def op():
+			subprocess.run([sys.executable] + args, input=answers, env=env, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+		return op
+
+	return {
+		"cli startup import": [run(["-c", "import cli"])] * repeat,
+		"cli startup": [run(["cli.py"], b"0\n")] * repeat,
+		"cli startup --help": [run(["cli.py", "--help"])] * repeat,
+		"cli startup list --format json": [run(["cli.py", "list", "--format", "json"])] * repeat
+	}
+
+def concurrentScenario(api, repeat, rng):
+	''' make-recipe requests for random recipes from CONCURRENCY threads,
+		each with its own test client
+	'''
+
+	local = threading.local()
+	def op(name):
+		def call():
+			if not hasattr(local, "client"):
+				local.client = api.app.test_client()
+			checked(local.client.post("/make-recipe", json={"rcpName": name}))
+		return call
+	return [op(name) for name in sampleNames(api.households.get(DEFAULT_HOUSEHOLD).store.recipes, repeat * CONCURRENCY, rng)]
+
+def householdScenarios(api, names, repeat, rng):
+	''' returns {name:(build ops, rows per op)} for routes of random
+		households among names, each holding a pantry of the same size
+	'''
+
+	client = api.app.test_client()
+
+	def get(path):
+		return lambda: checked(client.get(path))
+
+	def post(path, payload):
+		return lambda: checked(client.post(path, json=payload))
+
+	def anyHousehold(route):
+		return "/households/" + rng.choice(names) + route
+
+	def recipeName():
+		return "recipe{:06d}".format(rng.randrange(HOUSEHOLD_RECIPES))
+
+	return {
+		"household GET /products": (lambda: [get(anyHousehold("/products")) for i in range(repeat)], None),
+		"household GET /inventory/summary": (lambda: [get(anyHousehold("/inventory/summary")) for i in range(repeat)], None),
+		"household GET /makeable-recipes": (lambda: [get(anyHousehold("/makeable-recipes")) for i in range(repeat)], None),
+		"household GET /expiring": (lambda: [get(anyHousehold("/expiring")) for i in range(repeat)], None),
+		"household POST /add-product": (lambda: [post(anyHousehold("/add-product"), row) for row in productRows(rng, repeat)], 1),
+		"household POST /make-recipe": (lambda: [post(anyHousehold("/make-recipe"), {"rcpName": recipeName()}) for i in range(repeat)], None)
+	}
+
+def commit():
+	try:
+		return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmarks GroceryHelper's API routes and CLI functions against a synthetic pantry.")
+	parser.add_argument("--products", default="1000,10000", help="comma-separated pantry sizes to run, e.g. 1000,100000,1000000")
+	parser.add_argument("--recipes", type=int, default=2000, help="number of recipes in every pantry")
+	parser.add_argument("--repeat", type=int, default=20, help="times each scenario is run per pantry size")
+	parser.add_argument("--storage", default="mongo", choices=["mongo", "sqlite", "memory"], help="store to benchmark, as set in config.json")
+	parser.add_argument("--host", default="mongomock://localhost", help="Mongo host; use a throwaway mongod URI for real query counts")
+	parser.add_argument("--db", default="ghbench", help="database to seed; it is emptied first")
+	parser.add_argument("--sqlite", help="SQLite file for --storage sqlite; a temporary one by default")
+	parser.add_argument("--only", default="", help="only run scenarios whose name contains this text")
+	parser.add_argument("--households", help="comma-separated household counts, e.g. 10,1000,5000, to also time the routes of one household among that many, each with " + str(HOUSEHOLD_PRODUCTS) + " products and " + str(HOUSEHOLD_RECIPES) + " recipes")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--output", help="file to write JSON results to instead of stdout")
+	args = parser.parse_args()
+
+	# point both entry points at the benchmark database before importing them
+	mocked = args.storage == "mongo" and args.host.startswith("mongomock://")
+	counter = QueryCounter(mocked)
+	directory = tempfile.mkdtemp()
+	configPath = os.path.join(directory, "config.json")
+	config = {"storage": args.storage, "db": args.db, "host": args.host, "sqlite": args.sqlite or os.path.join(directory, "bench.db")}
+	with open(configPath, "w") as config_file:
+		json.dump(config, config_file)
+	os.environ["GROCERYHELPER_CONFIG"] = configPath
+	import api
+	import cli
+	import expiry
+	import compact
+	import compression
+
+	# the CLI shares the API's view of the default household instead of
+	# connecting in main()
+	home = api.households.get(DEFAULT_HOUSEHOLD)
+	cli.store = home.store
+	cli.expiryWatch = expiry.ExpiryWatch(home.store)
+	if args.storage == "sqlite":
+		api.store.setTrace(counter.statement)
+
+	# startup doesn't depend on pantry size; mongomock and memory stores
+	# start empty in each new process, so only their connection cost shows
+	results = {"startup": {}}
+	startup = startupScenarios(configPath, args.repeat)
+	for name in startup:
+		if args.only in name:
+			results["startup"][name] = measure(startup[name], counter)
+			print("{:>9} {:<40} p50 {:8.2f} ms".format("", name, results["startup"][name]["p50"]), file=sys.stderr)
+
+	rng = random.Random(args.seed)
+	for size in [int(size) for size in args.products.split(",")]:
+		seed.seed(api.store, size, args.recipes, args.seed)
+		api.productsChanged(home)
+		api.recipesChanged(home)
+		cli.recipesChanged()
+
+		scenarios = apiScenarios(api, args.repeat, rng)
+		scenarios.update(cliScenarios(cli, args.repeat, rng))
+
+		results[size] = {}
+		for name in scenarios:
+			if args.only in name:
+				build, rows = scenarios[name]
+				results[size][name] = measure(build(), counter, rows)
+				print("{:>9} {:<40} p50 {:8.2f} ms".format(size, name, results[size][name]["p50"]), file=sys.stderr)
+
+		# mongomock is not thread-safe, so concurrency needs a real mongod
+		name = "api POST /make-recipe concurrent"
+		if args.only in name and not mocked:
+			results[size][name] = measureConcurrent(concurrentScenario(api, args.repeat, rng), CONCURRENCY)
+			print("{:>9} {:<40} {:8.1f} ops/s".format(size, name, results[size][name]["opsPerSecond"]), file=sys.stderr)
+
+	# per-household latency should stay flat as the number of households,
+	# and so the total size of the database, grows
+	for count in [int(count) for count in args.households.split(",")] if args.households else []:
+		names = seed.households(api.store, count, HOUSEHOLD_PRODUCTS, HOUSEHOLD_RECIPES, args.seed)
+		for loaded in api.households.loaded():
+			api.productsChanged(loaded)
+			api.recipesChanged(loaded)
+
+		key = "households " + str(count)
+		results[key] = {}
+		scenarios = householdScenarios(api, names, args.repeat, rng)
+		for name in scenarios:
+			if args.only in name:
+				build, rows = scenarios[name]
+				results[key][name] = measure(build(), counter, rows)
+				print("{:>9} {:<40} p50 {:8.2f} ms".format(count, name, results[key][name]["p50"]), file=sys.stderr)
+
+	report = {
+		"commit": commit(),
+		"date": datetime.datetime.utcnow().isoformat(),
+		"storage": args.storage,
+		"encoder": "orjson" if compact.orjson != None else "json",
+		"encodings": "br,gzip" if compression.brotli != None else "gzip",
+		"host": args.host,
+		"recipes": args.recipes,
+		"householdSize": [HOUSEHOLD_PRODUCTS, HOUSEHOLD_RECIPES],
+		"repeat": args.repeat,
+		"results": results
+	}
+	if args.output:
+		with open(args.output, "w") as output_file:
+			json.dump(report, output_file, indent=2)
+	else:
+		json.dump(report, sys.stdout, indent=2)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,155 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import random
+import datetime
+from bson import ObjectId
+from models import Product, Recipe
+
+# number of distinct product types in a synthetic pantry
+PROD_TYPES = 200
+
+# exponent of the Zipf-like skew; a few staples make up most products
+SKEW = 1.1
+
+# documents written per store.insertMany call while seeding
+SEED_BATCH_SIZE = 5000
+
+# units of every staple stocked by staples(), and how many of them the
+# recipe made from it uses
+STAPLE_UNITS = 12
+STAPLE_USE = 6
+
+# name of the nth household stocked by households()
+HOUSEHOLD_NAME = "house{:05d}"
+
+def prodTypes():
+	return ["type{:03d}".format(i) for i in range(PROD_TYPES)]
+
+def weights():
+	return [1.0 / (rank ** SKEW) for rank in range(1, PROD_TYPES + 1)]
+
+def products(count, rng, today, household=None):
+	''' yields count product documents in stored form, with skewed types
+		and expiration dates from a month ago to two months from today,
+		belonging to household if given and the default household if not
+	'''
+
+	types = prodTypes()
+	for prodType in rng.choices(types, weights(), k=count):
+		_id = ObjectId()
+		doc = {
+			"_id": _id,
+			"prodType": prodType,
+			"expDate": today + datetime.timedelta(hours=rng.randint(-30 * 24, 60 * 24)),
+			"shortId": str(_id)[-4:]
+		}
+		if rng.random() < 0.3:
+			doc["note"] = "note " + str(rng.randint(0, 999))
+		if household != None:
+			doc["household"] = household
+		yield doc
+
+def recipes(count, rng, household=None):
+	''' yields count recipe documents in stored form, each using two to
+		six ingredients drawn with the same skew as products, belonging to
+		household if given
+	'''
+
+	types = prodTypes()
+	typeWeights = weights()
+	for i in range(count):
+		_id = ObjectId()
+		ingredients = {}
+		for prodType in rng.choices(types, typeWeights, k=rng.randint(2, 6)):
+			ingredients[prodType] = rng.randint(1, 3)
+		doc = {
+			"_id": _id,
+			"name": "recipe{:06d}".format(i),
+			"ingredients": ingredients,
+			"instructions": "mix and cook",
+			"shortId": str(_id)[-4:]
+		}
+		if household != None:
+			doc["household"] = household
+		yield doc
+
+def insert(store, docType, docs):
+	batch = []
+	for doc in docs:
+		batch += [docType._from_son(doc)]
+		if len(batch) == SEED_BATCH_SIZE:
+			store.insertMany(docType, batch)
+			batch = []
+	if batch:
+		store.insertMany(docType, batch)
+
+def seed(store, productCount, recipeCount, seed=0):
+	''' empties the store and fills it with a synthetic pantry
+	'''
+
+	rng = random.Random(seed)
+	today = datetime.datetime.today()
+	store.deleteAllProducts()
+	store.deleteAllRecipes()
+	insert(store, Product, products(productCount, rng, today))
+	insert(store, Recipe, recipes(recipeCount, rng))
+
+def households(store, count, productCount, recipeCount, seed=0):
+	''' empties the store and gives each of count households, named by
+		HOUSEHOLD_NAME, its own synthetic pantry of productCount products
+		and recipeCount recipes. returns the household names
+	'''
+
+	rng = random.Random(seed)
+	today = datetime.datetime.today()
+	store.deleteAllProducts()
+	store.deleteAllRecipes()
+	names = [HOUSEHOLD_NAME.format(i) for i in range(count)]
+	insert(store, Product, (doc for name in names for doc in products(productCount, rng, today, name)))
+	insert(store, Recipe, (doc for name in names for doc in recipes(recipeCount, rng, name)))
+	return names
+
+def staples(store, count, consolidated):
+	''' stocks count new staples of STAPLE_UNITS each, as one product
+		holding the whole quantity if consolidated and as one product per
+		unit otherwise, each with a recipe using STAPLE_USE of it. returns
+		the recipe names
+	'''
+
+	expDate = datetime.datetime.today() + datetime.timedelta(days=30)
+	products = []
+	recipes = []
+	for i in range(count):
+		_id = ObjectId()
+		prodType = "staple" + str(_id)
+		for quantity in ([STAPLE_UNITS] if consolidated else [1] * STAPLE_UNITS):
+			productId = ObjectId()
+			products += [{"_id": productId, "prodType": prodType, "expDate": expDate, "quantity": quantity, "unit": "each", "shortId": str(productId)[-4:]}]
+		recipes += [{"_id": _id, "name": prodType, "ingredients": {prodType: STAPLE_USE}, "instructions": "use it", "shortId": str(_id)[-4:]}]
+	insert(store, Product, products)
+	insert(store, Recipe, recipes)
+	return [recipe["name"] for recipe in recipes]
+
+def restock(store, count, rng):
+	''' adds count more products to the store and returns their ids
+	'''
+
+	docs = list(products(count, rng, datetime.datetime.today()))
+	insert(store, Product, docs)
+	return [doc["_id"] for doc in docs]
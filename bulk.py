@@ -0,0 +1,159 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import csv
+import json
+from mongoengine import ValidationError
+from models import Product, Recipe
+import units
+
+# rows validated and written per insert_many call
+BATCH_SIZE = 1000
+
+def formatOf(name):
+	''' guesses the import format from a file name or content type
+	'''
+
+	name = name.lower()
+	if "ndjson" in name or name.endswith(".jsonl"):
+		return "ndjson"
+	if "csv" in name:
+		return "csv"
+	return "json"
+
+def iterRows(stream, fmt):
+	''' yields each row of an import read from a text stream. fmt is
+		"json" for an array of objects, "ndjson" for one object per line
+		or "csv" for a header row naming the fields. ndjson lines are
+		yielded unparsed so a bad line only fails its own row
+	'''
+
+	if fmt == "json":
+		rows = json.load(stream)
+		if not isinstance(rows, list):
+			raise ValueError("JSON imports must be an array of objects.")
+		for row in rows:
+			yield row
+	elif fmt == "ndjson":
+		for line in stream:
+			if line.strip():
+				yield line
+	elif fmt == "csv":
+		try:
+			for row in csv.DictReader(stream):
+				yield row
+		except csv.Error as e:
+			raise ValueError(str(e))
+	else:
+		raise ValueError("Unknown import format: " + fmt)
+
+def parseIngredients(text):
+	''' parses CSV-style ingredients written as "type:qty;type:qty",
+		where a qty may carry a unit as in "flour:500 g"
+	'''
+
+	ingredients = {}
+	for item in text.split(";"):
+		if item.strip():
+			prodType, qty = item.rsplit(":", 1)
+			ingredients[prodType.strip()] = qty.strip()
+	return ingredients
+
+def buildProduct(docType, row):
+	''' creates a product from a row in the /add-product format; an
+		empty quantity or unit, as CSV writes them, counts as left out
+	'''
+
+	note = row.get("note") or None
+	quantity, unit = units.parse(row.get("quantity") or 1, row.get("unit") or None)
+	return docType(
+		prodType=row["prodType"].lower(),
+		expDate=row["expDate"],
+		quantity=quantity,
+		unit=unit,
+		note=note
+	)
+
+def buildRecipe(docType, row):
+	''' creates a recipe from a row in the /add-recipe format; "name"
+		is accepted in place of "rcpName", and "units" gives the unit of
+		ingredients written as bare numbers, as exports write them
+	'''
+
+	name = row["rcpName"] if "rcpName" in row else row["name"]
+	ingredients = row["ingredients"]
+	if isinstance(ingredients, str):
+		ingredients = parseIngredients(ingredients)
+	ingredientUnits = row.get("units") or None
+	if isinstance(ingredientUnits, str):
+		ingredientUnits = parseIngredients(ingredientUnits)
+	ingredients, ingredientUnits = units.parseIngredients(ingredients, ingredientUnits)
+	return docType(
+		name=name.lower(),
+		ingredients=ingredients,
+		units=ingredientUnits,
+		instructions=row["instructions"]
+	)
+
+def importRows(store, docType, rows, build):
+	''' validates each row with build(docType, row) and inserts the
+		results into store in unordered batches. returns the number of
+		documents inserted and a list of {"row", "message"} for every row
+		that failed
+	'''
+
+	inserted = 0
+	errors = []
+	batch = []	# stored as [(row number, document)]
+	for number, row in enumerate(rows, 1):
+		try:
+			if isinstance(row, str):
+				row = json.loads(row)
+			doc = build(docType, row)
+			doc.validate()
+		except KeyError as e:
+			errors += [{"row": number, "message": "Missing field " + str(e)}]
+			continue
+		except (ValueError, TypeError, AttributeError, ValidationError) as e:
+			errors += [{"row": number, "message": str(e)}]
+			continue
+
+		batch += [(number, doc)]
+		if len(batch) == BATCH_SIZE:
+			inserted += insertBatch(store, docType, batch, errors)
+			batch = []
+
+	if batch:
+		inserted += insertBatch(store, docType, batch, errors)
+	return inserted, errors
+
+def insertBatch(store, docType, batch, errors):
+	''' writes one batch with a single insert, adding any rows the
+		database rejected to errors. returns the number of documents inserted
+	'''
+
+	inserted, rejected = store.insertMany(docType, [doc for number, doc in batch])
+	for index, message in rejected:
+		errors += [{"row": batch[index][0], "message": message}]
+	return inserted
+
+def importProducts(store, rows):
+	return importRows(store, Product, rows, buildProduct)
+
+def importRecipes(store, rows):
+	return importRows(store, Recipe, rows, buildRecipe)
@@ -13,112 +13,185 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
+import os
 import sys
+import csv
 import json
+import argparse
+import itertools
 import datetime
-from mongoengine import *
 
-# colors text in Windows command prompt
-from colorama import init, Fore, Back, Style
-init()
+# mongoengine and colorama take most of the startup time, so modules
+# importing them (pantry, models, bulk, shopping) are imported where
+# they're used, after the arguments have been read
+import compact
+import expiry
+import render
+import recommend
+import units
+
+# colorama, imported by colors() the first time text is colored
+colorama = None
+
+# store selected in config.json, opened by main()
+store = None
+
+# remembers when expired products were last reported, opened by main()
+expiryWatch = None
+
+# recipes indexed by ingredient for recommendations, built on first use
+# and dropped when this process changes recipes
+recipeIndex = None
+
+# recipes listed by displayRecommendations()
+RECOMMENDATION_LIMIT = 10
+
+# results listed by displaySearch(), and recipe names suggested when
+# making one that doesn't exist
+SEARCH_LIMIT = 20
+SUGGESTION_LIMIT = 3
+
+# columns displayInventory() can show, each formatting a raw product
+# document at a fixed width
+INVENTORY_COLUMNS = {
+	"id": lambda product: ("ID: " + str(product["_id"])[-4:]).ljust(10),
+	"type": lambda product: str(product["prodType"]).capitalize().ljust(20),
+	"qty": lambda product: ("Qty: " + units.describe(product["quantity"], product["unit"])).ljust(14),
+	"expires": lambda product: ("Expires: " + str(product["expDate"])[:10]).ljust(20),
+	"note": lambda product: str(product.get("note")).ljust(20)
+}
+
+# output formats of the scripting subcommands
+FORMATS = ["table", "json", "csv"]
+
+# fields written by the subcommands in json and csv, as in /products?format=compact
+PRODUCT_FIELDS = ["id", "prodType", "expDate", "quantity", "unit", "note"]
+RECIPE_FIELDS = ["id", "name", "ingredients", "units", "instructions"]
+
+# fields written by make in json and csv, one row for every product a
+# recipe took from, with the quantity left in it (0 when used up)
+TAKEN_FIELDS = ["id", "quantity"]
 
 # Class/Function Definitions
 
-class Recipe(Document):
-	name = StringField(required=True, unique=True, max_length=50)   # stored in lowercase
-	ingredients = DictField(required=True)							# stored as {prodType:qty}
-	instructions = StringField(required=True)
-
-	def canMake(self):
-		for key in self.ingredients:
-			if Product.objects(prodType=key).count() < self.ingredients[key]:
-				return False
-		return True
-
-	def clearIngredients(self):
-		for key in self.ingredients:
-
-			# if only one ingredient of this type used, simply delete
-			if self.ingredients[key] == 1:
-				Product.objects(prodType=key).delete()
-			
-			# otherwise get and delete number used
-			else:
-				for i in range(self.ingredients[key]):
-					Product.objects(prodType=key).first().delete()
-
-class Product(Document):
-	prodType = StringField(required=True, max_length=50)	# stored as lowercase
-	expDate = DateTimeField(required=True)
-	note = StringField(max_length=50)
-
-	def isExpired(self):
-		if self.expDate < currentDate:
-			return True
-		else:
-			return False
+def colors():
+	''' returns colorama, importing it the first time so that it colors
+		text in Windows command prompt
+	'''
 
-	def willExpireSoon(self):
-		targetDate = self.expDate - datetime.timedelta(days=3)
-		if targetDate < currentDate:
-			return True
-		else:
-			return False
+	global colorama
+	if colorama == None:
+		import colorama
+		colorama.init()
+	return colorama
 
 def checkExpired():
-	''' scans through all products and determines what is expired
-		offers user choice to delete expired items from inventory
+	''' lists products that expired since the last check and offers
+		user choice to delete every expired product at once, or to
+		choose them one by one
 	'''
 
-	# scans through all products
-	for product in Product.objects:
+	# range query on the expDate index for products past the watermark
+	today = datetime.datetime.today()
+	expired = expiryWatch.due(today, ["id", "prodType"])
+	if len(expired) == 0:
+		return
 
-		# if product is expired, alert user and prompt if they wish to delete it from inventory
-		if product.isExpired():
+	print(str(len(expired)) + " product(s) expired since the last check:")
+	for product in expired:
+		print("  ID: " + str(product.id)[-4:] + "   " + product.prodType.capitalize())
 
-			while True:
-				choice = str(input(product.prodType.capitalize() + ' with ID ' + str(product.id)[-4:] + ' has expired. Do you wish to delete it from your inventory? Y/N ')).lower()
-				if choice == 'y':
-					product.delete()
-					break
-				elif choice == 'n':
-					break
-				else:
-					print('\nInvalid choice. Please try again.')
+	while True:
+		choice = str(input("Delete all expired products from your inventory? Y/N, or S to choose one at a time: ")).lower()
+		if choice == 'y':
+			print("Deleted " + str(store.deleteExpired(today)) + " expired products.")
+			return
+		elif choice == 'n':
+			return
+		elif choice == 's':
+			break
+		else:
+			print('\nInvalid choice. Please try again.')
+
+	for product in expired:
 
-def displayInventory():
+		# alert user and prompt if they wish to delete it from inventory
+		while True:
+			choice = str(input(product.prodType.capitalize() + ' with ID ' + str(product.id)[-4:] + ' has expired. Do you wish to delete it from your inventory? Y/N ')).lower()
+			if choice == 'y':
+				store.delete(product)
+				break
+			elif choice == 'n':
+				break
+			else:
+				print('\nInvalid choice. Please try again.')
+
+def displayInventory(summary=False, columns=None, width=None, paging=True):
 	''' Displays all items currently in inventory, as well as total size
 		If item is expired item will print in red
+		If summary is set, prints one line per product type instead
+		columns picks from INVENTORY_COLUMNS and width cuts every line
+		Output is written at once, through a pager if it is too long
 	'''
 
-	for product in Product.objects.order_by("prodType", "expDate"):
-
-		prodId = "ID: " + str(product.id)[-4:]
-		prodType = str(product.prodType).capitalize()
-		expDate = "Expires: " + str(product.expDate)[:-9]
-		prodNote = str(product.note)
+	from models import EXPIRING_DAYS
+	Fore, Style = colors().Fore, colors().Style
+
+	today = datetime.datetime.today()
+	buffer = render.Buffer(width)
+
+	if summary:
+		total = 0
+		for group in store.inventorySummary(today, EXPIRING_DAYS):
+			prodType = str(group["prodType"]).capitalize()
+			quantity = "Qty: " + units.describe(group["quantity"], group["unit"])
+			earliest = "Earliest: " + str(group["earliest"])[:-9]
+			latest = "Latest: " + str(group["latest"])[:-9]
+			printGroup = "{} {} {} {}".format(prodType.ljust(20), quantity.ljust(14), earliest.ljust(22), latest.ljust(20))
+
+			# highlight red if any are expired, yellow if any will expire within three days
+			if group["expired"]:
+				buffer.add(printGroup + "Expired: " + str(group["expired"]), Fore.RED, Style.RESET_ALL)
+			elif group["expiring"]:
+				buffer.add(printGroup + "Expiring: " + str(group["expiring"]), Fore.YELLOW, Style.RESET_ALL)
+			else:
+				buffer.add(printGroup)
+			total += group["count"]
 
-		printProduct = "{} {} {} {}".format(prodId.ljust(10), prodType.ljust(20), expDate.ljust(20), prodNote.ljust(20))
+		buffer.add("")
+		buffer.add("Total number of items: " + str(total))
+		buffer.show(paging)
+		return
 
-		# highlight red if item is expired
-		if product.isExpired():
-			print(Fore.RED + str(printProduct))
-			print(Style.RESET_ALL, end='')
-		# highlight yellow if item will expire within three days
-		elif product.willExpireSoon():
-			print(Fore.YELLOW + str(printProduct))
-			print(Style.RESET_ALL, end='')
-		# print normally otherwise
+	# rows are formatted from raw documents, colored by comparing dates
+	# and counted in the same pass
+	formats = [INVENTORY_COLUMNS[column] for column in (columns or INVENTORY_COLUMNS)]
+	soonDate = today + datetime.timedelta(days=EXPIRING_DAYS)
+	total = 0
+	for product in store.products(raw=True):
+		printProduct = " ".join([column(product) for column in formats])
+
+		# highlight red if item is expired, yellow if it will expire within three days
+		expDate = product["expDate"]
+		if expDate < today:
+			buffer.add(printProduct, Fore.RED, Style.RESET_ALL)
+		elif today < expDate < soonDate:
+			buffer.add(printProduct, Fore.YELLOW, Style.RESET_ALL)
 		else:
-			print(printProduct)
+			buffer.add(printProduct)
+		total += 1
 
-	print("\nTotal number of items: " + str(Product.objects.count()))
+	buffer.add("")
+	buffer.add("Total number of items: " + str(total))
+	buffer.show(paging)
 
 def addProduct():
-	''' takes in a product type, expiration date, any notes
+	''' takes in a product type, expiration date, quantity, any notes
 		generates a new Product object
 	'''
 
+	from models import Product
+
 	while True:
 		try:
 			# get product type
@@ -140,12 +213,16 @@ def addProduct():
 			# get expDate year
 			expYear = str(input('Product experation year? (YYYY)? Type "0" if none: '))
 			if expYear == '0':
-				expYear = str(currentDate.year)
+				expYear = str(datetime.datetime.today().year)
 
 			# Consolidates expDateString and creates expDateClass (datetime object)
 			expDateString = ' '.join([expMonth, expDay, expYear])
 			expDateClass = datetime.datetime.strptime(expDateString, '%m %d %Y')
 
+			# get quantity, as a count or with a unit
+			quantity = str(input('Please input the quantity, e.g. 2 or 500 g. Type "0" for one: '))
+			quantity, unit = units.parse(quantity if quantity != "0" else 1)
+
 			# get product note
 			note = str(input('Please input any note you have about this product. Type "0" if none: '))
 			if note == "0":
@@ -162,32 +239,36 @@ def addProduct():
 		newProduct = Product(
 			prodType=prodType,
 			expDate=expDateClass,
+			quantity=quantity,
+			unit=unit
 		)
 	else:
 		newProduct = Product(
 			prodType=prodType,
 			expDate=expDateClass,
+			quantity=quantity,
+			unit=unit,
 			note=note
 		)
-	newProduct.save()
+	store.add(newProduct)
 
 def deleteProduct():
-	''' deletes one or all items from inventory
+	''' deletes one, several or all items from inventory
 	'''
 
 	# immediately returns if no products in db
-	if Product.objects.count() == 0:
+	if store.countProducts() == 0:
 		print("No items in database.")
 		return
 
 	# select product and ensure it is in inventory
-	prodId = str(input('Please input the ID of the product you wish to remove, or input "All" to empty inventory: ')).lower()
+	prodId = str(input('Please input the IDs of the products you wish to remove separated by spaces, or input "All" to empty inventory: ')).lower()
 
 	if prodId == "all":
 		while True:
 			deleteConfirmAll = str(input("Are you sure you wish to delete all products from your inventory? Y/N ")).lower()
 			if deleteConfirmAll == 'y':
-				Product.objects.delete()
+				store.deleteAllProducts()
 				break
 			elif deleteConfirmAll == 'n':
 				break
@@ -196,41 +277,56 @@ def deleteProduct():
 
 	else:
 
-		# finds and deletes product after confirmation
-		for product in Product.objects():
-			targ = str(product.id)[-4:]
-			if targ == prodId:
-				while True:
-					deleteConfirm = str(input("Are you sure you wish to delete " + product.prodType + " with ID " + targ + " from your inventory? Y/N ")).lower()
-					if deleteConfirm == 'y':
-						product.delete()
-						return
-					elif deleteConfirm == 'n':
-						return
-					else:
-						print('\nInvalid choice. Please try again.')
-		print("Invalid ID. Check inventory and make sure ID is correct.")
-
-def displayRecipes():
-	''' displays all recipes in database
-	'''
+		# finds every product with one indexed lookup
+		prodIds = prodId.split()
+		if len(prodIds) == 0:
+			print("Invalid ID. Check inventory and make sure ID is correct.")
+			return
+		matches = store.findManyProducts(prodIds)
+		for prodId in prodIds:
+			if len(matches[prodId]) == 0:
+				print("Invalid ID " + prodId + ". Check inventory and make sure ID is correct.")
+				return
+			if len(matches[prodId]) > 1:
+				print("Ambiguous ID. More than one product ends in " + prodId + "; include more characters of the ID.")
+				return
+		selected = ", ".join(matches[prodId][0].prodType + " with ID " + prodId for prodId in prodIds)
 
-	for recipe in Recipe.objects.order_by("name"):
+		# deletes products together after confirmation
+		while True:
+			deleteConfirm = str(input("Are you sure you wish to delete " + selected + " from your inventory? Y/N ")).lower()
+			if deleteConfirm == 'y':
+				store.deleteProducts(ids=[matches[prodId][0].id for prodId in prodIds])
+				return
+			elif deleteConfirm == 'n':
+				return
+			else:
+				print('\nInvalid choice. Please try again.')
 
-		rcpName = str(recipe.name).capitalize()
-		ingredients = "Ingredients: " + str(recipe.ingredients)
-		instructions = "Instructions: " + str(recipe.instructions)
-		rcpId = "ID: " + str(recipe.id)[-4:]
+def displayRecipes(width=None, paging=True):
+	''' displays all recipes in database, written at once and through a
+		pager if too long. width cuts every line
+	'''
 
-		printRecipe = "{}\n{}\n{}\n{}\n".format(rcpName, ingredients, instructions, rcpId)
-		print(printRecipe)
+	buffer = render.Buffer(width)
+	total = 0
+	for recipe in store.recipes(raw=True):
+		buffer.add(str(recipe["name"]).capitalize())
+		buffer.add("Ingredients: " + units.describeAll(recipe["ingredients"], recipe.get("units", {})))
+		buffer.add("Instructions: " + str(recipe["instructions"]))
+		buffer.add("ID: " + str(recipe["_id"])[-4:])
+		buffer.add("")
+		total += 1
 
-	print("Total number of recipes: " + str(Recipe.objects.count()))
+	buffer.add("Total number of recipes: " + str(total))
+	buffer.show(paging)
 
 def addRecipe():
 	''' adds recipe to database
 	'''
 
+	from models import Recipe
+
 	while True:
 		try:
 			# get recipe name
@@ -238,6 +334,7 @@ def addRecipe():
 
 			# get ingredients
 			ingredients = {}
+			ingredientUnits = {}
 			while True:
 				newType = str(input('Please input next ingredient type. If done, type "0": ')).lower()
 				if newType in ingredients:
@@ -248,8 +345,8 @@ def addRecipe():
 					else:
 						break
 				else:
-					newQty = int(input('Please input the quantity needed: '))
-					ingredients.update({newType:newQty})
+					newQty = str(input('Please input the quantity needed, e.g. 2 or 500 g: '))
+					ingredients[newType], ingredientUnits[newType] = units.parse(newQty)
 
 			# get instructions
 			instructions = str(input('Please input any note you have about this recipe: '))
@@ -264,16 +361,18 @@ def addRecipe():
 	newRecipe = Recipe(
 		name=rcpName,
 		ingredients=ingredients,
+		units=ingredientUnits,
 		instructions=instructions
 	)
-	newRecipe.save()
+	store.add(newRecipe)
+	recipesChanged()
 				
 def deleteRecipe():
 	''' deletes one or all recipes from database
 	'''
 
 	# immediately returns if no recipes in db
-	if Recipe.objects.count() == 0:
+	if store.countRecipes() == 0:
 		print("No recipes in database.")
 		return
 
@@ -284,7 +383,8 @@ def deleteRecipe():
 		while True:
 			deleteConfirmAll = str(input("Are you sure you wish to delete all recipes from your inventory? Y/N ")).lower()
 			if deleteConfirmAll == 'y':
-				Recipe.objects.delete()
+				store.deleteAllRecipes()
+				recipesChanged()
 				break
 			elif deleteConfirmAll == 'n':
 				break
@@ -293,20 +393,27 @@ def deleteRecipe():
 
 	else:
 
-		# finds and deletes recipe after confirmation
-		for recipe in Recipe.objects():
-			targ = str(recipe.id)[-4:]
-			if targ == rcpId:
-				while True:
-					deleteConfirm = str(input("Are you sure you wish to delete " + recipe.name.capitalize() + " with ID " + targ + " from your inventory? Y/N ")).lower()
-					if deleteConfirm == 'y':
-						recipe.delete()
-						return
-					elif deleteConfirm == 'n':
-						return
-					else:
-						print('\nInvalid choice. Please try again.')
-		print("Invalid ID. Check inventory and make sure ID is correct.")
+		# finds recipe with one indexed lookup
+		matches = store.findRecipes(rcpId)
+		if len(matches) == 0:
+			print("Invalid ID. Check inventory and make sure ID is correct.")
+			return
+		if len(matches) > 1:
+			print("Ambiguous ID. More than one recipe ends in " + rcpId + "; include more characters of the ID.")
+			return
+		recipe = matches[0]
+
+		# deletes recipe after confirmation
+		while True:
+			deleteConfirm = str(input("Are you sure you wish to delete " + recipe.name.capitalize() + " with ID " + rcpId + " from your inventory? Y/N ")).lower()
+			if deleteConfirm == 'y':
+				store.delete(recipe)
+				recipesChanged()
+				return
+			elif deleteConfirm == 'n':
+				return
+			else:
+				print('\nInvalid choice. Please try again.')
 
 def makeRecipe():
 	''' displays specified recipe for preparation
@@ -314,7 +421,7 @@ def makeRecipe():
 	'''
 
 	# immediately returns if no recipes in db
-	if Recipe.objects.count() == 0:
+	if store.countRecipes() == 0:
 		print("No recipes in database.")
 		return
 
@@ -322,15 +429,14 @@ def makeRecipe():
 	targName = str(input("Please input the name of the recipe you would like to make: ")).lower()
 
 	# retrieve recipe from database
-	try:
-		recipe = Recipe.objects.get(name=targName)
-	except DoesNotExist:
-		print("No recipe with that name found in database. Check inventory and make sure name is correct.")
+	recipe = store.recipe(targName)
+	if recipe == None:
+		print("No recipe with that name found in database. Check inventory and make sure name is correct." + suggest(targName))
 		return
 
 	# check if needed ingredients type/qty in products collection
 	flag = True
-	if not recipe.canMake():
+	if not store.canMake(recipe):
 		while True:
 			makeConfirm = str(input("You do not have the ingredients in your inventory for this recipe; view anyway? Y/N ")).lower()
 			if makeConfirm == 'y':
@@ -343,7 +449,7 @@ def makeRecipe():
 
 	# pretty print recipe
 	rcpName = str(recipe.name).capitalize()
-	ingredients = "Ingredients: " + str(recipe.ingredients)
+	ingredients = "Ingredients: " + units.describeAll(recipe.ingredients, recipe.units)
 	instructions = "Instructions: " + str(recipe.instructions)
 	printRecipe = "\n{}\n{}\n{}".format(rcpName, ingredients, instructions)
 	print(printRecipe)
@@ -353,61 +459,569 @@ def makeRecipe():
 		while True:
 			clearConfirm = str(input("\nWould you like to delete the ingredients used in this recipe from your inventory? Y/N ")).lower()
 			if clearConfirm == 'y':
-				recipe.clearIngredients()
+				missing, used, left = store.consume(recipe)
+				if missing:
+					print("Some ingredients were no longer in your inventory, so none were deleted: " + units.describeAll(missing, recipe.units))
 				break
 			elif clearConfirm == 'n':
 				break
 			else:
 				print('\nInvalid choice. Please try again.')
 
+def displayMakeable():
+	''' displays all recipes that can be made with the current inventory
+		along with what is missing for those that can't
+	'''
+
+	# immediately returns if no recipes in db
+	if store.countRecipes() == 0:
+		print("No recipes in database.")
+		return
+
+	# stock is counted once and every recipe is checked against it
+	recipes = {recipe.name: recipe for recipe in store.recipes()}
+	makeable, shortfall = store.makeable(recipes.values())
+
+	print("Recipes you can make:")
+	for recipe in makeable:
+		print("  " + str(recipe.name).capitalize())
+	if len(makeable) == 0:
+		print("  None")
+
+	print("\nRecipes missing ingredients:")
+	for name in sorted(shortfall):
+		print("  " + str(name).capitalize().ljust(30) + "Missing: " + units.describeAll(shortfall[name], recipes[name].units))
+	if len(shortfall) == 0:
+		print("  None")
+
+def displayRecommendations():
+	''' displays the recipes that would use up the most products
+		expiring within three days, with what each is missing
+	'''
+
+	global recipeIndex
+	from models import EXPIRING_DAYS
+
+	if recipeIndex == None:
+		recipeIndex = recommend.RecipeIndex(store.recipes())
+
+	ranked = recommend.recommend(store, recipeIndex, datetime.datetime.today(), EXPIRING_DAYS, RECOMMENDATION_LIMIT)
+	if len(ranked) == 0:
+		print("No recipes use products that will expire soon.")
+		return
+
+	print("Recipes using products that will expire soon:")
+	for recipe, used, shortfall in ranked:
+		uses = "Uses " + str(used) + " expiring"
+		if shortfall:
+			print("  " + str(recipe.name).capitalize().ljust(30) + uses.ljust(20) + "Missing: " + units.describeAll(shortfall, recipe.units))
+		else:
+			print("  " + str(recipe.name).capitalize().ljust(30) + uses.ljust(20) + "Can make")
+
+def planShopping():
+	''' takes in the recipes to cook, how many times and on what day,
+		then displays what needs to be bought for all of them
+	'''
+
+	import shopping
+
+	# immediately returns if no recipes in db
+	if store.countRecipes() == 0:
+		print("No recipes in database.")
+		return
+
+	plan = []
+	while True:
+		rcpName = str(input('Please input the name of the next recipe in your plan. If done, type "0": ')).lower()
+		if rcpName == "0":
+			break
+		try:
+			batches = int(input('How many times will you make it? Type "0" for once: '))
+			cookDate = str(input('What day will you make it? (YYYY-MM-DD) Type "0" for today: '))
+			meal = {"rcpName": rcpName, "batches": batches if batches > 0 else 1}
+			if cookDate != "0":
+				meal["date"] = cookDate
+			plan += shopping.parsePlan([meal])
+		except ValueError:
+			print('\nPlease enter all fields in the correct format.\n')
+
+	displayShoppingList(plan)
+
+def displayShoppingList(plan):
+	''' displays the products missing from inventory to cook every meal
+		of a plan from shopping.parsePlan()
+	'''
+
+	import shopping
+
+	if len(plan) == 0:
+		print("No recipes in plan.")
+		return
+
+	deficit, unknown = shopping.shoppingList(store, plan, datetime.datetime.today())
+	for name in unknown:
+		print("No recipe named " + name + " found in database; it was left out.")
+
+	if len(deficit) == 0:
+		print("You have everything you need for this plan.")
+		return
+
+	print("Shopping list:")
+	for prodType in sorted(deficit):
+		print("  " + str(prodType).capitalize().ljust(30) + ", ".join(units.describe(qty, unit) for unit, qty in sorted(deficit[prodType].items())))
+
+def shoppingListFile(path):
+	''' displays the shopping list for a JSON meal plan in the
+		/shopping-list format without prompting
+	'''
+
+	import shopping
+
+	try:
+		with open(path) as plan_file:
+			data = json.load(plan_file)
+		plan = shopping.parsePlan(data["plan"] if isinstance(data, dict) else data)
+	except (OSError, KeyError, ValueError) as e:
+		print("Plan Error: ", e)
+		return 1
+
+	displayShoppingList(plan)
+
+def searchResults(query, limit, collection=None):
+	''' returns [(collection, raw document, score)] of the products and
+		recipes best matching query, from an index read from the store
+		for the search, as the CLI usually runs for just one
+	'''
+
+	import search
+	from models import Product, Recipe
+
+	index = search.SearchIndex()
+	index.fill(store, (collection,) if collection != None else ("product", "recipe"))
+	ranked = index.search(query, limit, collection)
+
+	# documents are fetched with one indexed lookup per collection
+	docs = {}
+	for docCollection, docType in (("product", Product), ("recipe", Recipe)):
+		docIds = [docId for resultCollection, docId, score in ranked if resultCollection == docCollection]
+		if docIds:
+			matches = store.findMany(docType, docIds)
+			docs.update((docId, matches[docId][0].to_mongo()) for docId in matches if len(matches[docId]) == 1)
+	return [(docCollection, docs[docId], score) for docCollection, docId, score in ranked if docId in docs]
+
+def suggest(name):
+	''' returns a sentence naming the recipes a misspelt name may have
+		been meant as, or an empty string if none are close
+	'''
+
+	names = [doc["name"] for collection, doc, score in searchResults(name, SUGGESTION_LIMIT, "recipe")]
+	if len(names) == 0:
+		return ""
+	return " Did you mean: " + ", ".join(names) + "?"
+
+def displaySearch(query=None, limit=SEARCH_LIMIT, collection=None, width=None, paging=True):
+	''' displays the products and recipes best matching a query,
+		matching the start of words and allowing typos, or only those of
+		one collection. width cuts every line
+	'''
+
+	if query == None:
+		query = str(input("Please input what to search for: "))
+
+	results = searchResults(query, limit, collection)
+	if len(results) == 0:
+		print("No products or recipes match " + query + ".")
+		return
+
+	buffer = render.Buffer(width)
+	for collection, doc, score in results:
+		if collection == "product":
+			buffer.add("Product".ljust(10) + " ".join([column(doc) for column in INVENTORY_COLUMNS.values()]))
+		else:
+			buffer.add("Recipe".ljust(10) + ("ID: " + str(doc["_id"])[-4:]).ljust(10) + " " + str(doc["name"]).capitalize())
+	buffer.show(paging)
+
+def recipesChanged():
+	''' called by every function that adds or removes recipes
+	'''
+
+	global recipeIndex
+	recipeIndex = None
+
+def importFile(path):
+	''' adds every product or recipe in a JSON, newline-delimited JSON
+		or CSV file to the database without prompting. files containing
+		an "ingredients" field are imported as recipes
+	'''
+
+	import bulk
+
+	fmt = bulk.formatOf(path)
+	try:
+		with open(path, newline="") as data_file:
+			rows = bulk.iterRows(data_file, fmt)
+
+			# peek at the first row to tell products from recipes
+			first = next(rows, None)
+			if first == None:
+				print("No rows found in " + path)
+				return
+			peek = json.loads(first) if isinstance(first, str) else first
+			rows = itertools.chain([first], rows)
+
+			if "ingredients" in peek:
+				kind = "recipes"
+				inserted, errors = bulk.importRecipes(store, rows)
+				recipesChanged()
+			else:
+				kind = "products"
+				inserted, errors = bulk.importProducts(store, rows)
+	except (OSError, ValueError) as e:
+		print("Import Error: ", e)
+		return 1
+
+	for error in errors:
+		print("Row " + str(error["row"]) + ": " + error["message"])
+	print("Imported " + str(inserted) + " " + kind + " with " + str(len(errors)) + " errors.")
+	return 1 if errors else 0
+
 def displayDev(code):
 	''' debug function
 	'''
 	print()
 	if code == 11:
-		for product in Product.objects:
+		for product in store.products():
 			print("product.id: " + str(product.id))
 			print("product.prodType: " + str(product.prodType))
 			print("product.expDate: " + str(product.expDate))
+			print("product.quantity: " + str(product.quantity) + " " + str(product.unit))
 			print("product.note: " + str(product.note)) 
 			print()
 	if code == 12:
-		for recipe in Recipe.objects:
+		for recipe in store.recipes():
 			print("recipe.id: " + str(recipe.id))
 			print("recipe.name: " + str(recipe.name))
 			print("recipe.ingredients: " + str(recipe.ingredients))
+			print("recipe.units: " + str(recipe.units))
 			print("recipe.instructions: " + str(recipe.instructions)) 
 			print()
 	if code == 13:
 		print(config)
 
+def fail(message):
+	''' prints a subcommand's error on stderr, so it stays out of output
+		piped elsewhere, and returns the exit status
+	'''
+
+	print(message, file=sys.stderr)
+	return 1
+
+def csvValue(value):
+	''' writes dates, ingredients and empty notes the way the CSV
+		import reads them back
+	'''
+
+	if isinstance(value, datetime.datetime):
+		return str(value)
+	if isinstance(value, dict):
+		return ";".join(str(key) + ":" + str(value[key]) for key in value)
+	if value == None:
+		return ""
+	return value
+
+def writeDocs(docs, flatten, fields, fmt):
+	''' writes raw documents flattened into the compact format to stdout,
+		as a JSON array or as CSV with a header row
+	'''
+
+	rows = [flatten(doc) for doc in docs]
+	if fmt == "json":
+		print(compact.dumps(rows).decode())
+		return
+
+	writer = csv.writer(sys.stdout, lineterminator="\n")
+	writer.writerow(fields)
+	for row in rows:
+		writer.writerow([csvValue(row[field]) for field in fields])
+
+def listCommand(args):
+	''' cli.py list [products|recipes]
+	'''
+
+	if args.format == "table":
+		if args.collection == "recipes":
+			displayRecipes(args.width, args.pager)
+		else:
+			displayInventory(columns=args.columns, width=args.width, paging=args.pager)
+		return 0
+
+	# raw documents are flattened without building objects
+	if args.collection == "recipes":
+		writeDocs(store.recipes(raw=True), compact.recipe, RECIPE_FIELDS, args.format)
+	else:
+		writeDocs(store.products(raw=True), compact.product, PRODUCT_FIELDS, args.format)
+	return 0
+
+def expiredCommand(args):
+	''' cli.py expired [--delete]. lists every expired product, unlike
+		checkExpired() which only reports those new since the last run
+	'''
+
+	today = datetime.datetime.today()
+	if args.format == "table":
+		buffer = render.Buffer()
+		for product in store.expired(today, PRODUCT_FIELDS, raw=True):
+			expDate = "Expired: " + str(product["expDate"])[:10]
+			buffer.add(INVENTORY_COLUMNS["id"](product) + " " + INVENTORY_COLUMNS["type"](product) + " " + expDate)
+		buffer.show(paging=False)
+	else:
+		writeDocs(store.expired(today, PRODUCT_FIELDS, raw=True), compact.product, PRODUCT_FIELDS, args.format)
+
+	if args.delete:
+		deleted = store.deleteExpired(today)
+		if args.format == "table":
+			print("Deleted " + str(deleted) + " expired products.")
+	return 0
+
+def addCommand(args):
+	''' cli.py add TYPE DATE [--quantity QTY] [--note NOTE]
+	'''
+
+	from models import Product
+
+	quantity, unit = args.quantity
+	newProduct = Product(
+		prodType=args.prodType.lower(),
+		expDate=args.expDate,
+		quantity=quantity,
+		unit=unit,
+		note=args.note
+	)
+	store.add(newProduct)
+
+	if args.format == "table":
+		print("Added " + newProduct.prodType.capitalize() + " with ID " + str(newProduct.id)[-4:] + ".")
+	else:
+		writeDocs([newProduct.to_mongo()], compact.product, PRODUCT_FIELDS, args.format)
+	return 0
+
+def deleteCommand(args):
+	''' cli.py delete ID [ID ...] | --all. deletes without asking for
+		confirmation, and only once every ID matches exactly one product.
+		json and csv write the products deleted, which import adds back
+	'''
+
+	if args.all:
+		if args.format == "table":
+			count = store.countProducts()
+			store.deleteAllProducts()
+			print("Deleted " + str(count) + " products.")
+			return 0
+
+		# only the products written out are deleted, so none added in
+		# between go unreported
+		docs = list(store.products(raw=True))
+	elif len(args.prodIds) == 0:
+		return fail("Give the IDs of the products to delete, or --all.")
+	else:
+		# finds every product with one indexed lookup
+		matches = store.findManyProducts([prodId.lower() for prodId in args.prodIds])
+		for prodId in matches:
+			if len(matches[prodId]) == 0:
+				return fail("Invalid ID " + prodId + ". Check inventory and make sure ID is correct.")
+			if len(matches[prodId]) > 1:
+				return fail("Ambiguous ID. More than one product ends in " + prodId + "; include more characters of the ID.")
+		docs = [matches[prodId][0].to_mongo() for prodId in matches]
+
+	deleted = set(store.deleteProducts(ids=[doc["_id"] for doc in docs]))
+	if args.format == "table":
+		print("Deleted " + str(len(deleted)) + " products.")
+	else:
+		writeDocs([doc for doc in docs if doc["_id"] in deleted], compact.product, PRODUCT_FIELDS, args.format)
+	return 0
+
+def makeCommand(args):
+	''' cli.py make RECIPE. takes the ingredients used by a recipe from
+		inventory, failing without taking any if some are missing. json
+		and csv write what is left of every product taken from
+	'''
+
+	recipe = store.recipe(args.rcpName.lower())
+	if recipe == None:
+		return fail("No recipe named " + args.rcpName + " found in database." + suggest(args.rcpName))
+
+	shortfall = recipe.shortfall(store.stockCounts(recipe.ingredients))
+	if shortfall:
+		return fail("Not enough ingredients in inventory. Missing: " + units.describeAll(shortfall, recipe.units))
+
+	# stock may still run out if another process consumes it first
+	missing, used, left = store.consume(recipe)
+	if missing:
+		return fail("Inventory changed while making recipe. Missing: " + units.describeAll(missing, recipe.units))
+	if args.format == "table":
+		print("Made " + recipe.name.capitalize() + ", using up " + str(len(used)) + " products and taking from " + str(len(left)) + " more.")
+	else:
+		taken = [{"id": str(docId), "quantity": 0} for docId in used] + [{"id": str(docId), "quantity": left[docId]} for docId in left]
+		writeDocs(taken, dict, TAKEN_FIELDS, args.format)
+	return 0
+
+def searchCommand(args):
+	''' cli.py search QUERY [--type product|recipe] [--limit N]
+	'''
+
+	if args.format == "table":
+		displaySearch(args.query, args.limit, args.type, args.width, args.pager)
+		return 0
+
+	# raw documents are flattened as list --format json writes them
+	flatten = {"product": compact.product, "recipe": compact.recipe}
+	results = searchResults(args.query, args.limit, args.type)
+	print(compact.dumps([{"collection": collection, "score": score, "document": flatten[collection](doc)} for collection, doc, score in results]).decode())
+	return 0
+
+def parseDate(text):
+	''' reads a YYYY-MM-DD date given on the command line
+	'''
+
+	from models import DATE_FORMAT
+
+	try:
+		return datetime.datetime.strptime(text, DATE_FORMAT)
+	except ValueError:
+		raise argparse.ArgumentTypeError("dates are written as YYYY-MM-DD, not " + repr(text))
+
+def parseQuantity(text):
+	''' reads a quantity given on the command line, e.g. 2 or "500 g"
+	'''
+
+	try:
+		return units.parse(text)
+	except ValueError as e:
+		raise argparse.ArgumentTypeError(str(e))
+
+def parseHousehold(text):
+	''' reads a household name given on the command line
+	'''
+
+	from models import validHousehold
+
+	if not validHousehold(text):
+		raise argparse.ArgumentTypeError("households are named with lowercase letters, digits, - and _, not " + repr(text))
+	return text
+
+def parseColumns(text):
+	''' reads a comma-separated list of INVENTORY_COLUMNS
+	'''
+
+	columns = [column.strip().lower() for column in text.split(",") if column.strip()]
+	unknown = [column for column in columns if column not in INVENTORY_COLUMNS]
+	if unknown or len(columns) == 0:
+		raise argparse.ArgumentTypeError("columns are any of " + ",".join(INVENTORY_COLUMNS))
+	return columns
+
+def parseArgs(argv):
+	''' reads the command line, storing the function of the subcommand
+		given in args.run. args.command is None for the interactive menu
+	'''
+
+	parser = argparse.ArgumentParser(prog="cli.py", description="Keeps track of your pantry. Runs the interactive menu when no command is given.")
+	parser.add_argument("--household", type=parseHousehold, help="pantry of the household to use, the default household's if left out")
+	commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+	listParser = commands.add_parser("list", help="print all products or recipes")
+	listParser.add_argument("collection", nargs="?", choices=["products", "recipes"], default="products")
+	listParser.add_argument("--format", choices=FORMATS, default="table")
+	listParser.add_argument("--columns", type=parseColumns, help="products table columns, any of " + ",".join(INVENTORY_COLUMNS))
+	listParser.add_argument("--width", type=int, help="cut table lines to this many characters")
+	listParser.add_argument("--no-pager", dest="pager", action="store_false", help="don't page tables longer than the terminal")
+	listParser.set_defaults(run=listCommand)
+
+	addParser = commands.add_parser("add", help="add a product")
+	addParser.add_argument("prodType", metavar="TYPE")
+	addParser.add_argument("expDate", metavar="DATE", type=parseDate, help="expiration date as YYYY-MM-DD")
+	addParser.add_argument("--quantity", type=parseQuantity, default=units.parse(1), help="a count, or an amount with a unit such as \"500 g\"")
+	addParser.add_argument("--note")
+	addParser.add_argument("--format", choices=FORMATS, default="table")
+	addParser.set_defaults(run=addCommand)
+
+	deleteParser = commands.add_parser("delete", help="delete products by ID without confirming")
+	deleteParser.add_argument("prodIds", metavar="ID", nargs="*", help="last four or more characters of the product's ID")
+	deleteParser.add_argument("--all", action="store_true", help="delete every product")
+	deleteParser.add_argument("--format", choices=FORMATS, default="table")
+	deleteParser.set_defaults(run=deleteCommand)
+
+	expiredParser = commands.add_parser("expired", help="print expired products")
+	expiredParser.add_argument("--format", choices=FORMATS, default="table")
+	expiredParser.add_argument("--delete", action="store_true", help="then delete them")
+	expiredParser.set_defaults(run=expiredCommand)
+
+	makeParser = commands.add_parser("make", help="take the ingredients of a recipe from inventory")
+	makeParser.add_argument("rcpName", metavar="RECIPE")
+	makeParser.add_argument("--format", choices=FORMATS, default="table")
+	makeParser.set_defaults(run=makeCommand)
+
+	importParser = commands.add_parser("import", help="add the products or recipes in a JSON, NDJSON or CSV file")
+	importParser.add_argument("path", metavar="FILE")
+	importParser.set_defaults(run=lambda args: importFile(args.path))
+
+	searchParser = commands.add_parser("search", help="print the products and recipes best matching a query, allowing typos")
+	searchParser.add_argument("query", metavar="QUERY")
+	searchParser.add_argument("--type", choices=["product", "recipe"], help="search only products or only recipes")
+	searchParser.add_argument("--limit", type=int, default=SEARCH_LIMIT)
+	searchParser.add_argument("--format", choices=["table", "json"], default="table")
+	searchParser.add_argument("--width", type=int, help="cut table lines to this many characters")
+	searchParser.add_argument("--no-pager", dest="pager", action="store_false", help="don't page tables longer than the terminal")
+	searchParser.set_defaults(run=searchCommand)
+
+	shoppingParser = commands.add_parser("shopping-list", help="print what to buy for a JSON meal plan")
+	shoppingParser.add_argument("path", metavar="FILE")
+	shoppingParser.set_defaults(run=lambda args: shoppingListFile(args.path))
+
+	return parser.parse_args(argv)
+
 # Main function
 def main():
+	global store, expiryWatch
+
+	# arguments are read before anything slow is imported or connected,
+	# so --help and usage errors return straight away
+	args = parseArgs(sys.argv[1:])
 
 	# load config from JSON
+	configPath = os.environ.get("GROCERYHELPER_CONFIG", "config.json")
 	try:
-		with open("config.json") as json_file:
+		with open(configPath) as json_file:
 			config = json.load(json_file)
-			db = config["db"]
-			host = config["host"]
-			port = config["port"]
-			username = config["username"]
-			password = config["password"]
 	except Exception as e:
 		print("config.json Load Error: ", e)
-		sys.exit()
+		sys.exit(1)
 
 	# opens db connection
+	import pantry
 	try:
-		connect(db, host=host, port=port, username=username, password=password)
+		store = pantry.connect(config).scoped(args.household or pantry.DEFAULT_HOUSEHOLD)
 	except Exception as e:
 		print("Database Connection Error: ", e)
-		sys.exit()
+		sys.exit(1)
+
+	# fills in households, short IDs and quantities for documents created
+	# by older versions, once per database
+	store.backfill()
+
+	# the expiry watermark is kept beside config.json, one per household
+	watermark = expiry.WATERMARK_FILE
+	if store.household != pantry.DEFAULT_HOUSEHOLD:
+		watermark += "-" + store.household
+	expiryWatch = expiry.ExpiryWatch(store, os.path.join(os.path.dirname(os.path.abspath(configPath)), watermark))
+
+	# non-interactive subcommands return their exit status
+	if args.command != None:
+		return args.run(args)
 
 	# license boilerplate
 	print("GroceryHelper Copyright (C) 2019 Nathan Weinberg\nThis program comes with ABSOLUTELY NO WARRANTY; for details type `show w'.\nThis is free software, and you are welcome to redistribute it\nunder certain conditions; type `show c' for details.\n")
 
-	# checks if any products have expired 
+	# checks if any products have expired since the last run
 	checkExpired()
 
 	while True:
@@ -420,11 +1034,17 @@ def main():
 		print("(1) View all products")
 		print("(2) Add product")
 		print("(3) Delete product")
+		print("(9) View inventory summary")
 		print()
 		print("(4) View all recipes")
 		print("(5) Add recipe")
 		print("(6) Delete recipe")
 		print("(7) Make recipe")
+		print("(8) View makeable recipes")
+		print("(10) View recommended recipes")
+		print("(14) Build shopping list")
+		print()
+		print("(15) Search products and recipes")
 		print()
 		print("(0) Exit Program")
 
@@ -445,6 +1065,10 @@ def main():
 			if choice == 1:
 				displayInventory()
 
+			# Display inventory summary
+			elif choice == 9:
+				displayInventory(summary=True)
+
 			# Input new product
 			elif choice == 2:
 				addProduct()  
@@ -469,6 +1093,22 @@ def main():
 			elif choice == 7:
 				makeRecipe()
 
+			# Display makeable recipes
+			elif choice == 8:
+				displayMakeable()
+
+			# Display recipes using soon-to-expire products
+			elif choice == 10:
+				displayRecommendations()
+
+			# Build shopping list for a meal plan
+			elif choice == 14:
+				planShopping()
+
+			# Search products and recipes
+			elif choice == 15:
+				displaySearch()
+
 			# Exit
 			elif choice == 0:
 				break
@@ -489,5 +1129,4 @@ def main():
 	print("Goodbye!")
 
 if __name__ == "__main__":
-	currentDate = datetime.datetime.today()
-	main()
+	sys.exit(main())
@@ -0,0 +1,62 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import json
+import datetime
+from units import amount
+
+# orjson encodes several times faster when installed; the standard
+# library encoder gives the same output without it
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
+def product(doc):
+	''' flattens a raw product document into the compact schema. the
+		quantity is a whole number when it is one, whichever store it was
+		read from, as Mongo and SQLite hand back floats
+	'''
+
+	return {
+		"id": str(doc["_id"]), "prodType": doc["prodType"], "expDate": doc["expDate"],
+		"quantity": amount(doc["quantity"]), "unit": doc["unit"], "note": doc.get("note")
+	}
+
+def recipe(doc):
+	''' flattens a raw recipe document into the compact schema
+	'''
+
+	return {
+		"id": str(doc["_id"]), "name": doc["name"], "ingredients": doc["ingredients"],
+		"units": doc.get("units", {}), "instructions": doc["instructions"]
+	}
+
+def isoDate(value):
+	if isinstance(value, datetime.datetime):
+		return value.isoformat()
+	raise TypeError(repr(value) + " is not JSON serializable")
+
+def dumps(data):
+	''' encodes data as JSON bytes without whitespace, writing dates in
+		ISO 8601
+	'''
+
+	if orjson != None:
+		return orjson.dumps(data)
+	return json.dumps(data, separators=(",", ":"), default=isoDate).encode()
@@ -0,0 +1,46 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import gzip
+
+# brotli is used when installed and the client accepts it; gzip otherwise
+try:
+	import brotli
+except ImportError:
+	brotli = None
+
+# bodies smaller than this are sent as they are, since compressing them
+# saves less than it costs
+MIN_SIZE = 1024
+
+# compression effort, balanced for bodies built on every uncached request
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def negotiate(acceptEncodings):
+	''' returns "br", "gzip" or None for the best encoding in the
+		request's Accept-Encoding that can be produced here
+	'''
+
+	offered = ["br", "gzip"] if brotli != None else ["gzip"]
+	return acceptEncodings.best_match(offered)
+
+def compress(body, encoding):
+	if encoding == "br":
+		return brotli.compress(body, quality=BROTLI_QUALITY)
+	return gzip.compress(body, GZIP_LEVEL)
@@ -0,0 +1,161 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import sys
+import time
+import queue
+import threading
+from collections import OrderedDict
+
+# events held for a subscriber that isn't reading before newer ones are dropped
+QUEUE_SIZE = 100
+
+# seconds before reopening a change stream that failed
+RETRY_SECONDS = 5
+
+# households remembered for ids added or updated through the change
+# stream, so their deletes reach only that household
+OWNER_CACHE_SIZE = 100000
+
+class Broker(object):
+	''' in-process publish/subscribe. every subscriber gets its own queue
+		of (event, data) tuples, so a slow client only loses its own events.
+		a subscriber to one household gets only the events published for it
+		and those published for every household, with household None
+	'''
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.queues = {}	# stored as {queue:(event names, or None for all, household, or None for all)}
+
+	def subscribe(self, events=None, household=None):
+		subscription = queue.Queue(QUEUE_SIZE)
+		with self.lock:
+			self.queues[subscription] = (events, household)
+		return subscription
+
+	def unsubscribe(self, subscription):
+		with self.lock:
+			self.queues.pop(subscription, None)
+
+	def publish(self, event, data, household=None):
+		with self.lock:
+			queues = [subscription for subscription, (events, wanted) in self.queues.items() if
+				(events == None or event in events) and
+				(household == None or wanted == None or wanted == household)]
+		for subscription in queues:
+			try:
+				subscription.put_nowait((event, data))
+			except queue.Full:
+				pass
+
+class ChangeFeed(threading.Thread):
+	''' publishes the inserts and deletes of every process writing to the
+		database, read from the store's change stream, to the household of
+		each, and calls changed(collection, household, event, data) for
+		each. watching is False when the store has none (SQLite, memory or
+		a standalone mongod), in which case the API publishes its own
+		writes instead.
+
+		deletes carry only ids, so their household is the one the feed saw
+		the id added or updated in, or else locate(collection, ids). a
+		change neither knows is published to every household as a "reset" of the
+		collection rather than with its ids, which would tell households
+		about documents that aren't theirs
+	'''
+
+	def __init__(self, store, broker, changed=None, locate=None):
+		super(ChangeFeed, self).__init__()
+		self.daemon = True
+		self.store = store
+		self.broker = broker
+		self.changed = changed
+		self.locate = locate
+		self.owners = OrderedDict()	# stored as {id:household}
+		self.changes = None
+		self.watching = False
+		self.opened = False
+		self.startLock = threading.Lock()
+
+	def ensureStarted(self):
+		''' opens the change stream the first time it is called, so that
+			watching is settled before any client reads the feed
+		'''
+
+		with self.startLock:
+			if not self.opened:
+				self.opened = True
+				self.changes = self.store.openChanges()
+				if self.changes != None:
+					self.watching = True
+					self.start()
+
+	def run(self):
+		while True:
+			try:
+				for event, data in self.changes:
+					household = self.ownerOf(event, data)
+					if household == None:
+						self.broker.publish("reset", {"collection": data["collection"]})
+					else:
+						self.broker.publish(event, data, household)
+					if self.changed != None:
+						self.changed(data["collection"], household, event, data)
+			except Exception as e:
+				print("Change stream error: ", e, file=sys.stderr)
+
+			# changes made while the stream was down are lost, so clients are
+			# told to reload once it is back, or once routes publish instead
+			time.sleep(RETRY_SECONDS)
+			self.changes = self.store.openChanges()
+			for collection in ("product", "recipe"):
+				self.broker.publish("reset", {"collection": collection})
+				if self.changed != None:
+					self.changed(collection, None, "reset", {"collection": collection})
+			if self.changes == None:
+				self.watching = False
+				return
+
+	def ownerOf(self, event, data):
+		''' returns the household of a change, taken out of data, and
+			remembers it for the ids added or updated
+		'''
+
+		household = data.pop("household", None)
+		if event == "add":
+			docIds = [str(doc.id) for doc in data["docs"]]
+		elif event == "update":
+			docIds = list(data["quantities"])
+		else:
+			docIds = data.get("ids", [])
+		if household == None:
+			# an update looked up after its document was deleted has no
+			# household either, so ids are only forgotten on deletes
+			for docId in docIds:
+				owner = self.owners.pop(docId, None) if event == "delete" else self.owners.get(docId)
+				if household == None:
+					household = owner
+			if household == None and self.locate != None and len(docIds) > 0:
+				household = self.locate(data["collection"], docIds)
+			return household
+		for docId in docIds:
+			self.owners.pop(docId, None)
+			self.owners[docId] = household
+		while len(self.owners) > OWNER_CACHE_SIZE:
+			self.owners.popitem(last=False)
+		return household
@@ -0,0 +1,123 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import sys
+import datetime
+import threading
+
+# file beside config.json that remembers when the CLI last checked for
+# expired products
+WATERMARK_FILE = ".expiry-watermark"
+WATERMARK_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+# longest the notifier sleeps between checks, so products added by other
+# processes (the CLI or other API workers) are still noticed
+MAX_WAIT = 60
+
+class ExpiryWatch(object):
+	''' reports each product once, when its expDate passes. the watermark
+		is the time of the last check, so a check is a range query over
+		the expDate index for what expired since then rather than a scan
+		of every expired product. when path is given the watermark is kept
+		there between runs
+	'''
+
+	def __init__(self, store, path=None):
+		self.store = store
+		self.path = path
+		self.watermark = self.load()
+
+	def load(self):
+		if self.path == None or not os.path.exists(self.path):
+			return None
+		try:
+			with open(self.path) as watermark_file:
+				return datetime.datetime.strptime(watermark_file.read().strip(), WATERMARK_FORMAT)
+		except ValueError:
+			return None
+
+	def save(self):
+		if self.path != None:
+			with open(self.path, "w") as watermark_file:
+				watermark_file.write(self.watermark.strftime(WATERMARK_FORMAT))
+
+	def due(self, currentDate, fields=None):
+		''' returns the products that expired since the last check, or every
+			expired product on the first one, and moves the watermark to
+			currentDate
+		'''
+
+		products = list(self.store.expired(currentDate, fields, since=self.watermark))
+		self.watermark = currentDate
+		self.save()
+		return products
+
+	def nextExpiry(self):
+		''' returns when the next product expires, or None if none will
+		'''
+
+		return self.store.nextExpiry(self.watermark or datetime.datetime.today())
+
+class ExpiryNotifier(threading.Thread):
+	''' background job publishing an "expired" event to each household
+		with its products whose expDate has just passed. it sleeps until
+		the next expiry, and wake() makes it look again after products are
+		added or removed. fields must include household
+	'''
+
+	def __init__(self, store, broker, fields=None):
+		super(ExpiryNotifier, self).__init__()
+		self.daemon = True
+		self.broker = broker
+		self.fields = fields
+		self.wakeup = threading.Event()
+		self.startLock = threading.Lock()
+
+		# only products expiring after the notifier starts are announced;
+		# clients read what already expired from /expired
+		self.watch = ExpiryWatch(store)
+		self.watch.watermark = datetime.datetime.today()
+
+	def ensureStarted(self):
+		with self.startLock:
+			if self.ident == None:
+				self.start()
+
+	def wake(self):
+		self.wakeup.set()
+
+	def run(self):
+		while True:
+			# cleared before checking so a wake() during the check isn't lost
+			self.wakeup.clear()
+			wait = MAX_WAIT
+			try:
+				now = datetime.datetime.today()
+				expired = {}
+				for product in self.watch.due(now, self.fields):
+					expired.setdefault(product.household, []).append(product)
+				for household in expired:
+					self.broker.publish("expired", expired[household], household)
+				nextExpiry = self.watch.nextExpiry()
+				if nextExpiry != None:
+					wait = min(wait, max(0, (nextExpiry - now).total_seconds()))
+			except Exception as e:
+				print("Expiry notifier error: ", e, file=sys.stderr)
+
+			self.wakeup.wait(wait)
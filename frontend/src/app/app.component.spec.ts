@@ -1,9 +1,39 @@
 import { TestBed, async } from '@angular/core/testing';
-import { AppComponent } from './app.component';
+import { HttpClientTestingModule, HttpTestingController } from '@angular/common/http/testing';
+import { AppComponent, Product } from './app.component';
+
+// stands in for the API's /events stream
+class FakeEventSource {
+  listeners: { [name: string]: ((event: any) => void)[] } = {};
+  closed = false;
+
+  addEventListener(name: string, listener: (event: any) => void) {
+    (this.listeners[name] = this.listeners[name] || []).push(listener);
+  }
+
+  emit(name: string, data: any) {
+    (this.listeners[name] || []).forEach(listener => listener({ data: JSON.stringify(data) }));
+  }
+
+  close() {
+    this.closed = true;
+  }
+}
+
+function product(id: string, prodType: string, expDate: number, quantity = 1, unit = 'each'): Product {
+  return { _id: { $oid: id }, prodType: prodType, expDate: { $date: expDate }, quantity: quantity, unit: unit };
+}
 
 describe('AppComponent', () => {
+  let events: FakeEventSource;
+
   beforeEach(async(() => {
+    events = new FakeEventSource();
+    spyOn(AppComponent.prototype, 'openEvents').and.returnValue(events);
     TestBed.configureTestingModule({
+      imports: [
+        HttpClientTestingModule
+      ],
       declarations: [
         AppComponent
       ],
@@ -28,4 +58,61 @@ describe('AppComponent', () => {
     const compiled = fixture.debugElement.nativeElement;
     expect(compiled.querySelector('h1').textContent).toContain('Welcome to frontend!');
   });
+
+  it('should apply changes from the event stream without reloading', () => {
+    const http = TestBed.get(HttpTestingController);
+    const fixture = TestBed.createComponent(AppComponent);
+    const app = fixture.debugElement.componentInstance;
+    fixture.detectChanges();
+    http.expectOne('/products').flush([product('a1', 'egg', 1), product('a2', 'egg', 2), product('a3', 'milk', 1)]);
+
+    events.emit('add', { collection: 'product', docs: [product('a4', 'bread', 5)] });
+    events.emit('consume', { collection: 'product', recipe: 'omelette', ids: ['a1', 'a2'] });
+    events.emit('delete', { collection: 'product', ids: ['a3'] });
+    events.emit('add', { collection: 'recipe', docs: [] });
+
+    expect(app.products.map(item => item._id.$oid)).toEqual(['a4']);
+    http.verify();
+  });
+
+  it('should apply quantities left in partly used products', () => {
+    const http = TestBed.get(HttpTestingController);
+    const fixture = TestBed.createComponent(AppComponent);
+    const app = fixture.debugElement.componentInstance;
+    fixture.detectChanges();
+    http.expectOne('/products').flush([product('a1', 'flour', 1, 500, 'g'), product('a2', 'flour', 2, 1000, 'g')]);
+
+    events.emit('consume', { collection: 'product', recipe: 'cake', ids: ['a1'], quantities: { a2: 800 } });
+    events.emit('update', { collection: 'product', quantities: { a2: 650 } });
+
+    expect(app.products.map(item => [item._id.$oid, item.quantity])).toEqual([['a2', 650]]);
+  });
+
+  it('should hold changes that arrive before the first load', () => {
+    const http = TestBed.get(HttpTestingController);
+    const fixture = TestBed.createComponent(AppComponent);
+    const app = fixture.debugElement.componentInstance;
+    fixture.detectChanges();
+
+    events.emit('add', { collection: 'product', docs: [product('a2', 'egg', 2)] });
+    events.emit('delete', { collection: 'product', ids: ['a1'] });
+    http.expectOne('/products').flush([product('a1', 'egg', 1), product('a2', 'egg', 2)]);
+
+    expect(app.products.map(item => item._id.$oid)).toEqual(['a2']);
+  });
+
+  it('should reload products on a reset event', () => {
+    const http = TestBed.get(HttpTestingController);
+    const fixture = TestBed.createComponent(AppComponent);
+    const app = fixture.debugElement.componentInstance;
+    fixture.detectChanges();
+    http.expectOne('/products').flush([product('a1', 'egg', 1)]);
+
+    events.emit('reset', { collection: 'product' });
+    http.expectOne('/products').flush([product('b1', 'milk', 1), product('b2', 'milk', 2)]);
+
+    expect(app.products.length).toEqual(2);
+    fixture.destroy();
+    expect(events.closed).toBe(true);
+  });
 });
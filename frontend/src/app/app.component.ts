@@ -1,10 +1,112 @@
-import { Component } from '@angular/core';
+import { Component, NgZone, OnDestroy, OnInit } from '@angular/core';
+import { HttpClient } from '@angular/common/http';
+
+import { environment } from '../environments/environment';
+
+export interface Product {
+  _id: { $oid: string };
+  prodType: string;
+  expDate: { $date: number };
+  quantity: number;
+  unit: string;
+  note?: string;
+}
+
+// changes pushed by the API's /events stream
+export interface Change {
+  collection: string;
+  docs?: Product[];
+  ids?: string[];
+  quantities?: { [id: string]: number };
+}
+
+// same order as the API's /products listing
+function compareProducts(a: Product, b: Product): number {
+  if (a.prodType !== b.prodType) {
+    return a.prodType < b.prodType ? -1 : 1;
+  }
+  if (a.expDate.$date !== b.expDate.$date) {
+    return a.expDate.$date - b.expDate.$date;
+  }
+  return a._id.$oid < b._id.$oid ? -1 : a._id.$oid > b._id.$oid ? 1 : 0;
+}
 
 @Component({
   selector: 'app-root',
   templateUrl: './app.component.html',
   styleUrls: ['./app.component.css']
 })
-export class AppComponent {
+export class AppComponent implements OnInit, OnDestroy {
   title = 'frontend';
+  products: Product[] = [];
+
+  private events: EventSource;
+  private loaded = false;
+  private pending: [string, Change][] = [];
+
+  constructor(private http: HttpClient, private zone: NgZone) { }
+
+  ngOnInit() {
+    // the stream is opened before the first load so no change made in
+    // between is missed; changes that arrive early wait for the load
+    this.events = this.openEvents(environment.apiUrl + '/events');
+    for (const name of ['add', 'delete', 'consume', 'update', 'reset']) {
+      this.events.addEventListener(name, (event: MessageEvent) => {
+        this.zone.run(() => this.receive(name, JSON.parse(event.data)));
+      });
+    }
+    this.load();
+  }
+
+  ngOnDestroy() {
+    this.events.close();
+  }
+
+  openEvents(url: string): EventSource {
+    return new EventSource(url);
+  }
+
+  load() {
+    this.loaded = false;
+    this.http.get<Product[]>(environment.apiUrl + '/products').subscribe(products => {
+      this.products = products;
+      this.loaded = true;
+      const pending = this.pending;
+      this.pending = [];
+      pending.forEach(([name, change]) => this.apply(name, change));
+    });
+  }
+
+  receive(name: string, change: Change) {
+    if (change.collection !== 'product') {
+      return;
+    }
+    if (this.loaded) {
+      this.apply(name, change);
+    } else {
+      this.pending.push([name, change]);
+    }
+  }
+
+  apply(name: string, change: Change) {
+    if (name === 'reset') {
+      this.load();
+    } else if (name === 'add') {
+      const known = new Set(this.products.map(product => product._id.$oid));
+      const added = change.docs.filter(product => !known.has(product._id.$oid));
+      this.products = this.products.concat(added).sort(compareProducts);
+    } else {
+      // deletes and recipe consumption both remove products by id, and
+      // consumption leaves new quantities in products only partly used
+      const removed = new Set(change.ids || []);
+      const quantities = change.quantities || {};
+      this.products = this.products.filter(product => !removed.has(product._id.$oid)).map(product =>
+        product._id.$oid in quantities ? { ...product, quantity: quantities[product._id.$oid] } : product
+      );
+    }
+  }
+
+  isExpired(product: Product): boolean {
+    return product.expDate.$date < Date.now();
+  }
 }
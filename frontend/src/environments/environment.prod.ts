@@ -1,3 +1,5 @@
 export const environment = {
-  production: true
+  production: true,
+  // base URL of the GroceryHelper API; empty when served from the same origin
+  apiUrl: ''
 };
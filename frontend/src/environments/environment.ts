@@ -3,7 +3,9 @@
 // The list of file replacements can be found in `angular.json`.
 
 export const environment = {
-  production: false
+  production: false,
+  // base URL of the GroceryHelper API; empty when served from the same origin
+  apiUrl: ''
 };
 
 /*
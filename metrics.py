@@ -0,0 +1,155 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import time
+import bisect
+import threading
+from flask import Response, g, request
+from pymongo import monitoring
+
+# upper bounds in seconds of the request latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class CommandCounter(monitoring.CommandListener):
+	''' counts Mongo commands and the time spent on them, per thread.
+		pymongo calls listeners on the thread that issued the command,
+		so each request only sees its own commands
+	'''
+
+	def __init__(self):
+		self.local = threading.local()
+
+	def reset(self):
+		self.local.count = 0
+		self.local.duration = 0.0
+
+	def read(self):
+		''' returns (commands, seconds) since the last reset on this thread
+		'''
+
+		return getattr(self.local, "count", 0), getattr(self.local, "duration", 0.0)
+
+	def started(self, event):
+		pass
+
+	def succeeded(self, event):
+		self.record(event)
+
+	def failed(self, event):
+		self.record(event)
+
+	def record(self, event):
+		count, duration = self.read()
+		self.local.count = count + 1
+		self.local.duration = duration + event.duration_micros / 1000000.0
+
+class Histogram(object):
+	''' request latencies of one route, bucketed by BUCKETS
+	'''
+
+	def __init__(self):
+		self.buckets = [0] * (len(BUCKETS) + 1)	# last bucket is +Inf
+		self.sum = 0.0
+		self.count = 0
+		self.queries = 0
+
+	def observe(self, seconds, queries):
+		self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+		self.sum += seconds
+		self.count += 1
+		self.queries += queries
+
+class Metrics(object):
+	''' per-route latency histograms and Mongo command counts for a Flask
+		app. must be created before the Mongo client so pymongo picks up
+		the command listener
+	'''
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.routes = {}		# stored as {route:Histogram}
+		self.counters = []		# stored as [(name, help, function returning value)]
+		self.commands = CommandCounter()
+		monitoring.register(self.commands)
+
+	def install(self, app):
+		''' times every request of app and serves the results at /metrics
+		'''
+
+		app.before_request(self.start)
+		app.after_request(self.finish)
+		app.add_url_rule('/metrics', 'metrics', self.render, methods=['GET'])
+
+	def addCounter(self, name, help, value):
+		''' adds a counter to /metrics whose value is read by calling value()
+		'''
+
+		self.counters += [(name, help, value)]
+
+	def start(self):
+		g.metricsStart = time.perf_counter()
+		self.commands.reset()
+
+	def finish(self, response):
+		# requests refused before before_request ran, such as a 404 for
+		# an invalid household from a url_value_preprocessor, aren't timed
+		started = g.get("metricsStart")
+		if started == None:
+			return response
+		elapsed = time.perf_counter() - started
+		queries, dbTime = self.commands.read()
+		route = request.url_rule.rule if request.url_rule != None else "unmatched"
+
+		with self.lock:
+			if route not in self.routes:
+				self.routes[route] = Histogram()
+			self.routes[route].observe(elapsed, queries)
+
+		response.headers["Server-Timing"] = 'app;dur={:.2f}, db;dur={:.2f};desc="{} queries"'.format(elapsed * 1000, dbTime * 1000, queries)
+		return response
+
+	def render(self):
+		''' returns every metric in Prometheus text format
+		'''
+
+		lines = [
+			"# HELP groceryhelper_request_duration_seconds Request latency by route.",
+			"# TYPE groceryhelper_request_duration_seconds histogram"
+		]
+		queryLines = [
+			"# HELP groceryhelper_mongo_commands_total Mongo commands issued by route.",
+			"# TYPE groceryhelper_mongo_commands_total counter"
+		]
+
+		with self.lock:
+			for route in sorted(self.routes):
+				histogram = self.routes[route]
+				label = 'route="' + route.replace('\\', '\\\\').replace('"', '\\"') + '"'
+				total = 0
+				for bound, count in zip(BUCKETS + ("+Inf",), histogram.buckets):
+					total += count
+					lines += ['groceryhelper_request_duration_seconds_bucket{' + label + ',le="' + str(bound) + '"} ' + str(total)]
+				lines += ['groceryhelper_request_duration_seconds_sum{' + label + '} ' + repr(histogram.sum)]
+				lines += ['groceryhelper_request_duration_seconds_count{' + label + '} ' + str(histogram.count)]
+				queryLines += ['groceryhelper_mongo_commands_total{' + label + '} ' + str(histogram.queries)]
+
+		lines += queryLines
+		for name, help, value in self.counters:
+			lines += ["# HELP " + name + " " + help, "# TYPE " + name + " counter", name + " " + str(value())]
+
+		return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
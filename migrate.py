@@ -0,0 +1,77 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import sys
+import json
+import argparse
+import pantry
+from models import Product, Recipe
+
+# documents written per SQLite transaction while copying
+COPY_BATCH_SIZE = 1000
+
+def copy(docs, target, docType):
+	''' inserts docs into target in batches. returns the number copied
+		and the number target already had
+	'''
+
+	copied = 0
+	skipped = 0
+	batch = []
+	for doc in docs:
+		batch += [doc]
+		if len(batch) == COPY_BATCH_SIZE:
+			inserted, errors = target.insertMany(docType, batch)
+			copied += inserted
+			skipped += len(errors)
+			batch = []
+	if batch:
+		inserted, errors = target.insertMany(docType, batch)
+		copied += inserted
+		skipped += len(errors)
+	return copied, skipped
+
+def main():
+	parser = argparse.ArgumentParser(description="Copies the products and recipes of the Mongo database in config.json into a SQLite file for \"storage\": \"sqlite\".")
+	parser.add_argument("path", help="SQLite file to copy into; it is created if missing")
+	args = parser.parse_args()
+
+	# load config from JSON
+	try:
+		with open(os.environ.get("GROCERYHELPER_CONFIG", "config.json")) as json_file:
+			config = json.load(json_file)
+	except Exception as e:
+		print("config.json Load Error: ", e)
+		sys.exit(1)
+
+	# the source is always Mongo, even if config.json already selects SQLite
+	config["storage"] = "mongo"
+	source = pantry.connect(config)
+	target = pantry.SqliteStore(args.path)
+
+	# documents keep their ids, so IDs shown before still work and
+	# running the migration again only copies what is new
+	for name, docs, docType in (("products", source.products(), Product), ("recipes", source.recipes(), Recipe)):
+		copied, skipped = copy(docs, target, docType)
+		print("Copied " + str(copied) + " " + name + " (" + str(skipped) + " already present)")
+
+	print('Set "storage": "sqlite" and "sqlite": "' + args.path + '" in config.json to use it.')
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,117 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import re
+import datetime
+from bson import ObjectId
+from mongoengine import *
+from units import BASE_UNITS, COUNT, TOLERANCE, amount
+
+# default look-ahead window for soon-to-expire products
+EXPIRING_DAYS = 3
+
+# format of dates given to routes that filter or plan by day
+DATE_FORMAT = "%Y-%m-%d"
+
+# household owning documents saved without one, and what a household
+# name may contain, as it is also a URL path segment
+DEFAULT_HOUSEHOLD = "default"
+HOUSEHOLD_PATTERN = r"^[a-z0-9_-]+$"
+HOUSEHOLD_LENGTH = 50
+
+class Recipe(Document):
+	household = StringField(required=True, default=DEFAULT_HOUSEHOLD, regex=HOUSEHOLD_PATTERN, max_length=HOUSEHOLD_LENGTH)
+	name = StringField(required=True, max_length=50)				# stored in lowercase, unique per household
+	ingredients = DictField(required=True)							# stored as {prodType:qty}
+	units = DictField()												# stored as {prodType:unit}, COUNT if left out
+	instructions = StringField(required=True)
+	shortId = StringField(max_length=4)								# last four characters of id
+
+	meta = {'indexes': [('household', 'shortId'), {'fields': ['household', 'name'], 'unique': True}]}
+
+	def clean(self):
+		assignShortId(self)
+
+	def need(self, key):
+		''' returns (qty, unit) of an ingredient, qty in the unit's base unit
+		'''
+
+		return self.ingredients[key], (self.units or {}).get(key, COUNT)
+
+	def shortfall(self, stock):
+		''' returns {prodType:qty} of ingredients missing from stock, in
+			the units need() gives, where stock is a {prodType:{unit:qty}}
+			dict from stockCounts()
+		'''
+
+		missing = {}
+		for key in self.ingredients:
+			qty, unit = self.need(key)
+			have = stock.get(key, {}).get(unit, 0)
+			if have < qty - TOLERANCE:
+				missing[key] = amount(qty - have)
+		return missing
+
+class Product(Document):
+	household = StringField(required=True, default=DEFAULT_HOUSEHOLD, regex=HOUSEHOLD_PATTERN, max_length=HOUSEHOLD_LENGTH)
+	prodType = StringField(required=True, max_length=50)	# stored as lowercase
+	expDate = DateTimeField(required=True)
+	quantity = FloatField(default=1, min_value=0)	# stored in the base unit of unit
+	unit = StringField(default=COUNT, choices=BASE_UNITS)
+	note = StringField(max_length=50)
+	shortId = StringField(max_length=4)		# last four characters of id
+
+	# every index used by a household's queries leads with household, so
+	# they read only that household's entries; expDate alone serves the
+	# expiry notifier, which looks across all of them
+	meta = {'indexes': [('household', 'shortId'), ('household', 'expDate'), ('household', 'prodType', 'expDate'), 'expDate']}
+
+	def clean(self):
+		assignShortId(self)
+
+	def isExpired(self, currentDate=None):
+		if currentDate == None:
+			currentDate = datetime.datetime.today()
+		if self.expDate < currentDate:
+			return True
+		else:
+			return False
+
+	def willExpireSoon(self, currentDate=None, days=EXPIRING_DAYS):
+		if currentDate == None:
+			currentDate = datetime.datetime.today()
+		targetDate = self.expDate - datetime.timedelta(days=days)
+		if targetDate < currentDate < self.expDate:
+			return True
+		else:
+			return False
+
+def assignShortId(doc):
+	''' gives a new document its id before the first save so the
+		indexed shortId can be stored alongside it
+	'''
+
+	if doc.id == None:
+		doc.id = ObjectId()
+	doc.shortId = str(doc.id)[-4:]
+
+def validHousehold(name):
+	''' true when name can be used as a household
+	'''
+
+	return len(name) <= HOUSEHOLD_LENGTH and re.match(HOUSEHOLD_PATTERN, name) != None
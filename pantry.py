@@ -0,0 +1,1411 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import copy
+import json
+import sqlite3
+import datetime
+import threading
+import mongoengine
+from bson import BSON, ObjectId
+from mongoengine import Q, NotUniqueError
+from pymongo.errors import BulkWriteError, PyMongoError
+from models import DEFAULT_HOUSEHOLD, Product, Recipe
+from units import COUNT, TOLERANCE, amount
+
+# sort order of product and recipe listings; id breaks ties so every
+# position in a listing is unique
+PRODUCT_SORT = ["prodType", "expDate", "id"]
+RECIPE_SORT = ["name", "id"]
+
+# documents fetched from Mongo per round trip when iterating listings
+BATCH_SIZE = 500
+
+# config.json keys used by the application rather than the Mongo client
+APP_SETTINGS = ("storage", "sqlite", "instrumentation", "server")
+
+# Mongo indexes replaced by ones leading with household, dropped by
+# backfillHouseholds(). name_1 made recipe names unique across every household
+LEGACY_INDEXES = {Product: ["shortId_1", "prodType_1_expDate_1"], Recipe: ["shortId_1", "name_1"]}
+
+# collection of each document type, as versions are counted
+COLLECTIONS = {Product: "product", Recipe: "recipe"}
+
+# household that writes by unscoped stores are counted under, as they
+# may change any household's documents
+ALL_HOUSEHOLDS = "*"
+
+# Mongo collection holding the version of each household's collections,
+# and the schema version under SCHEMA_KEY
+VERSION_COLLECTION = "version"
+SCHEMA_KEY = "schema"
+
+# schema of the documents this release writes: 1 added short IDs, 2
+# quantities and 3 households. a database at an older one has the
+# backfills run once by backfill(), after which starts only read it
+SCHEMA_VERSION = 3
+
+# file used by the SQLite store when config.json doesn't name one
+DEFAULT_SQLITE_PATH = "pantry.db"
+
+# tables created by the SQLite store. columns added since the first
+# release come last, as SQLITE_UPGRADES appends them to older files.
+# recipe names are unique per household, a constraint older files are
+# rebuilt to get, as SQLite can't alter one
+SQLITE_RECIPE_TABLE = """
+CREATE TABLE IF NOT EXISTS recipe (
+	id TEXT PRIMARY KEY,
+	name TEXT NOT NULL,
+	ingredients TEXT NOT NULL,
+	instructions TEXT NOT NULL,
+	shortId TEXT,
+	units TEXT NOT NULL DEFAULT '{}',
+	household TEXT NOT NULL DEFAULT 'default',
+	UNIQUE (household, name)
+);
+"""
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS product (
+	id TEXT PRIMARY KEY,
+	prodType TEXT NOT NULL,
+	expDate TEXT NOT NULL,
+	note TEXT,
+	shortId TEXT,
+	quantity REAL NOT NULL DEFAULT 1,
+	unit TEXT NOT NULL DEFAULT 'each',
+	household TEXT NOT NULL DEFAULT 'default'
+);
+CREATE TABLE IF NOT EXISTS version (
+	household TEXT NOT NULL,
+	collection TEXT NOT NULL,
+	count INTEGER NOT NULL DEFAULT 0,
+	PRIMARY KEY (household, collection)
+);
+""" + SQLITE_RECIPE_TABLE
+PRODUCT_COLUMNS = "id, prodType, expDate, note, shortId, quantity, unit, household"
+RECIPE_COLUMNS = "id, name, ingredients, instructions, shortId, units, household"
+
+# indexes, created once the tables are upgraded. each leads with household,
+# so a household's queries read only its own entries: the product index
+# on (household, prodType, expDate, id) serves type lookups and
+# consumption order as well as the listing sort. expDate alone serves the
+# expiry notifier, which looks across every household. the indexes these
+# replaced are dropped from older files
+SQLITE_INDEXES = """
+DROP INDEX IF EXISTS product_shortId;
+DROP INDEX IF EXISTS product_prodType_expDate;
+DROP INDEX IF EXISTS recipe_shortId;
+CREATE INDEX IF NOT EXISTS product_household_shortId ON product (household, shortId);
+CREATE INDEX IF NOT EXISTS product_household_expDate ON product (household, expDate);
+CREATE INDEX IF NOT EXISTS product_household_prodType_expDate ON product (household, prodType, expDate, id);
+CREATE INDEX IF NOT EXISTS product_expDate ON product (expDate);
+CREATE INDEX IF NOT EXISTS recipe_household_shortId ON recipe (household, shortId);
+"""
+
+# columns added to files created before them, as (table, column, definition)
+SQLITE_UPGRADES = [
+	("product", "quantity", "REAL NOT NULL DEFAULT 1"),
+	("product", "unit", "TEXT NOT NULL DEFAULT 'each'"),
+	("product", "household", "TEXT NOT NULL DEFAULT 'default'"),
+	("recipe", "units", "TEXT NOT NULL DEFAULT '{}'")
+]
+
+def mongoSettings(config):
+	''' returns the config.json settings meant for the Mongo client
+	'''
+
+	return {key: config[key] for key in config if key not in APP_SETTINGS}
+
+def connect(config):
+	''' returns the store selected by config["storage"], connecting to
+		Mongo with the rest of the settings when it is used
+	'''
+
+	storage = config.get("storage", "mongo")
+	if storage == "memory":
+		return MemoryStore()
+	if storage == "sqlite":
+		return SqliteStore(config.get("sqlite", DEFAULT_SQLITE_PATH))
+	if storage == "mongo":
+		settings = mongoSettings(config)
+		mongoengine.connect(settings.pop("db"), **settings)
+		return MongoStore()
+	raise ValueError("Unknown storage engine: " + str(storage))
+
+class Shortfall(Exception):
+	''' raised inside a consume() transaction when some ingredient runs
+		out, so everything taken before it is rolled back
+	'''
+
+	def __init__(self, missing):
+		super(Shortfall, self).__init__(missing)
+		self.missing = missing
+
+def byUnit(rows):
+	''' folds (prodType, unit, value) rows into {prodType:{unit:value}}
+	'''
+
+	grouped = {}
+	for prodType, unit, value in rows:
+		grouped.setdefault(prodType, {})[unit] = value
+	return grouped
+
+def duplicateMessage(doc, message):
+	''' the message for a document the database refused as a duplicate,
+		worded the same by every store; message is the database's own,
+		kept for a clashing id
+	'''
+
+	if isinstance(doc, Recipe):
+		return "Recipe " + doc.name + " already exists."
+	return message
+
+class Store(object):
+	''' every read and write of products and recipes made by api.py and
+		cli.py. subclasses implement the queries for one backend; the
+		logic built on top of them lives here once. a store scoped to a
+		household reads and writes only that household's documents; an
+		unscoped one sees every household
+	'''
+
+	household = None
+
+	def scoped(self, household):
+		''' returns a view of this store over the given household's
+			documents, sharing its connection
+		'''
+
+		view = copy.copy(self)
+		view.household = household
+		return view
+
+	def claim(self, doc):
+		''' stamps a new document with the household of a scoped store
+		'''
+
+		if self.household != None:
+			doc.household = self.household
+
+	def versionKey(self, collection):
+		''' returns (household, collection) that this store's writes to
+			collection are counted under by bump(). version() of a scoped
+			store adds up its household's writes and those of unscoped
+			stores, so caches in every process can tell when the documents
+			they hold were changed by any other
+		'''
+
+		return (self.household if self.household != None else ALL_HOUSEHOLDS, collection)
+
+	def canMake(self, recipe):
+		return not recipe.shortfall(self.stockCounts(recipe.ingredients))
+
+	def makeable(self, recipes=None):
+		''' returns the recipes that can be made with current stock and
+			{name:{prodType:qty}} missing from those that can't, counting
+			stock once for all of them
+		'''
+
+		if recipes == None:
+			recipes = self.recipes()
+		stock = self.stockCounts()
+		makeable = []
+		shortfall = {}
+		for recipe in recipes:
+			missing = recipe.shortfall(stock)
+			if missing:
+				shortfall[recipe.name] = missing
+			else:
+				makeable += [recipe]
+		return makeable, shortfall
+
+	def findProducts(self, docId):
+		return self.find(Product, docId)
+
+	def findManyProducts(self, docIds):
+		return self.findMany(Product, docIds)
+
+	def matchesOf(self, docs, docIds):
+		''' returns {docId:[document]} of the docs whose id ends with each
+			of docIds, from docs already narrowed down by short ID
+		'''
+
+		matches = {docId: [] for docId in docIds}
+		for doc in docs:
+			for docId in matches:
+				if doc.shortId == docId[-4:] and str(doc.id).endswith(docId):
+					matches[docId] += [doc]
+		return matches
+
+	def openChanges(self):
+		''' returns an iterator of (event, data) for every document added
+			to, deleted from or updated in the database by any process, or
+			None if the backend can't watch for changes
+		'''
+
+		return None
+
+	def findRecipes(self, docId):
+		return self.find(Recipe, docId)
+
+	def backfill(self):
+		''' fills in households, short IDs and quantities on documents saved
+			by older versions, then records SCHEMA_VERSION so later starts
+			skip the scans. safe to run from several processes at once
+		'''
+
+		if self.schemaVersion() >= SCHEMA_VERSION:
+			return
+		self.backfillHouseholds()
+		self.backfillShortIds()
+		self.backfillQuantities()
+		self.setSchemaVersion(SCHEMA_VERSION)
+
+class MongoStore(Store):
+	''' products and recipes stored in Mongo through mongoengine
+	'''
+
+	def objects(self, docType, **query):
+		''' returns docType.objects(**query), only the household's
+			documents when scoped
+		'''
+
+		if self.household != None:
+			query["household"] = self.household
+		return docType.objects(**query)
+
+	def aggregate(self, docType, pipeline):
+		''' runs pipeline over docType, matching the household first when
+			scoped so the household-leading indexes are used
+		'''
+
+		if self.household != None:
+			pipeline = [{"$match": {"household": self.household}}] + pipeline
+		return docType.objects.aggregate(*pipeline)
+
+	def versions(self):
+		return Product._get_db()[VERSION_COLLECTION]
+
+	def version(self, collection):
+		''' returns the number of writes made to collection, see versionKey()
+		'''
+
+		if self.household != None:
+			query = {"_id": {"$in": ["/".join(self.versionKey(collection)), "/".join((ALL_HOUSEHOLDS, collection))]}}
+		else:
+			query = {"collection": collection}
+		return sum(doc["count"] for doc in self.versions().find(query, {"count": True}))
+
+	def bump(self, collection):
+		self.versions().update_one({"_id": "/".join(self.versionKey(collection))}, {"$inc": {"count": 1}, "$setOnInsert": {"collection": collection}}, upsert=True)
+
+	def countProducts(self):
+		return self.objects(Product).count()
+
+	def countRecipes(self):
+		return self.objects(Recipe).count()
+
+	def products(self, after=None, limit=None, raw=False):
+		''' returns products sorted by PRODUCT_SORT, optionally only those
+			after the given sort key values and at most limit of them. raw
+			returns them as stored, as dicts without shortId or household,
+			rather than as documents
+		'''
+
+		return self.listing(self.objects(Product), PRODUCT_SORT, after, limit, raw)
+
+	def recipes(self, after=None, limit=None, raw=False):
+		''' returns recipes sorted by RECIPE_SORT, optionally only those
+			after the given sort key values and at most limit of them. raw
+			returns them as stored, as dicts without shortId or household,
+			rather than as documents
+		'''
+
+		return self.listing(self.objects(Recipe), RECIPE_SORT, after, limit, raw)
+
+	def listing(self, queryset, sortFields, after, limit, raw):
+		queryset = queryset.order_by(*sortFields)
+		if after != None:
+			queryset = queryset.filter(afterQuery(sortFields, after))
+		if limit != None:
+			queryset = queryset.limit(limit)
+
+		# skips building documents for callers that only serialize them
+		if raw:
+			queryset = queryset.exclude("shortId", "household").as_pymongo()
+
+		# results are read in batches and not kept, so memory stays bounded
+		return queryset.no_cache().batch_size(BATCH_SIZE)
+
+	def recipe(self, name):
+		return self.objects(Recipe, name=name).first()
+
+	def recipesNamed(self, names):
+		''' returns {name:recipe} for the recipes with the given names
+			using a single query on the unique (household, name) index
+		'''
+
+		return {recipe.name: recipe for recipe in self.objects(Recipe, name__in=list(names))}
+
+	def expired(self, currentDate, fields=None, since=None, raw=False):
+		''' returns products that expired before currentDate, or only those
+			that expired since the given date, with a range query on the
+			expDate index, fetching only the given fields, as stored if raw
+		'''
+
+		products = self.objects(Product, expDate__lt=currentDate).order_by("expDate")
+		if since != None:
+			products = products.filter(expDate__gte=since)
+		if fields:
+			products = products.only(*fields)
+		return products.as_pymongo() if raw else products
+
+	def nextExpiry(self, after):
+		''' returns the earliest expDate on or after the given date, or None
+		'''
+
+		product = self.objects(Product, expDate__gte=after).order_by("expDate").only("expDate").first()
+		return product.expDate if product != None else None
+
+	def expiring(self, currentDate, days, fields=None, raw=False):
+		''' returns products that expire within days of currentDate with a
+			range query on the expDate index, fetching only the given fields,
+			as stored if raw
+		'''
+
+		targetDate = currentDate + datetime.timedelta(days=days)
+		products = self.objects(Product, expDate__gte=currentDate, expDate__lt=targetDate).order_by("expDate")
+		if fields:
+			products = products.only(*fields)
+		return products.as_pymongo() if raw else products
+
+	def stockCounts(self, prodTypes=None):
+		''' returns {prodType:{unit:qty}} of products in inventory using a
+			single aggregation, optionally restricted to the given types
+		'''
+
+		pipeline = [{"$group": {"_id": {"prodType": "$prodType", "unit": "$unit"}, "qty": {"$sum": "$quantity"}}}]
+		if prodTypes is not None:
+			pipeline.insert(0, {"$match": {"prodType": {"$in": list(prodTypes)}}})
+		return byUnit((group["_id"]["prodType"], group["_id"]["unit"], amount(group["qty"])) for group in self.aggregate(Product, pipeline))
+
+	def expiringCounts(self, currentDate, days):
+		''' returns {prodType:{unit:qty}} of products that expire within
+			days of currentDate, grouping only the range matched on the
+			expDate index
+		'''
+
+		targetDate = currentDate + datetime.timedelta(days=days)
+		pipeline = [
+			{"$match": {"expDate": {"$gte": currentDate, "$lt": targetDate}}},
+			{"$group": {"_id": {"prodType": "$prodType", "unit": "$unit"}, "qty": {"$sum": "$quantity"}}}
+		]
+		return byUnit((group["_id"]["prodType"], group["_id"]["unit"], amount(group["qty"])) for group in self.aggregate(Product, pipeline))
+
+	def freshCounts(self, prodTypes, dates):
+		''' returns {prodType:{unit:[qty]}} for products of the given
+			types, where the nth qty is of those expiring on or after the
+			nth of the ascending dates, computed with a single aggregation
+		'''
+
+		group = {"_id": {"prodType": "$prodType", "unit": "$unit"}}
+		for i, date in enumerate(dates):
+			group["fresh" + str(i)] = {"$sum": {"$cond": [{"$gte": ["$expDate", date]}, "$quantity", 0]}}
+		pipeline = [
+			{"$match": {"prodType": {"$in": list(prodTypes)}, "expDate": {"$gte": dates[0]}}},
+			{"$group": group}
+		]
+		return byUnit((
+			group["_id"]["prodType"], group["_id"]["unit"],
+			[amount(group["fresh" + str(i)]) for i in range(len(dates))]
+		) for group in self.aggregate(Product, pipeline))
+
+	def inventorySummary(self, currentDate, days):
+		''' returns the count, total quantity, earliest and latest expDate
+			and number of expired and soon-to-expire products of every
+			prodType and unit, computed with a single aggregation
+		'''
+
+		targetDate = currentDate + datetime.timedelta(days=days)
+		pipeline = [
+			{"$group": {
+				"_id": {"prodType": "$prodType", "unit": "$unit"},
+				"count": {"$sum": 1},
+				"quantity": {"$sum": "$quantity"},
+				"earliest": {"$min": "$expDate"},
+				"latest": {"$max": "$expDate"},
+				"expired": {"$sum": {"$cond": [{"$lt": ["$expDate", currentDate]}, 1, 0]}},
+				"beforeTarget": {"$sum": {"$cond": [{"$lt": ["$expDate", targetDate]}, 1, 0]}}
+			}},
+			{"$sort": {"_id.prodType": 1, "_id.unit": 1}}
+		]
+
+		summary = []
+		for group in self.aggregate(Product, pipeline):
+			key = group.pop("_id")
+			group["prodType"] = key["prodType"]
+			group["unit"] = key["unit"]
+			group["quantity"] = amount(group["quantity"])
+
+			# products expiring soon are those before the target date that aren't already expired
+			group["expiring"] = group.pop("beforeTarget") - group["expired"]
+			summary += [group]
+		return summary
+
+	def find(self, docType, docId):
+		''' returns every document of docType whose id ends with docId using
+			the indexed shortId field; giving more than four characters
+			narrows down colliding IDs
+		'''
+
+		if len(docId) < 4:
+			return []
+		return [doc for doc in self.objects(docType, shortId=docId[-4:]) if str(doc.id).endswith(docId)]
+
+	def findMany(self, docType, docIds):
+		''' returns {docId:[document]} for several IDs as find() does,
+			with one query on the shortId index for all of them
+		'''
+
+		docs = self.objects(docType, shortId__in=list(set(docId[-4:] for docId in docIds if len(docId) >= 4)))
+		return self.matchesOf(docs, docIds)
+
+	def add(self, doc):
+		self.claim(doc)
+		doc.save()
+		self.bump(COLLECTIONS[type(doc)])
+
+	def insertMany(self, docType, docs):
+		''' inserts validated documents with one unordered insert_many.
+			returns the number inserted and [(index, message)] for every
+			document the database rejected
+		'''
+
+		for doc in docs:
+			self.claim(doc)
+		try:
+			result = docType._get_collection().insert_many([doc.to_mongo() for doc in docs], ordered=False)
+			inserted, errors = len(result.inserted_ids), []
+		except BulkWriteError as e:
+			inserted = e.details["nInserted"]
+			errors = []
+			for error in e.details["writeErrors"]:
+				message = error["errmsg"]
+				if error.get("code") == 11000 and "_id" not in error.get("keyPattern", {}):
+					message = duplicateMessage(docs[error["index"]], message)
+				errors += [(error["index"], message)]
+		if inserted > 0:
+			self.bump(COLLECTIONS[docType])
+		return inserted, errors
+
+	def delete(self, doc):
+		doc.delete()
+		self.bump(COLLECTIONS[type(doc)])
+
+	def deleteAllProducts(self):
+		self.objects(Product).delete()
+		self.bump("product")
+
+	def deleteExpired(self, currentDate):
+		''' deletes every product that expired before currentDate with one
+			delete_many. returns the number deleted
+		'''
+
+		query = {"expDate": {"$lt": currentDate}}
+		if self.household != None:
+			query["household"] = self.household
+		deleted = Product._get_collection().delete_many(query).deleted_count
+		if deleted > 0:
+			self.bump("product")
+		return deleted
+
+	def deleteProducts(self, ids=None, prodType=None, before=None):
+		''' deletes the products with the given ids, of the given prodType
+			and expiring before the given date, whichever are given, with
+			one delete_many. returns the ids of the products deleted
+		'''
+
+		products = self.objects(Product)
+		if ids is not None:
+			products = products.filter(id__in=list(ids))
+		if prodType != None:
+			products = products.filter(prodType=prodType)
+		if before != None:
+			products = products.filter(expDate__lt=before)
+
+		# the ids are read first so they can be reported
+		ids = list(products.scalar("id"))
+		if ids:
+			self.objects(Product, id__in=ids).delete()
+			self.bump("product")
+		return ids
+
+	def deleteAllRecipes(self):
+		self.objects(Recipe).delete()
+		self.bump("recipe")
+
+	def consume(self, recipe):
+		''' takes the quantities used by recipe from inventory,
+			earliest-expiring first. returns {prodType:qty} of anything
+			that could not be consumed, which is empty on success, the ids
+			of the products used up and deleted, and {id:qty} left in
+			products only partly used. when anything is missing nothing is
+			taken: what was taken of the other ingredients is put back
+		'''
+
+		missing = {}
+		used = []
+		left = {}
+		removed = []	# products deleted, to be inserted again on a shortfall
+		taken = {}		# stored as {id:qty taken with $inc}
+		for key in recipe.ingredients:
+			needed, unit = recipe.need(key)
+
+			# products holding no more than is still needed are deleted,
+			# reading back the quantity they held, and the last one used
+			# has the rest taken with $inc. both are conditional on the
+			# quantity, so a concurrent consumer can't take the same stock
+			# twice or drive it below zero; a product changed in between
+			# fails its condition and the remaining candidates are read again
+			exhausted = False
+			while needed > TOLERANCE and not exhausted:
+				exhausted = True
+				for product in self.objects(Product, prodType=key, unit=unit).order_by("expDate").only("quantity"):
+					exhausted = False
+					if product.quantity <= needed + TOLERANCE:
+						deleted = self.objects(Product, id=product.id, quantity__lte=needed + TOLERANCE).modify(remove=True)
+						if deleted == None:
+							break
+						needed -= deleted.quantity
+						used += [product.id]
+						removed += [deleted]
+					else:
+						# raw, as mongoengine validates the negative step against min_value
+						updated = self.objects(Product, id=product.id, quantity__gt=needed + TOLERANCE).modify(new=True, __raw__={"$inc": {"quantity": -needed}})
+						if updated == None:
+							break
+						left[product.id] = amount(updated.quantity)
+						taken[product.id] = needed
+						needed = 0
+					if needed <= TOLERANCE:
+						break
+			if needed > TOLERANCE:
+				missing[key] = amount(needed)
+		if removed or taken:
+			self.bump("product")
+
+		# without a transaction the stock taken is given back instead; a
+		# concurrent consumer may briefly find it missing in between
+		if missing:
+			if removed:
+				Product._get_collection().insert_many([doc.to_mongo() for doc in removed])
+			for docId in taken:
+				self.objects(Product, id=docId).update_one(__raw__={"$inc": {"quantity": taken[docId]}})
+			return missing, [], {}
+		return missing, used, left
+
+	def openChanges(self):
+		''' opens a change stream over both collections. change streams need
+			a replica set, so None is returned on a standalone mongod (or
+			mongomock). updates look up the document to learn its household
+		'''
+
+		collections = {Product._get_collection_name(): Product, Recipe._get_collection_name(): Recipe}
+		pipeline = [{"$match": {"operationType": {"$in": ["insert", "delete", "update"]}, "ns.coll": {"$in": list(collections)}}}]
+		try:
+			stream = Product._get_db().watch(pipeline, full_document="updateLookup")
+		except (PyMongoError, NotImplementedError, TypeError):
+			# mongomock databases have no watch(), so the attribute is a
+			# collection and calling it raises TypeError
+			return None
+		return self.changes(stream, collections)
+
+	def changes(self, stream, collections):
+		''' yields (event, data) for each change, with the household of the
+			document in data, or None when it isn't known: deletes carry only
+			the id, and an update looked up after a delete finds nothing
+		'''
+
+		with stream:
+			for change in stream:
+				collection = change["ns"]["coll"]
+				document = change.get("fullDocument")
+				household = document.get("household", DEFAULT_HOUSEHOLD) if document else None
+				if change["operationType"] == "insert":
+					yield "add", {"collection": collection, "household": household, "docs": [collections[collection]._from_son(change["fullDocument"])]}
+				elif change["operationType"] == "update":
+					# only consumption updates products, taking from quantity
+					fields = change["updateDescription"]["updatedFields"]
+					if "quantity" in fields:
+						yield "update", {"collection": collection, "household": household, "quantities": {str(change["documentKey"]["_id"]): amount(fields["quantity"])}}
+				else:
+					yield "delete", {"collection": collection, "household": None, "ids": [str(change["documentKey"]["_id"])]}
+
+	def schemaVersion(self):
+		marker = self.versions().find_one({"_id": SCHEMA_KEY})
+		return marker["version"] if marker != None else 0
+
+	def setSchemaVersion(self, version):
+		self.versions().update_one({"_id": SCHEMA_KEY}, {"$max": {"version": version}}, upsert=True)
+
+	def backfillShortIds(self):
+		''' sets shortId on any documents saved before the field existed
+		'''
+
+		for docType in (Product, Recipe):
+			for doc in docType.objects(shortId=None).only("id"):
+				docType.objects(id=doc.id).update_one(set__shortId=str(doc.id)[-4:])
+
+	def backfillQuantities(self):
+		''' gives products saved before quantities existed one of COUNT
+		'''
+
+		Product.objects(quantity=None).update(set__quantity=1)
+		Product.objects(unit=None).update(set__unit=COUNT)
+
+	def backfillHouseholds(self):
+		''' gives documents saved before households existed the default
+			household and drops the indexes replaced by household ones
+		'''
+
+		for docType in (Product, Recipe):
+			docType.objects(household=None).update(set__household=DEFAULT_HOUSEHOLD)
+			collection = docType._get_collection()
+			for name in LEGACY_INDEXES[docType]:
+				if name in collection.index_information():
+					collection.drop_index(name)
+
+def afterQuery(sortFields, values):
+	''' returns a query matching every document that sorts after the
+		given values of sortFields
+	'''
+
+	query = None
+	for i in range(len(sortFields)):
+		clause = {sortFields[j]: values[j] for j in range(i)}
+		clause[sortFields[i] + "__gt"] = values[i]
+		query = Q(**clause) if query == None else query | Q(**clause)
+	return query
+
+class MemoryStore(Store):
+	''' products and recipes kept in process memory as unsaved documents,
+		for tests and benchmarks that don't need a database
+	'''
+
+	def __init__(self):
+		self.lock = threading.RLock()
+		self.docs = {Product: {}, Recipe: {}}	# stored as {docType:{household:{id:document}}}
+		self.raw = {Product: {}, Recipe: {}}	# stored as {docType:{household:{id:dict as stored}}}
+		self.counts = {}	# stored as {versionKey():writes}
+
+	def each(self, docType):
+		''' returns the documents of docType in scope. a scoped store reads
+			only its household's partition, so its scans don't grow with
+			other households' documents
+		'''
+
+		if self.household != None:
+			return list(self.docs[docType].get(self.household, {}).values())
+		return [doc for partition in self.docs[docType].values() for doc in partition.values()]
+
+	def sortKey(self, doc, sortFields):
+		return tuple(getattr(doc, field) for field in sortFields)
+
+	def listing(self, docType, sortFields, after, limit, raw):
+		with self.lock:
+			docs = sorted(self.each(docType), key=lambda doc: self.sortKey(doc, sortFields))
+		if after != None:
+			docs = [doc for doc in docs if self.sortKey(doc, sortFields) > tuple(after)]
+		return self.rawDocs(docs[:limit] if limit != None else docs, raw)
+
+	def rawDocs(self, docs, raw):
+		''' returns docs, or the dicts they were stored as if raw. the
+			dicts are shared and mustn't be changed
+		'''
+
+		if not raw:
+			return docs
+		with self.lock:
+			return [self.raw[type(doc)][doc.household][doc.id] for doc in docs]
+
+	def version(self, collection):
+		with self.lock:
+			if self.household != None:
+				return self.counts.get(self.versionKey(collection), 0) + self.counts.get((ALL_HOUSEHOLDS, collection), 0)
+			return sum(count for (household, name), count in self.counts.items() if name == collection)
+
+	def bump(self, collection):
+		key = self.versionKey(collection)
+		with self.lock:
+			self.counts[key] = self.counts.get(key, 0) + 1
+
+	def countProducts(self):
+		with self.lock:
+			return len(self.each(Product))
+
+	def countRecipes(self):
+		with self.lock:
+			return len(self.each(Recipe))
+
+	def products(self, after=None, limit=None, raw=False):
+		return self.listing(Product, PRODUCT_SORT, after, limit, raw)
+
+	def recipes(self, after=None, limit=None, raw=False):
+		return self.listing(Recipe, RECIPE_SORT, after, limit, raw)
+
+	def recipe(self, name):
+		with self.lock:
+			for recipe in self.each(Recipe):
+				if recipe.name == name:
+					return recipe
+		return None
+
+	def recipesNamed(self, names):
+		names = set(names)
+		with self.lock:
+			return {recipe.name: recipe for recipe in self.each(Recipe) if recipe.name in names}
+
+	def expired(self, currentDate, fields=None, since=None, raw=False):
+		with self.lock:
+			products = [product for product in self.each(Product) if product.expDate < currentDate]
+		if since != None:
+			products = [product for product in products if product.expDate >= since]
+		return self.rawDocs(sorted(products, key=lambda product: product.expDate), raw)
+
+	def nextExpiry(self, after):
+		with self.lock:
+			dates = [product.expDate for product in self.each(Product) if product.expDate >= after]
+		return min(dates) if dates else None
+
+	def expiring(self, currentDate, days, fields=None, raw=False):
+		targetDate = currentDate + datetime.timedelta(days=days)
+		with self.lock:
+			products = [product for product in self.each(Product) if currentDate <= product.expDate < targetDate]
+		return self.rawDocs(sorted(products, key=lambda product: product.expDate), raw)
+
+	def totals(self, products):
+		''' returns {prodType:{unit:qty}} summed over products
+		'''
+
+		totals = {}
+		for product in products:
+			stock = totals.setdefault(product.prodType, {})
+			stock[product.unit] = amount(stock.get(product.unit, 0) + product.quantity)
+		return totals
+
+	def stockCounts(self, prodTypes=None):
+		with self.lock:
+			return self.totals(product for product in self.each(Product) if prodTypes is None or product.prodType in prodTypes)
+
+	def expiringCounts(self, currentDate, days):
+		targetDate = currentDate + datetime.timedelta(days=days)
+		with self.lock:
+			return self.totals(product for product in self.each(Product) if currentDate <= product.expDate < targetDate)
+
+	def freshCounts(self, prodTypes, dates):
+		counts = {}
+		with self.lock:
+			for product in self.each(Product):
+				if product.prodType in prodTypes and product.expDate >= dates[0]:
+					fresh = counts.setdefault(product.prodType, {}).setdefault(product.unit, [0] * len(dates))
+					for i, date in enumerate(dates):
+						if product.expDate >= date:
+							fresh[i] = amount(fresh[i] + product.quantity)
+		return counts
+
+	def inventorySummary(self, currentDate, days):
+		targetDate = currentDate + datetime.timedelta(days=days)
+		groups = {}
+		with self.lock:
+			for product in self.each(Product):
+				group = groups.setdefault((product.prodType, product.unit), {
+					"prodType": product.prodType, "unit": product.unit, "count": 0, "quantity": 0,
+					"earliest": product.expDate, "latest": product.expDate, "expired": 0, "expiring": 0
+				})
+				group["count"] += 1
+				group["quantity"] = amount(group["quantity"] + product.quantity)
+				group["earliest"] = min(group["earliest"], product.expDate)
+				group["latest"] = max(group["latest"], product.expDate)
+				if product.expDate < currentDate:
+					group["expired"] += 1
+				elif product.expDate < targetDate:
+					group["expiring"] += 1
+		return [groups[key] for key in sorted(groups)]
+
+	def find(self, docType, docId):
+		if len(docId) < 4:
+			return []
+		with self.lock:
+			return [doc for doc in self.each(docType) if str(doc.id).endswith(docId)]
+
+	def findMany(self, docType, docIds):
+		shortIds = set(docId[-4:] for docId in docIds if len(docId) >= 4)
+		with self.lock:
+			docs = [doc for doc in self.each(docType) if doc.shortId in shortIds]
+		return self.matchesOf(docs, docIds)
+
+	def add(self, doc):
+		self.claim(doc)
+		doc.validate()
+
+		# keep the document as Mongo would return it, e.g. with dates parsed
+		# and cut to the milliseconds BSON holds
+		son = BSON.decode(BSON.encode(doc.to_mongo()))
+		stored = type(doc)._from_son(son)
+		son.pop("shortId", None)
+		son.pop("household", None)
+		with self.lock:
+			docs = self.docs[type(doc)].setdefault(stored.household, {})
+			if isinstance(doc, Recipe) and any(recipe.name == doc.name for recipe in docs.values()):
+				raise NotUniqueError(duplicateMessage(doc, None))
+			docs[stored.id] = stored
+			self.raw[type(doc)].setdefault(stored.household, {})[stored.id] = son
+			self.bump(COLLECTIONS[type(doc)])
+
+	def insertMany(self, docType, docs):
+		inserted = 0
+		errors = []
+		for index, doc in enumerate(docs):
+			try:
+				self.add(doc)
+				inserted += 1
+			except NotUniqueError as e:
+				errors += [(index, str(e))]
+		return inserted, errors
+
+	def discard(self, doc):
+		self.docs[type(doc)].get(doc.household, {}).pop(doc.id, None)
+		self.raw[type(doc)].get(doc.household, {}).pop(doc.id, None)
+
+	def delete(self, doc):
+		with self.lock:
+			self.discard(doc)
+			self.bump(COLLECTIONS[type(doc)])
+
+	def discardAll(self, docType):
+		if self.household != None:
+			self.docs[docType].pop(self.household, None)
+			self.raw[docType].pop(self.household, None)
+		else:
+			self.docs[docType].clear()
+			self.raw[docType].clear()
+		self.bump(COLLECTIONS[docType])
+
+	def deleteAllProducts(self):
+		with self.lock:
+			self.discardAll(Product)
+
+	def deleteExpired(self, currentDate):
+		with self.lock:
+			expired = [product for product in self.each(Product) if product.expDate < currentDate]
+			for product in expired:
+				self.discard(product)
+			if expired:
+				self.bump("product")
+		return len(expired)
+
+	def deleteProducts(self, ids=None, prodType=None, before=None):
+		ids = set(ids) if ids is not None else None
+		with self.lock:
+			deleted = [product for product in self.each(Product) if
+				(ids is None or product.id in ids) and
+				(prodType == None or product.prodType == prodType) and
+				(before == None or product.expDate < before)]
+			for product in deleted:
+				self.discard(product)
+			if deleted:
+				self.bump("product")
+		return [product.id for product in deleted]
+
+	def deleteAllRecipes(self):
+		with self.lock:
+			self.discardAll(Recipe)
+
+	def consume(self, recipe):
+		missing = {}
+		used = []
+		left = {}
+		with self.lock:
+			# everything is taken at once, and only once all of it is found
+			takes = []		# stored as [(product, qty left or None when used up)]
+			for key in recipe.ingredients:
+				needed, unit = recipe.need(key)
+				products = sorted((product for product in self.each(Product) if product.prodType == key and product.unit == unit), key=lambda product: product.expDate)
+				for product in products:
+					if needed <= TOLERANCE:
+						break
+					if product.quantity <= needed + TOLERANCE:
+						takes += [(product, None)]
+						needed -= product.quantity
+					else:
+						takes += [(product, amount(product.quantity - needed))]
+						needed = 0
+				if needed > TOLERANCE:
+					missing[key] = amount(needed)
+			if missing:
+				return missing, used, left
+
+			for product, quantity in takes:
+				if quantity == None:
+					self.discard(product)
+					used += [product.id]
+				else:
+					product.quantity = quantity
+					self.raw[Product][product.household][product.id]["quantity"] = quantity
+					left[product.id] = quantity
+			if takes:
+				self.bump("product")
+		return missing, used, left
+
+	def schemaVersion(self):
+		return SCHEMA_VERSION
+
+	def setSchemaVersion(self, version):
+		pass
+
+	def backfillShortIds(self):
+		pass
+
+	def backfillQuantities(self):
+		pass
+
+	def backfillHouseholds(self):
+		pass
+
+def toSql(value):
+	''' converts a document value to the form stored in SQLite. dates are
+		cut to milliseconds as in BSON, and written with a fixed width so
+		they sort as text
+	'''
+
+	if isinstance(value, datetime.datetime):
+		return value.replace(microsecond=value.microsecond // 1000 * 1000).strftime("%Y-%m-%d %H:%M:%S.%f")
+	if isinstance(value, ObjectId):
+		return str(value)
+	return value
+
+def fromSqlDate(text):
+	''' reads a date written by toSql(). the width is fixed, so fields are
+		sliced out by position, several times faster than strptime
+	'''
+
+	return datetime.datetime(
+		int(text[0:4]), int(text[5:7]), int(text[8:10]),
+		int(text[11:13]), int(text[14:16]), int(text[17:19]), int(text[20:26])
+	)
+
+class SqliteStore(Store):
+	''' products and recipes stored in a local SQLite file, for running
+		without a Mongo server. each thread opens its own connection
+	'''
+
+	def __init__(self, path):
+		self.path = path
+		self.local = threading.local()
+		self.root = self	# the unscoped store, holding settings shared by scoped views
+		self.trace = None	# called with every statement run, see setTrace()
+		self.connection().executescript(SQLITE_SCHEMA)
+		self.upgrade()
+		self.connection().executescript(SQLITE_INDEXES)
+
+	def connection(self):
+		db = getattr(self.local, "db", None)
+		if db == None:
+			# transactions are opened explicitly by transaction()
+			db = sqlite3.connect(self.path, isolation_level=None)
+			db.execute("PRAGMA journal_mode=WAL")
+			db.execute("PRAGMA synchronous=NORMAL")
+			db.set_trace_callback(self.root.trace)
+			self.local.db = db
+		return db
+
+	def columns(self, db, table):
+		return [row[1] for row in db.execute("PRAGMA table_info(" + table + ")")]
+
+	def upgrade(self):
+		''' adds the columns in SQLITE_UPGRADES to a file created without
+			them, and rebuilds a recipe table from before households, whose
+			names were unique across all of them
+		'''
+
+		with self.transaction() as db:
+			for table, column, definition in SQLITE_UPGRADES:
+				if column not in self.columns(db, table):
+					db.execute("ALTER TABLE " + table + " ADD COLUMN " + column + " " + definition)
+			if "household" not in self.columns(db, "recipe"):
+				columns = ", ".join(self.columns(db, "recipe"))
+				db.execute("ALTER TABLE recipe RENAME TO recipe_unscoped")
+				db.execute(SQLITE_RECIPE_TABLE)
+				db.execute("INSERT INTO recipe (" + columns + ") SELECT " + columns + " FROM recipe_unscoped")
+				db.execute("DROP TABLE recipe_unscoped")
+
+	def setTrace(self, callback):
+		''' calls callback with the text of every statement run from now
+			on, for counting queries in benchmarks
+		'''
+
+		self.root.trace = callback
+		self.connection().set_trace_callback(callback)
+
+	def where(self, conditions=(), params=()):
+		''' returns the WHERE clause joining conditions and its params,
+			matching the household first when scoped so the indexes
+			leading with it are used
+		'''
+
+		conditions = list(conditions)
+		params = list(params)
+		if self.household != None:
+			conditions = ["household = ?"] + conditions
+			params = [self.household] + params
+		return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+	def transaction(self):
+		return Transaction(self.connection())
+
+	def query(self, sql, params=()):
+		return self.connection().execute(sql, params)
+
+	def productOf(self, row):
+		return Product._from_son(dict(self.rawProduct(row), shortId=row[4], household=row[7]))
+
+	def recipeOf(self, row):
+		return Recipe._from_son(dict(self.rawRecipe(row), shortId=row[4], household=row[6]))
+
+	def rawProduct(self, row):
+		product = {"_id": ObjectId(row[0]), "prodType": row[1], "expDate": fromSqlDate(row[2]), "quantity": row[5], "unit": row[6]}
+		if row[3] != None:
+			product["note"] = row[3]
+		return product
+
+	def rawRecipe(self, row):
+		return {"_id": ObjectId(row[0]), "name": row[1], "ingredients": json.loads(row[2]), "units": json.loads(row[5]), "instructions": row[3]}
+
+	def count(self, table):
+		where, params = self.where()
+		return self.query("SELECT COUNT(*) FROM " + table + where, params).fetchone()[0]
+
+	def version(self, collection):
+		if self.household != None:
+			sql, params = "SELECT SUM(count) FROM version WHERE household IN (?, ?) AND collection = ?", [self.household, ALL_HOUSEHOLDS, collection]
+		else:
+			sql, params = "SELECT SUM(count) FROM version WHERE collection = ?", [collection]
+		return self.query(sql, params).fetchone()[0] or 0
+
+	def bump(self, db, collection):
+		''' counts a write to collection inside its transaction
+		'''
+
+		key = self.versionKey(collection)
+		db.execute("INSERT OR IGNORE INTO version (household, collection) VALUES (?, ?)", key)
+		db.execute("UPDATE version SET count = count + 1 WHERE household = ? AND collection = ?", key)
+
+	def countProducts(self):
+		return self.count("product")
+
+	def countRecipes(self):
+		return self.count("recipe")
+
+	def products(self, after=None, limit=None, raw=False):
+		build = self.rawProduct if raw else self.productOf
+		return self.listing("product", PRODUCT_COLUMNS, build, PRODUCT_SORT, after, limit)
+
+	def recipes(self, after=None, limit=None, raw=False):
+		build = self.rawRecipe if raw else self.recipeOf
+		return self.listing("recipe", RECIPE_COLUMNS, build, RECIPE_SORT, after, limit)
+
+	def listing(self, table, columns, build, sortFields, after, limit):
+		''' yields documents sorted by sortFields, continuing after the given
+			sort key values with a row value comparison on the index
+		'''
+
+		conditions = []
+		params = []
+		if after != None:
+			conditions += ["(" + ", ".join(sortFields) + ") > (" + ", ".join("?" * len(sortFields)) + ")"]
+			params += [toSql(value) for value in after]
+		where, params = self.where(conditions, params)
+		sql = "SELECT " + columns + " FROM " + table + where + " ORDER BY " + ", ".join(sortFields)
+		if limit != None:
+			sql += " LIMIT ?"
+			params += [limit]
+		return (build(row) for row in self.query(sql, params))
+
+	def recipe(self, name):
+		where, params = self.where(["name = ?"], [name])
+		row = self.query("SELECT " + RECIPE_COLUMNS + " FROM recipe" + where, params).fetchone()
+		return self.recipeOf(row) if row != None else None
+
+	def recipesNamed(self, names):
+		names = list(names)
+		where, params = self.where(["name IN (" + ", ".join("?" * len(names)) + ")"], names)
+		rows = self.query("SELECT " + RECIPE_COLUMNS + " FROM recipe" + where, params)
+		return {row[1]: self.recipeOf(row) for row in rows}
+
+	def expired(self, currentDate, fields=None, since=None, raw=False):
+		if since == None:
+			where, params = self.where(["expDate < ?"], [toSql(currentDate)])
+		else:
+			where, params = self.where(["expDate >= ?", "expDate < ?"], [toSql(since), toSql(currentDate)])
+		rows = self.query("SELECT " + PRODUCT_COLUMNS + " FROM product" + where + " ORDER BY expDate", params)
+		build = self.rawProduct if raw else self.productOf
+		return [build(row) for row in rows]
+
+	def nextExpiry(self, after):
+		where, params = self.where(["expDate >= ?"], [toSql(after)])
+		expDate = self.query("SELECT MIN(expDate) FROM product" + where, params).fetchone()[0]
+		return fromSqlDate(expDate) if expDate != None else None
+
+	def expiring(self, currentDate, days, fields=None, raw=False):
+		targetDate = currentDate + datetime.timedelta(days=days)
+		where, params = self.where(["expDate >= ?", "expDate < ?"], [toSql(currentDate), toSql(targetDate)])
+		rows = self.query("SELECT " + PRODUCT_COLUMNS + " FROM product" + where + " ORDER BY expDate", params)
+		build = self.rawProduct if raw else self.productOf
+		return [build(row) for row in rows]
+
+	def stockCounts(self, prodTypes=None):
+		conditions = []
+		params = []
+		if prodTypes is not None:
+			params = list(prodTypes)
+			conditions = ["prodType IN (" + ", ".join("?" * len(params)) + ")"]
+		where, params = self.where(conditions, params)
+		rows = self.query("SELECT prodType, unit, SUM(quantity) FROM product" + where + " GROUP BY prodType, unit", params)
+		return byUnit((row[0], row[1], amount(row[2])) for row in rows)
+
+	def expiringCounts(self, currentDate, days):
+		targetDate = currentDate + datetime.timedelta(days=days)
+		where, params = self.where(["expDate >= ?", "expDate < ?"], [toSql(currentDate), toSql(targetDate)])
+		rows = self.query("SELECT prodType, unit, SUM(quantity) FROM product" + where + " GROUP BY prodType, unit", params)
+		return byUnit((row[0], row[1], amount(row[2])) for row in rows)
+
+	def freshCounts(self, prodTypes, dates):
+		prodTypes = list(prodTypes)
+		where, params = self.where(["prodType IN (" + ", ".join("?" * len(prodTypes)) + ")", "expDate >= ?"], prodTypes + [toSql(dates[0])])
+		rows = self.query(
+			"SELECT prodType, unit, " + ", ".join(["SUM((expDate >= ?) * quantity)"] * len(dates)) + " FROM product" + where + " GROUP BY prodType, unit",
+			[toSql(date) for date in dates] + params
+		)
+		return byUnit((row[0], row[1], [amount(qty) for qty in row[2:]]) for row in rows)
+
+	def inventorySummary(self, currentDate, days):
+		targetDate = currentDate + datetime.timedelta(days=days)
+		where, params = self.where()
+		rows = self.query(
+			"SELECT prodType, unit, COUNT(*), SUM(quantity), MIN(expDate), MAX(expDate), SUM(expDate < ?), SUM(expDate >= ? AND expDate < ?) "
+			"FROM product" + where + " GROUP BY prodType, unit ORDER BY prodType, unit",
+			[toSql(currentDate), toSql(currentDate), toSql(targetDate)] + params
+		)
+		return [{
+			"prodType": row[0], "unit": row[1], "count": row[2], "quantity": amount(row[3]),
+			"earliest": fromSqlDate(row[4]), "latest": fromSqlDate(row[5]), "expired": row[6], "expiring": row[7]
+		} for row in rows]
+
+	def find(self, docType, docId):
+		if len(docId) < 4:
+			return []
+		where, params = self.where(["shortId = ?"], [docId[-4:]])
+		if docType == Product:
+			docs = [self.productOf(row) for row in self.query("SELECT " + PRODUCT_COLUMNS + " FROM product" + where, params)]
+		else:
+			docs = [self.recipeOf(row) for row in self.query("SELECT " + RECIPE_COLUMNS + " FROM recipe" + where, params)]
+		return [doc for doc in docs if str(doc.id).endswith(docId)]
+
+	def findMany(self, docType, docIds):
+		shortIds = list(set(docId[-4:] for docId in docIds if len(docId) >= 4))
+		if docType == Product:
+			sql, build = "SELECT " + PRODUCT_COLUMNS + " FROM product", self.productOf
+		else:
+			sql, build = "SELECT " + RECIPE_COLUMNS + " FROM recipe", self.recipeOf
+		where, params = self.where(["shortId IN (" + ", ".join("?" * len(shortIds)) + ")"], shortIds)
+		rows = self.query(sql + where, params)
+		return self.matchesOf([build(row) for row in rows], docIds)
+
+	def insert(self, db, doc):
+		''' writes one document, raising NotUniqueError if its id or
+			recipe name in its household is taken
+		'''
+
+		self.claim(doc)
+		son = doc.to_mongo()
+		shortId = son.get("shortId") or str(son["_id"])[-4:]
+		try:
+			if isinstance(doc, Product):
+				db.execute("INSERT INTO product (" + PRODUCT_COLUMNS + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+					(str(son["_id"]), son["prodType"], toSql(son["expDate"]), son.get("note"), shortId, son["quantity"], son["unit"], son["household"]))
+			else:
+				db.execute("INSERT INTO recipe (" + RECIPE_COLUMNS + ") VALUES (?, ?, ?, ?, ?, ?, ?)",
+					(str(son["_id"]), son["name"], json.dumps(son["ingredients"]), son["instructions"], shortId, json.dumps(son.get("units", {})), son["household"]))
+		except sqlite3.IntegrityError as e:
+			raise NotUniqueError(duplicateMessage(doc, str(e)) if "recipe.name" in str(e) else str(e))
+
+	def add(self, doc):
+		self.claim(doc)
+		doc.validate()
+		with self.transaction() as db:
+			self.insert(db, doc)
+			self.bump(db, COLLECTIONS[type(doc)])
+
+	def insertMany(self, docType, docs):
+		''' inserts documents in a single transaction. returns the number
+			inserted and [(index, message)] for every document rejected
+		'''
+
+		inserted = 0
+		errors = []
+		with self.transaction() as db:
+			for index, doc in enumerate(docs):
+				try:
+					self.insert(db, doc)
+					inserted += 1
+				except NotUniqueError as e:
+					errors += [(index, str(e))]
+			if inserted > 0:
+				self.bump(db, COLLECTIONS[docType])
+		return inserted, errors
+
+	def delete(self, doc):
+		table = COLLECTIONS[type(doc)]
+		with self.transaction() as db:
+			db.execute("DELETE FROM " + table + " WHERE id = ?", (str(doc.id),))
+			self.bump(db, table)
+
+	def deleteAllProducts(self):
+		where, params = self.where()
+		with self.transaction() as db:
+			db.execute("DELETE FROM product" + where, params)
+			self.bump(db, "product")
+
+	def deleteExpired(self, currentDate):
+		where, params = self.where(["expDate < ?"], [toSql(currentDate)])
+		with self.transaction() as db:
+			deleted = db.execute("DELETE FROM product" + where, params).rowcount
+			if deleted > 0:
+				self.bump(db, "product")
+		return deleted
+
+	def deleteProducts(self, ids=None, prodType=None, before=None):
+		''' deletes the matching products inside one transaction, reading
+			their ids first so they can be reported
+		'''
+
+		conditions = []
+		params = []
+		if ids is not None:
+			ids = [str(docId) for docId in ids]
+			conditions += ["id IN (" + ", ".join("?" * len(ids)) + ")"]
+			params += ids
+		if prodType != None:
+			conditions += ["prodType = ?"]
+			params += [prodType]
+		if before != None:
+			conditions += ["expDate < ?"]
+			params += [toSql(before)]
+		where, params = self.where(conditions, params)
+
+		with self.transaction() as db:
+			deleted = [row[0] for row in db.execute("SELECT id FROM product" + where, params)]
+			db.execute("DELETE FROM product" + where, params)
+			if deleted:
+				self.bump(db, "product")
+		return [ObjectId(docId) for docId in deleted]
+
+	def deleteAllRecipes(self):
+		where, params = self.where()
+		with self.transaction() as db:
+			db.execute("DELETE FROM recipe" + where, params)
+			self.bump(db, "recipe")
+
+	def consume(self, recipe):
+		''' takes the quantities used by recipe from the earliest-expiring
+			products inside a transaction holding the write lock, so
+			concurrent consumers can't take the same stock. products used
+			up are deleted and the last one used has the rest taken off.
+			the transaction is rolled back when anything is missing
+		'''
+
+		missing = {}
+		used = []
+		left = {}
+		try:
+			with self.transaction() as db:
+				self.take(db, recipe, missing, used, left)
+		except Shortfall:
+			return missing, [], {}
+		return missing, used, left
+
+	def take(self, db, recipe, missing, used, left):
+		''' consume() inside its transaction, raising Shortfall if any
+			ingredient runs out
+		'''
+
+		for key in recipe.ingredients:
+			needed, unit = recipe.need(key)
+			where, params = self.where(["prodType = ?", "unit = ?"], [key, unit])
+			rows = db.execute("SELECT id, quantity FROM product" + where + " ORDER BY expDate", params)
+			usedUp = []
+			for docId, quantity in rows:
+				if needed <= TOLERANCE:
+					break
+				if quantity <= needed + TOLERANCE:
+					usedUp += [docId]
+					needed -= quantity
+				else:
+					left[ObjectId(docId)] = amount(quantity - needed)
+					db.execute("UPDATE product SET quantity = ? WHERE id = ?", (left[ObjectId(docId)], docId))
+					needed = 0
+			rows.close()
+			db.executemany("DELETE FROM product WHERE id = ?", [(docId,) for docId in usedUp])
+			used += [ObjectId(docId) for docId in usedUp]
+			if needed > TOLERANCE:
+				missing[key] = amount(needed)
+		if missing:
+			raise Shortfall(missing)
+		if used or left:
+			self.bump(db, "product")
+
+	def schemaVersion(self):
+		return self.query("PRAGMA user_version").fetchone()[0]
+
+	def setSchemaVersion(self, version):
+		self.query("PRAGMA user_version = " + str(int(version)))
+
+	def backfillShortIds(self):
+		with self.transaction() as db:
+			db.execute("UPDATE product SET shortId = substr(id, -4) WHERE shortId IS NULL")
+			db.execute("UPDATE recipe SET shortId = substr(id, -4) WHERE shortId IS NULL")
+
+	def backfillQuantities(self):
+		pass
+
+	def backfillHouseholds(self):
+		pass
+
+class Transaction(object):
+	''' takes the SQLite write lock for the statements in a with block,
+		committing them together or rolling all of them back on an error
+	'''
+
+	def __init__(self, db):
+		self.db = db
+
+	def __enter__(self):
+		self.db.execute("BEGIN IMMEDIATE")
+		return self.db
+
+	def __exit__(self, excType, excValue, traceback):
+		self.db.execute("COMMIT" if excType == None else "ROLLBACK")
@@ -0,0 +1,105 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import heapq
+from units import COUNT, TOLERANCE, amount
+
+def portions(qty, needed, unit):
+	''' returns how many products' worth qty of an ingredient is, for
+		ranking recipes across units: counted ingredients by number, and
+		measured ones as the share of the needed quantity, so all of the
+		flour a recipe needs weighs as much as one egg
+	'''
+
+	return qty if unit == COUNT else qty / needed
+
+class RecipeIndex(object):
+	''' inverted index from prodType to the recipes using it, so the
+		recipes that use a set of products are found without reading
+		the whole cookbook
+	'''
+
+	def __init__(self, recipes):
+		self.byType = {}		# stored as {prodType:[(recipe, qty, unit)]}
+		self.ingredients = {}	# stored as {name:{prodType:(qty, unit)}}
+		for recipe in recipes:
+			# copied once, as reading a DictField dereferences it every time
+			ingredients = {key: recipe.need(key) for key in recipe.ingredients}
+			self.ingredients[recipe.name] = ingredients
+			for key in ingredients:
+				self.byType.setdefault(key, []).append((recipe,) + ingredients[key])
+
+	def shortfall(self, recipe, stock):
+		''' returns {prodType:qty} of recipe's ingredients missing from
+			stock, as Recipe.shortfall() does
+		'''
+
+		missing = {}
+		ingredients = self.ingredients[recipe.name]
+		for key in ingredients:
+			qty, unit = ingredients[key]
+			have = stock.get(key, {}).get(unit, 0)
+			if have < qty - TOLERANCE:
+				missing[key] = amount(qty - have)
+		return missing
+
+	def missingPortions(self, recipe, missing):
+		''' returns how many products' worth of a shortfall() is missing
+		'''
+
+		ingredients = self.ingredients[recipe.name]
+		return sum(portions(missing[key], *ingredients[key]) for key in missing)
+
+	def using(self, counts):
+		''' returns {name:(recipe, units)} for every recipe using any of
+			the {prodType:{unit:qty}} products, where units is how many
+			products' worth of them one batch of the recipe would use up
+		'''
+
+		used = {}
+		for prodType in counts:
+			for recipe, qty, unit in self.byType.get(prodType, ()):
+				have = counts[prodType].get(unit, 0)
+				if have <= 0:
+					continue
+				units = used[recipe.name][1] if recipe.name in used else 0
+				used[recipe.name] = (recipe, amount(units + portions(min(qty, have), qty, unit)))
+		return used
+
+def recommend(store, index, currentDate, days, limit=None):
+	''' returns [(recipe, expiring units used, shortfall)] for recipes
+		that use products expiring within days of currentDate, ranked by
+		expiring units used and then by fewest units missing. stock is
+		counted only for the prodTypes those recipes need
+	'''
+
+	used = index.using(store.expiringCounts(currentDate, days))
+	if len(used) == 0:
+		return []
+
+	prodTypes = set()
+	for recipe, units in used.values():
+		prodTypes.update(index.ingredients[recipe.name])
+	stock = store.stockCounts(prodTypes)
+
+	ranked = [(recipe, units, index.shortfall(recipe, stock)) for recipe, units in used.values()]
+	def rank(item):
+		return (-item[1], index.missingPortions(item[0], item[2]), item[0].name)
+	if limit != None:
+		return heapq.nsmallest(limit, ranked, key=rank)
+	return sorted(ranked, key=rank)
@@ -0,0 +1,88 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import sys
+import shutil
+import subprocess
+
+# pager used when $PAGER isn't set; -R keeps colors, -F quits at once
+# when the text fits on one screen and -X leaves it on screen afterwards
+DEFAULT_PAGER = "less -RFX"
+
+class Buffer(object):
+	''' collects the lines of a display so it can be written in one go
+		instead of one print() per line, cutting each to width characters
+		when a width is given. colors wrap a line without counting toward
+		its width
+	'''
+
+	def __init__(self, width=None):
+		self.width = width
+		self.lines = []
+
+	def add(self, line, color=None, reset=None):
+		if self.width != None:
+			line = line[:self.width]
+		if color != None:
+			line = color + line + reset
+		self.lines.append(line)
+
+	def text(self):
+		return "\n".join(self.lines) + "\n" if self.lines else ""
+
+	def show(self, paging=True):
+		''' writes the lines to stdout, through the pager when paging and
+			they don't fit in the terminal
+		'''
+
+		text = self.text()
+		if paging and self.overflows(text):
+			pager = pagerCommand()
+			if pager != None:
+				page(pager, text)
+				return
+		sys.stdout.write(text)
+		sys.stdout.flush()
+
+	def overflows(self, text):
+		if not sys.stdout.isatty():
+			return False
+		return text.count("\n") >= shutil.get_terminal_size().lines
+
+def pagerCommand():
+	''' returns $PAGER, else less when it is installed, else None
+	'''
+
+	pager = os.environ.get("PAGER")
+	if pager:
+		return pager
+	if shutil.which("less") != None:
+		return DEFAULT_PAGER
+	return None
+
+def page(pager, text):
+	''' shows text through the pager, waiting for the user to quit it
+	'''
+
+	encoding = sys.stdout.encoding or "utf-8"
+	process = subprocess.Popen(pager, shell=True, stdin=subprocess.PIPE)
+	try:
+		process.communicate(text.encode(encoding, "replace"))
+	except KeyboardInterrupt:
+		process.wait()
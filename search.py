@@ -0,0 +1,323 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import re
+import bisect
+import heapq
+import itertools
+import collections
+import threading
+from models import Recipe
+
+# fields searched in each collection, with how much a match in each
+# counts; the first names the document in suggestions
+FIELDS = {
+	"product": {"prodType": 2.0, "note": 1.0},
+	"recipe": {"name": 2.0, "instructions": 1.0}
+}
+
+# score of a word matching a query term exactly, as the start of the word,
+# or within the edit distance allowed for a term of its length
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.8
+FUZZY_SCORES = {1: 0.6, 2: 0.4}
+
+# words a prefix term is expanded to, so a term of one letter doesn't
+# read every posting in the index
+PREFIX_LIMIT = 50
+
+# shortest term matched with typos, and the longest with at most one
+FUZZY_MIN_LENGTH = 3
+ONE_EDIT_LENGTH = 5
+
+# words sharing the most trigrams with a term that are checked for typos
+FUZZY_CANDIDATES = 100
+
+# results returned when no limit is given
+SEARCH_LIMIT = 20
+
+# the words of a field, as they are indexed and searched
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+def words(text):
+	return WORD_PATTERN.findall(str(text).lower()) if text != None else []
+
+def trigrams(word):
+	padded = "$" + word + "$"
+	return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def editDistance(a, b, limit):
+	''' returns the number of insertions, deletions, substitutions and
+		swaps of neighbouring letters turning a into b, or limit + 1 once
+		it is known to be more than limit
+	'''
+
+	if abs(len(a) - len(b)) > limit:
+		return limit + 1
+	previous = None
+	row = list(range(len(b) + 1))
+	for i in range(1, len(a) + 1):
+		current = [i] + [0] * len(b)
+		for j in range(1, len(b) + 1):
+			cost = 0 if a[i - 1] == b[j - 1] else 1
+			current[j] = min(row[j] + 1, current[j - 1] + 1, row[j - 1] + cost)
+			if previous != None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+				current[j] = min(current[j], previous[j - 2] + 1)
+		if min(current) > limit:
+			return limit + 1
+		previous, row = row, current
+	return row[-1]
+
+def fieldsOf(doc):
+	''' returns (collection, id, {field:text}) of a product or recipe,
+		given as a document or as the dict it is stored as
+	'''
+
+	if isinstance(doc, dict):
+		collection = "recipe" if "ingredients" in doc else "product"
+		return collection, str(doc["_id"]), {field: doc.get(field) for field in FIELDS[collection]}
+	collection = "recipe" if isinstance(doc, Recipe) else "product"
+	return collection, str(doc.id), {field: getattr(doc, field, None) for field in FIELDS[collection]}
+
+class SearchIndex(object):
+	''' inverted index of the words in the searched fields of a
+		household's products and recipes. words are kept sorted, so the
+		words starting with a term are a bisect away, and by trigram, so
+		the words a typo could have been meant as are found without
+		comparing the term to every word. documents are added and removed
+		one at a time as they change, once fill() has read the store
+	'''
+
+	def __init__(self):
+		self.lock = threading.RLock()
+		self.filled = False
+		self.clear()
+
+	def clear(self):
+		self.postings = {}		# stored as {word:{(collection, weight):set of ids}}
+		self.docs = {}			# stored as {id:(collection, {word:weight})}
+		self.labels = {}		# stored as {id:prodType or name}
+		self.words = []			# every word in postings, sorted
+		self.grams = {}			# stored as {trigram:set of words}
+
+	def fill(self, store, collections=("product", "recipe")):
+		''' indexes every product and recipe in store, unless already
+			filled. the lock is held throughout, so changes made while the
+			store is read are applied after it
+		'''
+
+		with self.lock:
+			if self.filled:
+				return
+			if "product" in collections:
+				for doc in store.products(raw=True):
+					self.add(doc)
+			if "recipe" in collections:
+				for doc in store.recipes(raw=True):
+					self.add(doc)
+			self.filled = True
+
+	def reset(self):
+		''' empties the index, to be filled again on next use
+		'''
+
+		with self.lock:
+			self.clear()
+			self.filled = False
+
+	def add(self, doc):
+		''' indexes a product or recipe, replacing what was indexed for it
+		'''
+
+		collection, docId, fields = fieldsOf(doc)
+		weights = {}
+		for field, text in fields.items():
+			for word in words(text):
+				weights[word] = max(weights.get(word, 0), FIELDS[collection][field])
+		with self.lock:
+			self.remove(docId)
+			for word, weight in weights.items():
+				if word not in self.postings:
+					self.postings[word] = {}
+					bisect.insort(self.words, word)
+					for gram in trigrams(word):
+						self.grams.setdefault(gram, set()).add(word)
+				self.postings[word].setdefault((collection, weight), set()).add(docId)
+			self.docs[docId] = (collection, weights)
+			self.labels[docId] = fields[next(iter(FIELDS[collection]))]
+
+	def remove(self, docId):
+		with self.lock:
+			if docId not in self.docs:
+				return
+			collection, weights = self.docs.pop(docId)
+			del self.labels[docId]
+			for word, weight in weights.items():
+				postings = self.postings[word]
+				postings[(collection, weight)].discard(docId)
+				if len(postings[(collection, weight)]) == 0:
+					del postings[(collection, weight)]
+				if len(postings) == 0:
+					del self.postings[word]
+					del self.words[bisect.bisect_left(self.words, word)]
+					for gram in trigrams(word):
+						self.grams[gram].discard(word)
+						if len(self.grams[gram]) == 0:
+							del self.grams[gram]
+
+	def holds(self, docId):
+		with self.lock:
+			return docId in self.docs
+
+	def apply(self, event, collection, data):
+		''' applies an /events change to the index. adds and deletes are
+			applied only once filled, as fill() reads them from the store,
+			and a reset empties it
+		'''
+
+		with self.lock:
+			if event == "reset":
+				self.reset()
+			elif not self.filled:
+				return
+			elif event == "add":
+				for doc in data["docs"]:
+					self.add(doc)
+			elif event in ("delete", "consume"):
+				for docId in data["ids"]:
+					self.remove(docId)
+
+	def expand(self, term):
+		''' returns {word:score} of the indexed words that are term or
+			start with it
+		'''
+
+		matches = {}
+		if term in self.postings:
+			matches[term] = EXACT_SCORE
+		start = bisect.bisect_left(self.words, term)
+		for word in self.words[start:start + PREFIX_LIMIT]:
+			if not word.startswith(term):
+				break
+			matches.setdefault(word, PREFIX_SCORE)
+		return matches
+
+	def typos(self, term):
+		''' returns {word:score} of the indexed words within the edit
+			distance allowed for term, or whose start is
+		'''
+
+		if len(term) < FUZZY_MIN_LENGTH:
+			return {}
+		shared = {}
+		for gram in trigrams(term):
+			for word in self.grams.get(gram, ()):
+				shared[word] = shared.get(word, 0) + 1
+		limit = 1 if len(term) <= ONE_EDIT_LENGTH else 2
+
+		matches = {}
+		for word in heapq.nlargest(FUZZY_CANDIDATES, shared, key=shared.get):
+			distance = editDistance(term, word, limit)
+
+			# a typo in the part of a longer word typed so far still counts
+			if distance > limit and len(word) > len(term):
+				distance = editDistance(term, word[:len(term)], limit)
+			if 0 < distance <= limit:
+				matches[word] = FUZZY_SCORES[distance]
+		return matches
+
+	def tiers(self, term, limit, collection=None):
+		''' returns [(score, set of ids)] of the documents matching term,
+			best first, with each document only under the best score any of
+			its words gets. typos are only looked for when fewer than limit
+			documents have a word starting with term. kept as sets so that a
+			term matching most of the index is scored without a loop per
+			document
+		'''
+
+		def group(matches, byScore):
+			for word, score in matches.items():
+				for (docCollection, weight), docIds in self.postings[word].items():
+					if collection == None or docCollection == collection:
+						byScore.setdefault(score * weight, set()).update(docIds)
+			return byScore
+
+		byScore = group(self.expand(term), {})
+		if sum(len(docIds) for docIds in byScore.values()) < limit:
+			byScore = group(self.typos(term), byScore)
+
+		tiers = []
+		seen = set()
+		for score in sorted(byScore, reverse=True):
+			docIds = byScore[score] - seen
+			seen |= docIds
+			tiers += [(score, docIds)]
+		return tiers
+
+	def search(self, query, limit=SEARCH_LIMIT, collection=None):
+		''' returns [(collection, id, score)] of the documents best
+			matching the words of query, those matching the most of them
+			first and then by score, and only products or recipes if
+			collection is given. each word may be the start of an indexed
+			word or a typo of one
+		'''
+
+		terms = list(dict.fromkeys(words(query)))
+		with self.lock:
+			termTiers = [self.tiers(term, limit, collection) for term in terms]
+			if len(termTiers) == 0:
+				return []
+
+			# a single word ranks tier by tier, so only the top tiers are sorted
+			if len(termTiers) == 1:
+				ranked = []
+				for score, docIds in termTiers[0]:
+					if len(ranked) >= limit:
+						break
+					ranked += [(docId, score) for docId in heapq.nsmallest(limit - len(ranked), docIds)]
+				return [(self.docs[docId][0], docId, round(score, 3)) for docId, score in ranked]
+
+			scores = []
+			for tiers in termTiers:
+				best = {}
+				for score, docIds in tiers:
+					best.update(dict.fromkeys(docIds, score))
+				scores += [best]
+
+			# only documents matching as many words as the limit-th best
+			# one are ranked, found by counting rather than scoring them all
+			matched = collections.Counter(itertools.chain.from_iterable(scores))
+			levels = collections.Counter(matched.values())
+			least = len(scores)
+			found = levels[least]
+			while found < limit and least > 1:
+				least -= 1
+				found += levels[least]
+			candidates = [docId for docId, count in matched.items() if count >= least]
+
+			def rank(docId):
+				return (-matched[docId], -sum(best.get(docId, 0) for best in scores), docId)
+			return [(self.docs[docId][0], docId, round(-rank(docId)[1], 3)) for docId in heapq.nsmallest(limit, candidates, key=rank)]
+
+	def names(self, query, limit=SEARCH_LIMIT):
+		''' returns the names of the recipes best matching query, for
+			suggesting what a misspelt recipe name was meant to be
+		'''
+
+		with self.lock:
+			return [self.labels[docId] for collection, docId, score in self.search(query, limit, "recipe")]
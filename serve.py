@@ -0,0 +1,68 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import json
+import multiprocessing
+from gunicorn.app.base import BaseApplication
+
+# used for any setting missing from the "server" section of config.json
+DEFAULT_SERVER = {
+	"bind": "127.0.0.1:5000",
+	"workers": multiprocessing.cpu_count() * 2 + 1,
+	"threads": 4,
+	"timeout": 30
+}
+
+class Server(BaseApplication):
+	''' runs api.py under gunicorn with several worker processes
+	'''
+
+	def __init__(self, options):
+		self.options = options
+		super(Server, self).__init__()
+
+	def load_config(self):
+		for key in self.options:
+			self.cfg.set(key, self.options[key])
+
+	def load(self):
+		# the app is imported by each worker after it forks, so every
+		# worker creates its own Mongo client and connection pool
+		from api import app
+		return app
+
+def main():
+
+	# load server settings from JSON
+	with open(os.environ.get("GROCERYHELPER_CONFIG", "config.json")) as json_file:
+		config = json.load(json_file)
+	options = dict(DEFAULT_SERVER)
+	options.update(config.get("server", {}))
+
+	# threaded workers let one process serve requests while others wait on Mongo
+	if options["threads"] > 1:
+		options.setdefault("worker_class", "gthread")
+	options["preload_app"] = False
+
+	print("GroceryHelper Copyright (C) 2019 Nathan Weinberg\nThis program comes with ABSOLUTELY NO WARRANTY; for details type `show w'.\nThis is free software, and you are welcome to redistribute it\nunder certain conditions; type `show c' for details.\n")
+
+	Server(options).run()
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,95 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import datetime
+from models import DATE_FORMAT
+from units import TOLERANCE, amount
+
+def parsePlan(rows):
+	''' returns [(name, batches, date)] for a meal plan given as a list
+		of recipe names or {"rcpName", "batches", "date"} objects, where
+		date is written as YYYY-MM-DD or left out to cook straight away.
+		raises ValueError for a malformed plan
+	'''
+
+	if not isinstance(rows, list):
+		raise ValueError("A meal plan must be a list of recipes.")
+
+	plan = []
+	for row in rows:
+		if isinstance(row, str):
+			row = {"rcpName": row}
+		if not isinstance(row, dict) or not isinstance(row.get("rcpName"), str):
+			raise ValueError("Every meal in a plan needs a rcpName.")
+		try:
+			batches = int(row.get("batches", 1))
+			date = row.get("date")
+			if date != None:
+				date = datetime.datetime.strptime(date, DATE_FORMAT)
+		except TypeError:
+			raise ValueError("Could not read meal " + row["rcpName"] + ".")
+		if batches < 1:
+			raise ValueError("Meal " + row["rcpName"] + " must be made at least once.")
+		plan += [(row["rcpName"].lower(), batches, date)]
+	return plan
+
+def shoppingList(store, plan, currentDate):
+	''' returns ({prodType:{unit:qty}} to buy, [unknown recipe names])
+		to cook every meal of a plan from parsePlan(). a product only
+		covers meals cooked on or before its expDate, and stock is counted
+		with one query for every prodType and cook date in the plan
+	'''
+
+	recipes = store.recipesNamed(set(name for name, batches, date in plan))
+	unknown = sorted(set(name for name, batches, date in plan if name not in recipes))
+
+	# stored as {prodType:{unit:{date:qty}}}, with undated and past meals cooked now
+	needed = {}
+	for name, batches, date in plan:
+		if name not in recipes:
+			continue
+		date = currentDate if date == None or date < currentDate else date
+		recipe = recipes[name]
+		for key in recipe.ingredients:
+			qty, unit = recipe.need(key)
+			byDate = needed.setdefault(key, {}).setdefault(unit, {})
+			byDate[date] = byDate.get(date, 0) + qty * batches
+	if len(needed) == 0:
+		return {}, unknown
+
+	dates = sorted(set(date for byUnit in needed.values() for byDate in byUnit.values() for date in byDate))
+	fresh = store.freshCounts(needed, dates)
+
+	deficit = {}
+	for prodType in needed:
+		for unit in needed[prodType]:
+			counts = fresh.get(prodType, {}).get(unit, [0] * len(dates)) + [0]
+
+			# the latest meals are served first, as anything lasting until
+			# then also lasts until every earlier meal
+			spare = 0
+			missing = 0
+			for i in reversed(range(len(dates))):
+				spare += counts[i] - counts[i + 1]
+				wanted = needed[prodType][unit].get(dates[i], 0)
+				used = min(spare, wanted)
+				spare -= used
+				missing += wanted - used
+			if missing > TOLERANCE:
+				deficit.setdefault(prodType, {})[unit] = amount(missing)
+	return deficit, unknown
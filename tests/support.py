@@ -0,0 +1,96 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import sys
+import json
+import shutil
+import datetime
+import tempfile
+import mongoengine
+import pantry
+from models import Product, Recipe
+
+def loadApi():
+	''' imports api.py pointed at a fresh memory store, whatever config
+		the environment names, so tests never touch a real pantry. the
+		API reads its config when imported, after which the file is removed
+	'''
+
+	if "api" in sys.modules:
+		return sys.modules["api"]
+	configFile = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+	try:
+		json.dump({"storage": "memory"}, configFile)
+		configFile.close()
+		os.environ["GROCERYHELPER_CONFIG"] = configFile.name
+		import api
+	finally:
+		os.remove(configFile.name)
+	return api
+
+# the day test products' expiration dates count from
+TODAY = datetime.datetime(2030, 1, 1)
+
+def product(prodType, days=10, quantity=1, unit="each"):
+	return Product(prodType=prodType, expDate=TODAY + datetime.timedelta(days=days), quantity=quantity, unit=unit)
+
+def recipe(name, units=None, **ingredients):
+	''' returns a recipe of ingredients given as counts, or in the base
+		units given by {prodType:unit}
+	'''
+
+	units = units or {}
+	return Recipe(name=name, ingredients=ingredients, units={prodType: units.get(prodType, "each") for prodType in ingredients}, instructions="cook")
+
+class MemoryBackend(object):
+	''' makeStore() for a test case mixin run against every store. reopen()
+		returns another store over the same database, as another process
+		would open it
+	'''
+
+	def makeStore(self):
+		return pantry.MemoryStore()
+
+	def reopen(self):
+		return self.store
+
+class SqliteBackend(object):
+	def makeStore(self):
+		self.directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.directory)
+		return self.reopen()
+
+	def reopen(self):
+		return pantry.SqliteStore(os.path.join(self.directory, "pantry.db"))
+
+class MongoBackend(object):
+	''' a MongoStore on mongomock, emptied first as its database lasts
+		for the whole run
+	'''
+
+	def makeStore(self):
+		mongoengine.connect("groceryhelper-test", host="mongomock://localhost")
+		store = pantry.MongoStore()
+		store.deleteAllProducts()
+		store.deleteAllRecipes()
+		store.versions().delete_many({})
+		return store
+
+	def reopen(self):
+		return pantry.MongoStore()
@@ -0,0 +1,106 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import io
+import unittest
+from unittest import mock
+import bulk
+from tests.support import MemoryBackend, MongoBackend, SqliteBackend
+
+PRODUCTS = '''{"prodType": "Egg", "expDate": "2030-01-05", "quantity": 3}
+{"prodType": "milk"}
+{oops
+
+{"prodType": "milk", "expDate": "2030-01-05", "quantity": "-1"}
+{"prodType": "milk", "expDate": "soon"}
+{"prodType": "flour", "expDate": "2030-01-05", "quantity": "500", "unit": "furlong"}
+{"prodType": "flour", "expDate": "2030-01-05", "quantity": "500 g"}
+'''
+
+RECIPES = '''name,ingredients,units,instructions
+Bread,flour:500 g;egg:1,,bake
+cake,flour:x,,bake
+bread,egg:2,,again
+toast,bread:2,,grill
+Toast,bread:1,,grill again
+'''
+
+class BulkTests(object):
+	''' a bad row fails on its own, reported with its row number, while
+		the rest are inserted. subclasses mix in a backend from
+		tests.support
+	'''
+
+	# batch sizes the recipe import is run with, one batch and several
+	batchSizes = (1000, 2)
+
+	def setUp(self):
+		self.store = self.makeStore()
+
+	def messages(self, errors):
+		return dict((error["row"], error["message"]) for error in errors)
+
+	def test_product_rows(self):
+		inserted, errors = bulk.importProducts(self.store, bulk.iterRows(io.StringIO(PRODUCTS), "ndjson"))
+		self.assertEqual(inserted, 2)
+		messages = self.messages(errors)
+		self.assertEqual(sorted(messages), [2, 3, 4, 5, 6])
+		self.assertEqual(messages[2], "Missing field 'expDate'")
+		self.assertIn("double quotes", messages[3])
+		self.assertIn("Could not read quantity '-1'", messages[4])
+		self.assertIn("cannot parse date", messages[5])
+		self.assertIn("Unknown unit: furlong", messages[6])
+		stock = sorted((doc.prodType, doc.quantity, doc.unit) for doc in self.store.products())
+		self.assertEqual(stock, [("egg", 3, "each"), ("flour", 500, "g")])
+
+	def test_recipe_rows(self):
+		# duplicate names are caught by the store, after validation, and
+		# still reported against their own rows whatever the batch size
+		for size in self.batchSizes:
+			with mock.patch.object(bulk, "BATCH_SIZE", size):
+				self.store.deleteAllRecipes()
+				inserted, errors = bulk.importRecipes(self.store, bulk.iterRows(io.StringIO(RECIPES), "csv"))
+			self.assertEqual(inserted, 2)
+			messages = self.messages(errors)
+			self.assertEqual(sorted(messages), [2, 3, 5])
+			self.assertIn("Could not read quantity 'x'", messages[2])
+			self.assertEqual(messages[3], "Recipe bread already exists.")
+			self.assertEqual(messages[5], "Recipe toast already exists.")
+			recipes = dict((doc.name, (doc.ingredients, doc.units)) for doc in self.store.recipes())
+			self.assertEqual(recipes["bread"], ({"flour": 500, "egg": 1}, {"flour": "g", "egg": "each"}))
+			self.assertEqual(sorted(recipes), ["bread", "toast"])
+
+	def test_whole_file_errors(self):
+		with self.assertRaises(ValueError):
+			list(bulk.iterRows(io.StringIO('{"prodType": "egg"}'), "json"))
+		with self.assertRaises(ValueError):
+			list(bulk.iterRows(io.StringIO(""), "xml"))
+
+class MemoryBulkTests(MemoryBackend, BulkTests, unittest.TestCase):
+	pass
+
+class SqliteBulkTests(SqliteBackend, BulkTests, unittest.TestCase):
+	pass
+
+class MongoBulkTests(MongoBackend, BulkTests, unittest.TestCase):
+	# mongomock stops an unordered insert_many at its first error, which
+	# Mongo doesn't, so each batch holds at most one duplicate
+	batchSizes = (2,)
+
+if __name__ == "__main__":
+	unittest.main()
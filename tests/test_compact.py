@@ -0,0 +1,40 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import datetime
+import unittest
+from bson import ObjectId
+import compact
+
+def rawProduct(quantity):
+	return {"_id": ObjectId(), "prodType": "flour", "expDate": datetime.datetime(2030, 1, 1), "quantity": quantity, "unit": "g"}
+
+class CompactTests(unittest.TestCase):
+
+	def test_whole_quantities_are_ints(self):
+		# memory stores keep what was added, Mongo and SQLite give floats
+		for quantity in (700, 700.0):
+			flat = compact.product(rawProduct(quantity))
+			self.assertIs(type(flat["quantity"]), int)
+			self.assertIn(b'"quantity":700,', compact.dumps(flat))
+
+	def test_fractional_quantities_are_kept(self):
+		self.assertEqual(compact.product(rawProduct(2.5))["quantity"], 2.5)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,58 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import datetime
+import unittest
+from models import Product
+from tests.support import loadApi
+
+api = loadApi()
+
+class ConditionalTests(unittest.TestCase):
+	''' polls with the ETag of the last response get 304 until anything
+		writes to the collection, through this API process or not
+	'''
+
+	def setUp(self):
+		self.client = api.app.test_client()
+		self.home = api.households.get(api.DEFAULT_HOUSEHOLD)
+		self.home.store.deleteAllProducts()
+		self.client.post("/add-product", json={"prodType": "egg", "expDate": "2030-01-01", "note": None})
+
+		# a store of its own stands in for the CLI or another worker
+		self.outside = api.store.scoped(api.DEFAULT_HOUSEHOLD)
+
+	def poll(self, etag):
+		return self.client.get("/products", headers={"If-None-Match": '"' + etag + '"'})
+
+	def test_unchanged_collection_is_not_sent_again(self):
+		etag = self.client.get("/products").get_etag()[0]
+		self.assertEqual(self.poll(etag).status_code, 304)
+
+	def test_writes_from_outside_the_process_are_sent(self):
+		first = self.client.get("/products")
+		etag = first.get_etag()[0]
+		self.outside.add(Product(prodType="milk", expDate=datetime.datetime(2030, 1, 2), quantity=1, unit="ml"))
+
+		response = self.poll(etag)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual([doc["prodType"] for doc in response.get_json()], ["egg", "milk"])
+		self.assertEqual(self.poll(response.get_etag()[0]).status_code, 304)
+
+if __name__ == "__main__":
+	unittest.main()
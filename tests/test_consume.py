@@ -0,0 +1,115 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import unittest
+import threading
+from models import Recipe
+from tests.support import MemoryBackend, MongoBackend, SqliteBackend, product
+
+# threads making recipes at once, and products of each ingredient they share
+THREADS = 8
+STOCK = 60
+
+def stock(store):
+	''' returns {prodType:total quantity} of every product in store
+	'''
+
+	totals = {}
+	for doc in store.products():
+		totals[doc.prodType] = totals.get(doc.prodType, 0) + doc.quantity
+	return totals
+
+class ConsumeTests(object):
+	''' consume() of every store is all or nothing, also when another
+		consumer takes stock at the same time. subclasses mix in a backend
+		from tests.support
+	'''
+
+	def setUp(self):
+		self.store = self.makeStore()
+
+	def test_consumes_earliest_first(self):
+		early = product("egg", days=1)
+		late = product("egg", days=5)
+		partial = product("flour", quantity=1000, unit="g")
+		for doc in (late, early, partial):
+			self.store.add(doc)
+		missing, used, left = self.store.consume(Recipe(name="pancake", ingredients={"egg": 1, "flour": 250}, units={"flour": "g"}, instructions="mix"))
+		self.assertEqual(missing, {})
+		self.assertEqual(used, [early.id])
+		self.assertEqual(left, {partial.id: 750})
+		self.assertEqual(stock(self.store), {"egg": 1, "flour": 750})
+
+	def test_shortfall_takes_nothing(self):
+		for doc in (product("egg"), product("egg"), product("milk", quantity=500, unit="ml")):
+			self.store.add(doc)
+		missing, used, left = self.store.consume(Recipe(name="custard", ingredients={"egg": 2, "milk": 1000}, units={"milk": "ml"}, instructions="whisk"))
+		self.assertEqual(missing, {"milk": 500})
+		self.assertEqual((used, left), ([], {}))
+		self.assertEqual(stock(self.store), {"egg": 2, "milk": 500})
+
+class ConcurrentConsumeTests(ConsumeTests):
+	''' recipes made from several threads at once never share a product,
+		and what they took plus what is left is what was stocked
+	'''
+
+	def test_concurrent_consume_conserves_stock(self):
+		for i in range(STOCK):
+			self.store.add(product("egg", days=i))
+			self.store.add(product("flour", days=i, quantity=100, unit="g"))
+		recipe = Recipe(name="bread", ingredients={"egg": 3, "flour": 450}, units={"flour": "g"}, instructions="bake")
+		made = []
+		lock = threading.Lock()
+
+		def worker():
+			while True:
+				missing, used, left = self.store.consume(recipe)
+				if missing:
+					self.assertEqual((used, left), ([], {}))
+					return
+				with lock:
+					made.append((used, left))
+
+		threads = [threading.Thread(target=worker) for i in range(THREADS)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		# every product deleted was deleted by one consumer only
+		deleted = [docId for used, left in made for docId in used]
+		self.assertEqual(len(deleted), len(set(deleted)))
+		remaining = stock(self.store)
+		self.assertEqual(len(made) * 3 + remaining.get("egg", 0), STOCK)
+		self.assertAlmostEqual(len(made) * 450 + remaining.get("flour", 0), STOCK * 100)
+		self.assertTrue(remaining.get("egg", 0) < 3 or remaining.get("flour", 0) < 450)
+		self.assertTrue(all(doc.quantity > 0 for doc in self.store.products()))
+
+class MemoryConsumeTests(MemoryBackend, ConcurrentConsumeTests, unittest.TestCase):
+	pass
+
+class SqliteConsumeTests(SqliteBackend, ConcurrentConsumeTests, unittest.TestCase):
+	pass
+
+class MongoConsumeTests(MongoBackend, ConsumeTests, unittest.TestCase):
+	''' mongomock has no transactions either, so the stock taken before
+		a shortfall is given back as on a real server
+	'''
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,73 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import json
+import base64
+import unittest
+from tests.support import loadApi
+
+api = loadApi()
+
+def token(value):
+	return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+class CursorTests(unittest.TestCase):
+	''' ?after= cursors page through listings, and any token that isn't
+		one is refused with 400 rather than reaching the store
+	'''
+
+	def setUp(self):
+		self.client = api.app.test_client()
+		home = api.households.get(api.DEFAULT_HOUSEHOLD)
+		home.store.deleteAllProducts()
+		home.store.deleteAllRecipes()
+		for i in range(5):
+			self.client.post("/add-product", json={"prodType": "type" + str(i), "expDate": "2030-01-0" + str(i + 1), "note": None})
+			self.client.post("/add-recipe", json={"rcpName": "recipe" + str(i), "ingredients": {"egg": 1}, "instructions": "x"})
+
+	def test_pages_follow_cursor(self):
+		for path, field in (("/products", "prodType"), ("/recipes", "name")):
+			seen = []
+			url = path + "?limit=2"
+			while True:
+				page = self.client.get(url).get_json()
+				seen += [doc[field] for doc in page["items"]]
+				if page["next"] == None:
+					break
+				url = path + "?limit=2&after=" + page["next"]
+			self.assertEqual(len(seen), 5)
+			self.assertEqual(seen, sorted(seen))
+
+	def test_wrong_shaped_cursors_are_refused(self):
+		oid = {"$oid": "5c1e1f8d9b1e8a3f4c2d1e0f"}
+		date = {"$date": 1893456000000}
+		for path, tokens in (
+			("/products", [token([1]), token({"a": 1}), token(["egg", date]), token([1, date, oid]), token(["egg", "2030", oid]), token(["egg", date, "x"]), "!!!", token("x")[:-2]]),
+			("/recipes", [token([1]), token(["a", oid, oid]), token([None, oid])]),
+
+			# extended JSON the bson decoder itself rejects
+			("/products", [token(["egg", date, {"$oid": "zz"}]), token(["egg", {"$date": 1e30}, oid]), token(["egg", {"$date": None}, oid]), token(["egg", {"$date": "junk"}, oid]), token(["egg", date, {"$numberDecimal": "x"}])])
+		):
+			for after in tokens:
+				for extra in ("", "&stream=true", "&format=compact"):
+					response = self.client.get(path + "?limit=2&after=" + after + extra)
+					self.assertEqual(response.status_code, 400, path + " " + after)
+					self.assertEqual(response.get_json()["message"], "Invalid cursor.")
+
+if __name__ == "__main__":
+	unittest.main()
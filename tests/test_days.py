@@ -0,0 +1,54 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import unittest
+from tests.support import loadApi
+
+api = loadApi()
+
+# routes taking a ?days= look-ahead window
+ROUTES = ("/expiring", "/inventory/summary", "/recommendations")
+
+class DaysTests(unittest.TestCase):
+
+	def setUp(self):
+		self.client = api.app.test_client()
+		self.home = api.households.get(api.DEFAULT_HOUSEHOLD)
+		self.home.store.deleteAllProducts()
+		self.client.post("/add-product", json={"prodType": "egg", "expDate": "2030-01-01", "note": None})
+
+	def test_bad_days_are_refused(self):
+		for route in ROUTES:
+			for days in ("-1", "x", "nan", "inf", "1e400"):
+				response = self.client.get(route + "?days=" + days)
+				self.assertEqual(response.status_code, 200, route + " " + days)
+				self.assertEqual(response.get_json()["success"], False, route + " " + days)
+
+	def test_long_windows_are_cut_short(self):
+		for route in ROUTES:
+			self.assertEqual(self.client.get(route + "?days=1e9").status_code, 200, route)
+		self.assertEqual(len(self.client.get("/expiring?days=1e9").get_json()), 1)
+		self.assertIn(api.MAX_DAYS, self.home.summaryCache)
+
+	def test_summary_cache_is_bounded(self):
+		for days in range(api.SUMMARY_CACHE_SIZE * 2):
+			self.client.get("/inventory/summary?days=" + str(days))
+		self.assertEqual(len(self.home.summaryCache), api.SUMMARY_CACHE_SIZE)
+
+if __name__ == "__main__":
+	unittest.main()
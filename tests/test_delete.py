@@ -0,0 +1,53 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import datetime
+import unittest
+from bson import ObjectId
+from models import Product, Recipe
+from tests.support import loadApi
+
+api = loadApi()
+
+class DeleteTests(unittest.TestCase):
+	''' IDs given as JSON numbers are matched as text, as /delete-products
+		matches them, rather than failing the request
+	'''
+
+	def setUp(self):
+		self.client = api.app.test_client()
+		self.home = api.households.get(api.DEFAULT_HOUSEHOLD)
+		self.home.store.deleteAllProducts()
+		self.home.store.deleteAllRecipes()
+		self.home.store.add(Product(id=ObjectId("5c2a5d6b9f1e4a0001a11234"), prodType="egg", expDate=datetime.datetime(2030, 1, 1), quantity=1, unit="each"))
+		self.home.store.add(Recipe(id=ObjectId("5c2a5d6b9f1e4a0001a15678"), name="omelette", ingredients={"egg": 2}, units={"egg": "each"}, instructions="whisk"))
+
+	def test_ids_that_match_nothing(self):
+		for route, field in (("/delete-product", "prodId"), ("/delete-recipe", "rcpId")):
+			for value in (4321, 12.5, None, True, ["1234"]):
+				response = self.client.post(route, json={field: value})
+				self.assertEqual(response.status_code, 200, route + " " + repr(value))
+				self.assertEqual(response.get_json()["success"], False)
+
+	def test_numeric_ids_delete(self):
+		self.assertEqual(self.client.post("/delete-product", json={"prodId": 1234}).get_json()["success"], True)
+		self.assertEqual(self.client.post("/delete-recipe", json={"rcpId": 5678}).get_json()["success"], True)
+		self.assertEqual((self.home.store.countProducts(), self.home.store.countRecipes()), (0, 0))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,133 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import queue
+import datetime
+import threading
+import unittest
+from bson import ObjectId
+import events
+from models import Product
+
+class FakeStore(object):
+	''' a store whose first change stream yields the given changes once
+		released, and then fails, and which can't open another
+	'''
+
+	def __init__(self, changes):
+		self.released = threading.Event()
+		self.streams = [self.stream(changes)]
+
+	def stream(self, changes):
+		self.released.wait()
+		for event, data in changes:
+			yield event, data
+		raise RuntimeError("stream lost")
+
+	def openChanges(self):
+		return self.streams.pop(0) if len(self.streams) > 0 else None
+
+def product(prodType):
+	return Product(id=ObjectId(), prodType=prodType, expDate=datetime.datetime(2030, 1, 1), quantity=1, unit="each")
+
+def received(subscription):
+	''' returns the (event, data) tuples waiting in subscription
+	'''
+
+	found = []
+	while True:
+		try:
+			found += [subscription.get_nowait()]
+		except queue.Empty:
+			return found
+
+class ChangeFeedTests(unittest.TestCase):
+
+	def setUp(self):
+		retry = events.RETRY_SECONDS
+		events.RETRY_SECONDS = 0
+		self.addCleanup(setattr, events, "RETRY_SECONDS", retry)
+		self.broker = events.Broker()
+		self.calls = []
+
+	def run_feed(self, changes, locate=None):
+		''' runs a ChangeFeed over changes until its stream fails and
+			can't be reopened
+		'''
+
+		store = FakeStore(changes)
+		feed = events.ChangeFeed(store, self.broker, lambda *call: self.calls.append(call), locate)
+		feed.ensureStarted()
+		self.assertTrue(feed.watching)
+		store.released.set()
+		feed.join(5)
+		self.assertFalse(feed.is_alive())
+		self.assertFalse(feed.watching)
+
+	def test_changes_reach_only_their_household(self):
+		egg = product("egg")
+		milk = product("milk")
+		mine = self.broker.subscribe(household="mine")
+		theirs = self.broker.subscribe(household="theirs")
+		self.run_feed([
+			("add", {"collection": "product", "household": "mine", "docs": [egg]}),
+			("add", {"collection": "product", "household": "theirs", "docs": [milk]}),
+			("update", {"collection": "product", "household": "mine", "quantities": {str(egg.id): 0.5}}),
+			("delete", {"collection": "product", "household": None, "ids": [str(egg.id)]})])
+
+		changes = [(event, data) for event, data in received(mine) if event != "reset"]
+		self.assertEqual([event for event, data in changes], ["add", "update", "delete"])
+		self.assertEqual(changes[0][1]["docs"], [egg])
+		self.assertEqual(changes[1][1]["quantities"], {str(egg.id): 0.5})
+		self.assertEqual(changes[2][1]["ids"], [str(egg.id)])
+		self.assertNotIn(str(egg.id), repr(received(theirs)))
+		self.assertEqual(self.calls[3], ("product", "mine", "delete", {"collection": "product", "ids": [str(egg.id)]}))
+
+	def test_unknown_delete_is_a_reset(self):
+		docId = str(ObjectId())
+		mine = self.broker.subscribe(household="mine")
+		theirs = self.broker.subscribe(household="theirs")
+		self.run_feed([("delete", {"collection": "recipe", "household": None, "ids": [docId]})])
+
+		for subscription in (mine, theirs):
+			found = received(subscription)
+			self.assertEqual(found[0], ("reset", {"collection": "recipe"}))
+			self.assertNotIn(docId, repr(found))
+		self.assertEqual(self.calls[0], ("recipe", None, "delete", {"collection": "recipe", "ids": [docId]}))
+
+	def test_delete_located_by_callback(self):
+		docId = str(ObjectId())
+		mine = self.broker.subscribe(household="mine")
+		theirs = self.broker.subscribe(household="theirs")
+		self.run_feed([("delete", {"collection": "product", "household": None, "ids": [docId]})], lambda collection, docIds: "mine")
+
+		self.assertEqual(received(mine)[0], ("delete", {"collection": "product", "ids": [docId]}))
+		self.assertNotIn(docId, repr(received(theirs)))
+
+	def test_stream_error_resets_every_household(self):
+		mine = self.broker.subscribe(household="mine")
+		everyone = self.broker.subscribe(["reset"])
+		self.run_feed([])
+
+		resets = [("reset", {"collection": "product"}), ("reset", {"collection": "recipe"})]
+		self.assertEqual(received(mine), resets)
+		self.assertEqual(received(everyone), resets)
+		self.assertEqual(self.calls, [(collection, None, "reset", {"collection": collection}) for collection in ("product", "recipe")])
+
+if __name__ == "__main__":
+	unittest.main()
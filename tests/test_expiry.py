@@ -0,0 +1,83 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import shutil
+import datetime
+import tempfile
+import unittest
+import expiry
+from tests.support import TODAY, MemoryBackend, MongoBackend, SqliteBackend, product
+
+def day(days):
+	return TODAY + datetime.timedelta(days=days)
+
+class ExpiryWatchTests(object):
+	''' each product is reported once, by the first check after its
+		expDate passes. subclasses mix in a backend from tests.support
+	'''
+
+	def setUp(self):
+		self.store = self.makeStore()
+		directory = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, directory)
+		self.path = os.path.join(directory, expiry.WATERMARK_FILE)
+		for prodType, days in (("milk", -5), ("egg", 0), ("bread", 1), ("cheese", 3)):
+			self.store.add(product(prodType, days=days))
+
+	def due(self, watch, days):
+		return [product.prodType for product in watch.due(day(days))]
+
+	def test_watermark_advances(self):
+		watch = expiry.ExpiryWatch(self.store)
+		self.assertEqual(watch.watermark, None)
+		# the first check reports everything already expired; a product
+		# expiring exactly at the watermark waits for the next one
+		self.assertEqual(self.due(watch, 0), ["milk"])
+		self.assertEqual(watch.watermark, day(0))
+		self.assertEqual(watch.nextExpiry(), day(0))
+		self.assertEqual(self.due(watch, 2), ["egg", "bread"])
+		self.assertEqual(self.due(watch, 2), [])
+		self.assertEqual(watch.nextExpiry(), day(3))
+		self.assertEqual(self.due(watch, 4), ["cheese"])
+		self.assertEqual(watch.nextExpiry(), None)
+
+	def test_watermark_kept_between_runs(self):
+		self.assertEqual(self.due(expiry.ExpiryWatch(self.store, self.path), 2), ["milk", "egg", "bread"])
+		watch = expiry.ExpiryWatch(self.store, self.path)
+		self.assertEqual(watch.watermark, day(2))
+		self.assertEqual(self.due(watch, 4), ["cheese"])
+
+	def test_unreadable_watermark(self):
+		with open(self.path, "w") as watermark_file:
+			watermark_file.write("yesterday")
+		watch = expiry.ExpiryWatch(self.store, self.path)
+		self.assertEqual(watch.watermark, None)
+		self.assertEqual(self.due(watch, 2), ["milk", "egg", "bread"])
+
+class MemoryExpiryWatchTests(MemoryBackend, ExpiryWatchTests, unittest.TestCase):
+	pass
+
+class SqliteExpiryWatchTests(SqliteBackend, ExpiryWatchTests, unittest.TestCase):
+	pass
+
+class MongoExpiryWatchTests(MongoBackend, ExpiryWatchTests, unittest.TestCase):
+	pass
+
+if __name__ == "__main__":
+	unittest.main()
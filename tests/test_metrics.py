@@ -0,0 +1,51 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import unittest
+from flask import Flask, abort
+from metrics import Metrics
+
+class MetricsTests(unittest.TestCase):
+
+	def setUp(self):
+		self.app = Flask(__name__)
+		Metrics().install(self.app)
+
+		@self.app.url_value_preprocessor
+		def refuse(endpoint, values):
+			if values and values.get("name") == "bad":
+				abort(404)
+
+		@self.app.route("/things/<name>")
+		def thing(name):
+			return name
+
+		self.client = self.app.test_client()
+
+	def test_requests_are_timed(self):
+		response = self.client.get("/things/good")
+		self.assertEqual(response.status_code, 200)
+		self.assertIn("app;dur=", response.headers["Server-Timing"])
+
+	def test_refused_before_timing_keeps_status(self):
+		response = self.client.get("/things/bad")
+		self.assertEqual(response.status_code, 404)
+		self.assertNotIn("Server-Timing", response.headers)
+
+if __name__ == "__main__":
+	unittest.main()
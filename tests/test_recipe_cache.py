@@ -0,0 +1,67 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import unittest
+from tests.support import SqliteBackend, loadApi, recipe
+
+api = loadApi()
+
+class RecipeCacheTests(SqliteBackend, unittest.TestCase):
+	''' a RecipeCache over one SQLite store sees recipes written through
+		another, as a cache in one worker does those of other workers and
+		the CLI
+	'''
+
+	def setUp(self):
+		self.worker = self.makeStore().scoped("default")
+		self.other = self.reopen().scoped("default")
+		self.cache = api.RecipeCache(self.worker)
+		context = api.app.app_context()
+		context.push()
+		self.addCleanup(context.pop)
+
+	def names(self):
+		return [doc.name for doc in self.cache.all()[0]]
+
+	def test_served_from_cache_until_written(self):
+		self.worker.add(recipe("toast", egg=1))
+		self.assertEqual(self.names(), ["toast"])
+		self.assertEqual(self.names(), ["toast"])
+		self.assertEqual(self.cache.hits, 1)
+
+		self.other.add(recipe("omelette", egg=1))
+		self.assertEqual(self.names(), ["omelette", "toast"])
+		self.assertIn(b"omelette", self.cache.compact())
+		self.assertEqual(len(self.cache.index().ingredients), 2)
+
+	def test_recipes_deleted_elsewhere_are_forgotten(self):
+		self.worker.add(recipe("toast", egg=1))
+		self.assertEqual(self.cache.get("toast").name, "toast")
+		self.other.deleteAllRecipes()
+		self.assertEqual(self.cache.get("toast"), None)
+		self.assertEqual(self.names(), [])
+
+	def test_other_households_leave_it_alone(self):
+		self.worker.add(recipe("toast", egg=1))
+		self.names()
+		self.other.scoped("smith").add(recipe("omelette", egg=1))
+		self.names()
+		self.assertEqual(self.cache.hits, 1)
+
+if __name__ == "__main__":
+	unittest.main()
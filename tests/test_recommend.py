@@ -0,0 +1,77 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import unittest
+import recommend
+from tests.support import TODAY, MemoryBackend, MongoBackend, SqliteBackend, product, recipe
+
+class RecommendTests(object):
+	''' recipes are ranked by how many expiring products one batch uses
+		up, then by how little is missing. subclasses mix in a backend
+		from tests.support
+	'''
+
+	def setUp(self):
+		self.store = self.makeStore()
+		self.store.add(product("egg", days=1, quantity=3))
+		self.store.add(product("spinach", days=2))
+		self.store.add(product("milk", days=10, quantity=1000, unit="ml"))
+		self.store.add(product("flour", days=30, quantity=1000, unit="g"))
+		for doc in (
+			recipe("omelette", egg=3, spinach=1),
+			recipe("scramble", {"milk": "ml"}, egg=2, milk=100),
+			recipe("quiche", {"flour": "g"}, egg=4, spinach=1, flour=200),
+			recipe("pancake", {"flour": "g", "milk": "ml"}, flour=200, milk=200),
+			recipe("salad", spinach=2),
+			recipe("custard", {"milk": "ml"}, milk=2000)
+		):
+			self.store.add(doc)
+		self.index = recommend.RecipeIndex(self.store.recipes())
+
+	def ranked(self, days, limit=None):
+		return [(recipe.name, units, shortfall) for recipe, units, shortfall in recommend.recommend(self.store, self.index, TODAY, days, limit)]
+
+	def test_ranked_by_expiring_used_then_missing(self):
+		self.assertEqual(self.ranked(3), [
+			("omelette", 4, {}),
+			("quiche", 4, {"egg": 1}),
+			("scramble", 2, {}),
+			("salad", 1, {"spinach": 1})
+		])
+		self.assertEqual([name for name, units, shortfall in self.ranked(3, 2)], ["omelette", "quiche"])
+
+	def test_measured_ingredients_count_as_shares(self):
+		# the milk comes into range, a whole product's worth for the
+		# scramble and pancake, and half of what the custard needs
+		ranked = dict((name, units) for name, units, shortfall in self.ranked(15))
+		self.assertEqual((ranked["scramble"], ranked["pancake"], ranked["custard"]), (3, 1, 0.5))
+
+	def test_nothing_expiring(self):
+		self.assertEqual(self.ranked(0.5), [])
+
+class MemoryRecommendTests(MemoryBackend, RecommendTests, unittest.TestCase):
+	pass
+
+class SqliteRecommendTests(SqliteBackend, RecommendTests, unittest.TestCase):
+	pass
+
+class MongoRecommendTests(MongoBackend, RecommendTests, unittest.TestCase):
+	pass
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,98 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import unittest
+from bson import ObjectId
+import search
+
+def rawProduct(prodType, note=None):
+	return {"_id": ObjectId(), "prodType": prodType, "note": note}
+
+def rawRecipe(name, instructions="cook"):
+	return {"_id": ObjectId(), "name": name, "ingredients": {"egg": 1}, "instructions": instructions}
+
+class EditDistanceTests(unittest.TestCase):
+
+	def test_edits(self):
+		self.assertEqual(search.editDistance("milk", "milk", 2), 0)
+		self.assertEqual(search.editDistance("mlik", "milk", 2), 1)
+		self.assertEqual(search.editDistance("tomatoe", "tomato", 2), 1)
+		self.assertEqual(search.editDistance("bred", "bread", 2), 1)
+		self.assertEqual(search.editDistance("cheese", "chess", 2), 2)
+
+	def test_stops_past_the_limit(self):
+		self.assertEqual(search.editDistance("apple", "banana", 1), 2)
+		self.assertEqual(search.editDistance("a", "abcdef", 2), 3)
+
+class SearchIndexTests(unittest.TestCase):
+
+	def setUp(self):
+		self.index = search.SearchIndex()
+		self.docs = {}
+		for doc in (rawProduct("milk"), rawProduct("milkshake"), rawProduct("oat", "oat milk"), rawProduct("tomato"), rawProduct("egg", "free range"),
+				rawRecipe("tomato soup", "simmer the tomato"), rawRecipe("omelette", "whisk egg and milk")):
+			self.index.add(doc)
+			self.docs[str(doc["_id"])] = doc.get("prodType") or doc.get("name")
+
+	def labels(self, query, limit=search.SEARCH_LIMIT, collection=None):
+		return [self.docs[docId] for collection, docId, score in self.index.search(query, limit, collection)]
+
+	def test_exact_then_prefix_then_weaker_fields(self):
+		results = self.index.search("milk")
+		self.assertEqual([self.docs[docId] for collection, docId, score in results], ["milk", "milkshake", "oat", "omelette"])
+		self.assertEqual([score for collection, docId, score in results], [2.0, 1.6, 1.0, 1.0])
+
+	def test_typos_when_too_few_start_with_the_term(self):
+		self.assertEqual(self.labels("tomatoe"), ["tomato", "tomato soup"])
+		self.assertEqual(self.labels("milc"), ["milk", "milkshake", "oat", "omelette"])
+		self.assertEqual(self.labels("toamto"), ["tomato", "tomato soup"])
+		self.assertEqual(self.index.search("tomatoe")[0][2], search.FUZZY_SCORES[1] * 2)
+
+		# enough words start with the term, so typos aren't looked for
+		self.assertEqual(self.labels("milk", limit=2), ["milk", "milkshake"])
+		self.assertEqual(self.labels("milks", limit=1), ["milkshake"])
+		self.assertEqual(self.labels("milks")[:2], ["milkshake", "milk"])
+
+	def test_short_terms_have_no_typos(self):
+		self.assertEqual(self.labels("eg"), ["egg", "omelette"])
+		self.assertEqual(self.labels("ge"), [])
+
+	def test_documents_matching_more_words_first(self):
+		self.assertEqual(self.labels("tomato soup")[0], "tomato soup")
+		self.assertEqual(self.labels("oat milk")[0], "oat")
+		self.assertEqual(self.labels("egg milk", collection="recipe"), ["omelette"])
+
+	def test_changes_are_applied(self):
+		docId = next(docId for docId in self.docs if self.docs[docId] == "milk")
+		self.index.filled = True
+		self.index.apply("delete", "product", {"ids": [docId]})
+		self.assertNotIn("milk", self.labels("milk"))
+		self.assertFalse(self.index.holds(docId))
+		added = rawProduct("buttermilk")
+		self.docs[str(added["_id"])] = "buttermilk"
+		self.index.apply("add", "product", {"docs": [added]})
+		self.assertEqual(self.labels("buttermilk"), ["buttermilk"])
+		self.index.apply("reset", "product", {"collection": "product"})
+		self.assertEqual((self.index.filled, self.labels("milk")), (False, []))
+
+	def test_suggested_names(self):
+		self.assertEqual(self.index.names("tomatoe sop", 1), ["tomato soup"])
+		self.assertEqual(self.index.names("omlete"), ["omelette"])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,88 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import datetime
+import unittest
+import shopping
+from tests.support import TODAY, MemoryBackend, MongoBackend, SqliteBackend, product, recipe
+
+def day(days):
+	return TODAY + datetime.timedelta(days=days)
+
+class ShoppingTests(object):
+	''' shoppingList() counts a product only for the meals cooked by its
+		expiration date. subclasses mix in a backend from tests.support
+	'''
+
+	def setUp(self):
+		self.store = self.makeStore()
+		self.store.add(recipe("omelette", egg=2))
+		self.store.add(recipe("bread", {"flour": "g"}, flour=500, egg=1))
+
+	def plan(self, *meals):
+		return shopping.parsePlan([{"rcpName": name, "batches": batches, "date": date} for name, batches, date in meals])
+
+	def buy(self, *meals):
+		return shopping.shoppingList(self.store, self.plan(*meals), TODAY)
+
+	def test_stock_covers_meals_up_to_its_expiration(self):
+		self.store.add(product("egg", days=3, quantity=2))
+		self.store.add(product("egg", days=10, quantity=2))
+		self.assertEqual(self.buy(("omelette", 1, "2030-01-02"), ("omelette", 1, "2030-01-06")), ({}, []))
+
+		# the meal after every egg expired needs its own
+		self.assertEqual(self.buy(("omelette", 1, "2030-01-02"), ("omelette", 1, "2030-01-06"), ("omelette", 1, "2030-01-12")), ({"egg": {"each": 2}}, []))
+
+	def test_later_stock_isnt_counted_twice(self):
+		# both meals are after the first eggs expire, so only the later two count
+		self.store.add(product("egg", days=3, quantity=2))
+		self.store.add(product("egg", days=10, quantity=2))
+		self.assertEqual(self.buy(("omelette", 1, "2030-01-06"), ("omelette", 1, "2030-01-07")), ({"egg": {"each": 2}}, []))
+
+	def test_expiring_on_the_day_still_counts(self):
+		self.store.add(product("egg", days=5, quantity=2))
+		self.assertEqual(self.buy(("omelette", 1, "2030-01-06")), ({}, []))
+
+	def test_shortfall_split_across_units_and_batches(self):
+		self.store.add(product("flour", days=30, quantity=700, unit="g"))
+		self.store.add(product("egg", days=30, quantity=1))
+		deficit, unknown = self.buy(("bread", 2, "2030-01-05"), ("omelette", 1, None), ("cake", 1, None))
+		self.assertEqual(deficit, {"flour": {"g": 300}, "egg": {"each": 3}})
+		self.assertEqual(unknown, ["cake"])
+
+	def test_past_and_undated_meals_are_cooked_now(self):
+		self.store.add(product("egg", days=0, quantity=4))
+		plan = shopping.parsePlan(["omelette", {"rcpName": "omelette", "date": "2020-01-01"}])
+		self.assertEqual(shopping.shoppingList(self.store, plan, TODAY), ({}, []))
+
+	def test_malformed_plans(self):
+		for plan in ({"rcpName": "x"}, [{"batches": 2}], [{"rcpName": "x", "batches": 0}], [{"rcpName": "x", "date": 5}]):
+			with self.assertRaises(ValueError):
+				shopping.parsePlan(plan)
+
+class MemoryShoppingTests(MemoryBackend, ShoppingTests, unittest.TestCase):
+	pass
+
+class SqliteShoppingTests(SqliteBackend, ShoppingTests, unittest.TestCase):
+	pass
+
+class MongoShoppingTests(MongoBackend, ShoppingTests, unittest.TestCase):
+	pass
+
+if __name__ == "__main__":
+	unittest.main()
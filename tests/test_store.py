@@ -0,0 +1,184 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import datetime
+import unittest
+import pantry
+from models import Product, Recipe
+from tests.support import TODAY, MemoryBackend, MongoBackend, SqliteBackend, product, recipe
+
+def sortKey(doc, sortFields):
+	return [getattr(doc, field) for field in sortFields]
+
+class StoreTests(object):
+	''' the Store interface, as every backend implements it. subclasses
+		mix in a backend from tests.support
+	'''
+
+	def setUp(self):
+		self.store = self.makeStore()
+
+	def page(self, listing, sortFields, limit):
+		''' returns the ids read by following listing(after, limit) one
+			page at a time, as ?after= cursors do
+		'''
+
+		ids = []
+		after = None
+		while True:
+			docs = list(listing(after=after, limit=limit))
+			self.assertTrue(len(docs) <= limit)
+			ids += [doc.id for doc in docs]
+			if len(docs) < limit:
+				return ids
+			after = sortKey(docs[-1], sortFields)
+
+	def test_products_are_sorted_and_paged(self):
+		for prodType, days in (("milk", 3), ("egg", 5), ("egg", 1), ("apple", 9), ("egg", 1)):
+			self.store.add(product(prodType, days))
+		products = list(self.store.products())
+		self.assertEqual(self.store.countProducts(), 5)
+		self.assertEqual([doc.prodType for doc in products], ["apple", "egg", "egg", "egg", "milk"])
+		self.assertEqual(products, sorted(products, key=lambda doc: sortKey(doc, pantry.PRODUCT_SORT)))
+		self.assertEqual(self.page(self.store.products, pantry.PRODUCT_SORT, 2), [doc.id for doc in products])
+		self.assertEqual([doc["_id"] for doc in self.store.products(raw=True)], [doc.id for doc in products])
+
+	def test_recipes_are_sorted_and_paged(self):
+		for name in ("toast", "omelette", "cake"):
+			self.store.add(recipe(name, egg=2))
+		recipes = list(self.store.recipes())
+		self.assertEqual(self.store.countRecipes(), 3)
+		self.assertEqual([doc.name for doc in recipes], ["cake", "omelette", "toast"])
+		self.assertEqual(self.page(self.store.recipes, pantry.RECIPE_SORT, 2), [doc.id for doc in recipes])
+		self.assertEqual(self.store.recipe("omelette").id, recipes[1].id)
+		self.assertEqual(self.store.recipe("soup"), None)
+
+	def test_find_many_matches_id_suffixes(self):
+		docs = [product("egg"), product("milk")]
+		for doc in docs:
+			self.store.add(doc)
+		ids = [str(doc.id) for doc in docs]
+		found = self.store.findManyProducts([ids[0][-4:], ids[1], "abc", "0" * 24])
+		self.assertEqual([doc.id for doc in found[ids[0][-4:]]], [docs[0].id])
+		self.assertEqual([doc.id for doc in found[ids[1]]], [docs[1].id])
+		self.assertEqual((found["abc"], found["0" * 24]), ([], []))
+		self.assertEqual([doc.id for doc in self.store.findProducts(ids[1][-6:])], [docs[1].id])
+
+	def test_consume_takes_stock(self):
+		for doc in (product("egg", 2), product("egg", 1), product("flour", quantity=500, unit="g")):
+			self.store.add(doc)
+		bread = Recipe(name="bread", ingredients={"egg": 1, "flour": 200}, units={"egg": "each", "flour": "g"}, instructions="bake")
+		self.assertTrue(self.store.canMake(bread))
+		missing, used, left = self.store.consume(bread)
+		self.assertEqual((missing, len(used), list(left.values())), ({}, 1, [300]))
+		self.assertEqual(sorted((doc.prodType, doc.quantity) for doc in self.store.products()), [("egg", 1), ("flour", 300)])
+
+	def test_delete_expired(self):
+		for days in (-2, -1, 0, 1):
+			self.store.add(product("egg", days))
+		self.assertEqual(self.store.deleteExpired(TODAY), 2)
+		self.assertEqual([doc.expDate for doc in self.store.products()], [TODAY, TODAY + datetime.timedelta(days=1)])
+		self.assertEqual(self.store.deleteExpired(TODAY), 0)
+
+	def test_scoped_stores_see_only_their_household(self):
+		mine = self.store.scoped("mine")
+		theirs = self.store.scoped("theirs")
+		mine.add(product("egg"))
+		theirs.add(product("egg"))
+		theirs.add(product("milk"))
+		mine.add(recipe("omelette", egg=1))
+		self.assertEqual((mine.countProducts(), theirs.countProducts(), self.store.countProducts()), (1, 2, 3))
+		self.assertEqual([doc.household for doc in mine.products()], ["mine"])
+		self.assertEqual((theirs.countRecipes(), theirs.recipe("omelette")), (0, None))
+
+		theirId = str(next(iter(theirs.products())).id)
+		self.assertEqual(mine.findManyProducts([theirId]), {theirId: []})
+		missing, used, left = theirs.consume(recipe("eggs", egg=1))
+		self.assertEqual(missing, {})
+		self.assertEqual(mine.countProducts(), 1)
+		self.assertEqual(mine.deleteExpired(TODAY + datetime.timedelta(days=30)), 1)
+		self.assertEqual(theirs.countProducts(), 1)
+
+	def test_every_write_bumps_the_version(self):
+		mine = self.store.scoped("mine")
+		theirs = self.store.scoped("theirs")
+		seen = []
+
+		def changed(store, collection):
+			seen.append(store.version(collection))
+			return len(set(seen)) == len(seen)
+
+		egg = product("egg")
+		mine.add(egg)
+		self.assertTrue(changed(mine, "product"))
+		batch = [product("flour", quantity=500, unit="g"), product("milk")]
+		for doc in batch:
+			doc.validate()
+		mine.insertMany(Product, batch)
+		self.assertTrue(changed(mine, "product"))
+		mine.consume(Recipe(name="dough", ingredients={"flour": 100}, units={"flour": "g"}, instructions="knead"))
+		self.assertTrue(changed(mine, "product"))
+		mine.delete(egg)
+		self.assertTrue(changed(mine, "product"))
+		mine.deleteProducts(prodType="milk")
+		self.assertTrue(changed(mine, "product"))
+		mine.deleteExpired(TODAY + datetime.timedelta(days=30))
+		self.assertTrue(changed(mine, "product"))
+
+		# other households and collections are left alone, unscoped writes aren't
+		recipes = mine.version("recipe")
+		theirs.add(product("egg"))
+		self.assertEqual(seen[-1], mine.version("product"))
+		mine.add(recipe("omelette", egg=1))
+		self.assertEqual(seen[-1], mine.version("product"))
+		self.assertTrue(mine.version("recipe") > recipes)
+		self.store.deleteAllProducts()
+		self.assertTrue(changed(mine, "product"))
+
+		# another store over the same database sees the same versions
+		self.assertEqual(self.reopen().scoped("mine").version("product"), seen[-1])
+
+	def test_backfill_records_the_schema_version(self):
+		self.store.backfill()
+		self.assertEqual(self.store.schemaVersion(), pantry.SCHEMA_VERSION)
+
+class MemoryStoreTests(MemoryBackend, StoreTests, unittest.TestCase):
+	pass
+
+class SqliteStoreTests(SqliteBackend, StoreTests, unittest.TestCase):
+	def test_backfill_runs_once(self):
+		self.store.backfill()
+		statements = []
+		store = self.reopen()
+		store.setTrace(statements.append)
+		store.backfill()
+		self.assertEqual(statements, ["PRAGMA user_version"])
+
+class MongoStoreTests(MongoBackend, StoreTests, unittest.TestCase):
+	def test_backfill_runs_once(self):
+		collection = Product._get_collection()
+		docId = collection.insert_one({"prodType": "egg", "expDate": TODAY}).inserted_id
+		self.store.backfill()
+		self.assertEqual(collection.find_one({"_id": docId})["shortId"], str(docId)[-4:])
+
+		collection.update_one({"_id": docId}, {"$unset": {"shortId": True}})
+		self.reopen().backfill()
+		self.assertNotIn("shortId", collection.find_one({"_id": docId}))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,48 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import math
+import unittest
+import bulk
+import pantry
+import units
+
+class ParseTests(unittest.TestCase):
+
+	def test_quantities_are_read_in_base_units(self):
+		self.assertEqual(units.parse(3), (3, "each"))
+		self.assertEqual(units.parse("2 kg"), (2000, "g"))
+		self.assertEqual(units.parse(1.5, "l"), (1500, "ml"))
+
+	def test_non_finite_quantities_are_refused(self):
+		for value, unit in ((1e400, None), (math.inf, "g"), (math.nan, None), (10 ** 400, None), ("1" + "0" * 400, None), (1e308, "kg")):
+			with self.assertRaises(ValueError):
+				units.parse(value, unit)
+
+	def test_huge_whole_quantities_stay_floats(self):
+		self.assertIsInstance(units.amount(1e300), float)
+		self.assertIs(type(units.amount(700.0)), int)
+
+	def test_bulk_import_reports_them_per_row(self):
+		rows = [{"prodType": "egg", "expDate": "2030-01-01"}, {"prodType": "egg", "expDate": "2030-01-01", "quantity": 1e400}]
+		inserted, errors = bulk.importProducts(pantry.MemoryStore(), rows)
+		self.assertEqual(inserted, 1)
+		self.assertEqual(errors, [{"row": 2, "message": "Quantities must be finite numbers."}])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,151 @@
+'''
+GroceryHelper
+Copyright (C) 2019 Nathan Weinberg
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import re
+import math
+
+# units quantities can be given in, by dimension, as how many of the
+# dimension's base unit (listed first) each one holds
+UNITS = {
+	"mass": {"g": 1, "mg": 0.001, "kg": 1000, "oz": 28.349523125, "lb": 453.59237},
+	"volume": {"ml": 1, "l": 1000, "tsp": 4.92892159375, "tbsp": 14.78676478125, "floz": 29.5735295625, "cup": 236.5882365},
+	"count": {"each": 1, "dozen": 12}
+}
+
+# unit of products and ingredients given as a bare number
+COUNT = "each"
+
+# other spellings accepted for each unit
+ALIASES = {
+	"": "each", "x": "each", "pc": "each", "pcs": "each", "piece": "each", "pieces": "each",
+	"gram": "g", "grams": "g", "kilogram": "kg", "kilograms": "kg", "kilo": "kg", "kilos": "kg",
+	"milligram": "mg", "milligrams": "mg", "ounce": "oz", "ounces": "oz",
+	"pound": "lb", "pounds": "lb", "lbs": "lb",
+	"milliliter": "ml", "milliliters": "ml", "millilitre": "ml", "millilitres": "ml",
+	"liter": "l", "liters": "l", "litre": "l", "litres": "l",
+	"teaspoon": "tsp", "teaspoons": "tsp", "tablespoon": "tbsp", "tablespoons": "tbsp",
+	"fl oz": "floz", "fluid ounce": "floz", "fluid ounces": "floz", "cups": "cup"
+}
+
+# quantities are stored in base units rounded to this many decimal places,
+# so sums and differences don't leave crumbs like 1e-16 behind
+PRECISION = 6
+TOLERANCE = 0.5 * 10 ** -PRECISION
+
+# base unit of every unit and the factor between every pair of units of
+# the same dimension, worked out once
+BASE_UNITS = [list(UNITS[dimension])[0] for dimension in UNITS]
+BASE = {unit: list(UNITS[dimension])[0] for dimension in UNITS for unit in UNITS[dimension]}
+CONVERSIONS = {
+	(source, target): UNITS[dimension][source] / UNITS[dimension][target]
+	for dimension in UNITS for source in UNITS[dimension] for target in UNITS[dimension]
+}
+
+# larger units amounts are shown in by describe(), tried in order
+DISPLAY_UNITS = {"g": ["kg", "g"], "ml": ["l", "ml"], "each": ["each"]}
+
+QUANTITY_PATTERN = re.compile(r"^\s*(\d+(?:\.\d*)?|\.\d+)\s*(.*?)\s*$")
+
+def canonical(unit):
+	''' returns the unit named by unit, raising ValueError if there is none
+	'''
+
+	unit = ALIASES.get(unit.strip().lower(), unit.strip().lower())
+	if unit not in BASE:
+		raise ValueError("Unknown unit: " + unit + ". Units are " + ", ".join(sorted(BASE)) + ".")
+	return unit
+
+def amount(qty):
+	''' rounds a quantity to PRECISION, as a whole number when it is one
+	'''
+
+	# past 2 ** 53 every float is whole, and an int that large doesn't
+	# fit the 64-bit integers BSON stores
+	qty = round(qty, PRECISION)
+	return int(qty) if abs(qty) < 2 ** 53 and qty == int(qty) else qty
+
+def convert(qty, source, target):
+	''' converts qty from one unit to another, raising ValueError if they
+		measure different things
+	'''
+
+	if (source, target) not in CONVERSIONS:
+		raise ValueError("Can't convert " + source + " to " + target + ".")
+	return amount(qty * CONVERSIONS[(source, target)])
+
+def parse(value, unit=None):
+	''' returns (qty, base unit) for a quantity given as a number of unit
+		(a count if no unit is given) or as text such as "500 g" or "1.5
+		cups", raising ValueError if it can't be read, isn't positive or
+		isn't finite, as JSON such as 1e400 or Infinity reads as infinity
+	'''
+
+	if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+		raise ValueError("Could not read quantity " + repr(value) + ".")
+	if isinstance(value, str):
+		match = QUANTITY_PATTERN.match(value)
+		if match == None:
+			raise ValueError("Could not read quantity " + repr(value) + "; write it as e.g. 2, 500 g or 1.5 l.")
+		value = match.group(1)
+		if match.group(2):
+			unit = match.group(2)
+	try:
+		value = float(value)
+	except OverflowError:
+		value = math.inf
+	if math.isnan(value) or value <= 0:
+		raise ValueError("Quantities must be more than zero.")
+
+	unit = canonical(unit) if unit != None else COUNT
+	qty = value * CONVERSIONS[(unit, BASE[unit])]
+	if not math.isfinite(qty):
+		raise ValueError("Quantities must be finite numbers.")
+	return amount(qty), BASE[unit]
+
+def parseIngredients(ingredients, ingredientUnits=None):
+	''' returns ({prodType:qty}, {prodType:unit}) in base units for
+		recipe ingredients given as {prodType:quantity}, each quantity read
+		by parse() in the unit given for it by {prodType:unit}, if any
+	'''
+
+	if not isinstance(ingredients, dict) or len(ingredients) == 0:
+		raise ValueError("Recipes need at least one ingredient.")
+	if not isinstance(ingredientUnits or {}, dict):
+		raise ValueError("Ingredient units must be given as {prodType:unit}.")
+	given = {key.lower(): unit for key, unit in (ingredientUnits or {}).items()}
+	quantities = {}
+	parsedUnits = {}
+	for key in ingredients:
+		quantities[key.lower()], parsedUnits[key.lower()] = parse(ingredients[key], given.get(key.lower()))
+	return quantities, parsedUnits
+
+def describe(qty, unit):
+	''' writes qty of a base unit in the largest display unit holding at
+		least one, e.g. "1.5 kg", leaving counts as bare numbers
+	'''
+
+	for target in DISPLAY_UNITS[unit]:
+		value = convert(qty, unit, target)
+		if abs(value) >= 1 or target == unit:
+			return str(value) if target == COUNT else str(value) + " " + target
+
+def describeAll(quantities, ingredientUnits):
+	''' writes {prodType:qty} in the units given by {prodType:unit}
+	'''
+
+	return ", ".join(key + ": " + describe(quantities[key], ingredientUnits.get(key, COUNT)) for key in quantities)